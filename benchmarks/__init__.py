@@ -0,0 +1 @@
+# Offline benchmarks for the Signup Bot API. Run with ``python -m benchmarks.<name>``.
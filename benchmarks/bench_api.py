@@ -0,0 +1,52 @@
+# Throughput of the API hot paths on the in-memory backend.
+#
+#   python -m benchmarks.bench_api [--requests N] [--latency SECONDS]
+import argparse
+
+from .common import GUILD_ID, create_event, fake_players, make_client, player_tag, report, signup, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API throughput on the in-memory backend.")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per endpoint")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated Firestore RPC latency in seconds")
+    args = parser.parse_args()
+
+    client, storage = make_client(latency=args.latency)
+    stats = storage.db.stats
+    create_event(client, 'Bench')
+    rows = []
+
+    def measure(name, function):
+        storage.db.reset_stats()
+        elapsed = timed(function, args.requests)
+        rows.append((
+            name,
+            f"{args.requests / elapsed:,.0f}",
+            f"{elapsed / args.requests * 1000:.3f}",
+            f"{stats['reads'] / args.requests:.1f}",
+            f"{(stats['writes'] + stats['deletes']) / args.requests:.1f}",
+        ))
+
+    with fake_players():
+        measure('signup', lambda i: signup(client, 'Bench', player_tag(i)))
+    measure('get_event', lambda i: client.get(f'/api/events/Bench?guild_id={GUILD_ID}'))
+    etag = client.get(f'/api/events/Bench?guild_id={GUILD_ID}').headers['ETag']
+    measure('get_event 304', lambda i: client.get(
+        f'/api/events/Bench?guild_id={GUILD_ID}', headers={'If-None-Match': etag}
+    ))
+    measure('summary', lambda i: client.get(f'/api/events/Bench/summary?guild_id={GUILD_ID}'))
+    measure('get_signups', lambda i: client.get(f'/api/events/Bench/signups?guild_id={GUILD_ID}'))
+    measure('check', lambda i: client.post('/api/events/Bench/check', json={
+        'player_tag': player_tag(i), 'guild_id': GUILD_ID,
+    }))
+    measure('list_events', lambda i: client.get(f'/api/events?guild_id={GUILD_ID}'))
+
+    report(
+        f"API throughput ({args.requests} requests each, {args.latency * 1000:.1f} ms simulated latency)",
+        rows, ['endpoint', 'req/s', 'ms/req', 'reads/req', 'writes/req'],
+    )
+
+
+if __name__ == '__main__':
+    main()
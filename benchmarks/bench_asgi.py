@@ -0,0 +1,171 @@
+# Throughput and latency of the WSGI (Flask) and ASGI (Quart) builds under load.
+#
+# Each build is served by uvicorn in a subprocess on the in-memory backend,
+# with simulated Firestore and Clash of Clans latency, and driven by an
+# aiohttp load generator at several concurrency levels. Each level opens its
+# connections with a warm-up round and runs at least ``ROUNDS`` requests per
+# connection, so connection setup and ramp-up do not decide the result.
+#
+#   python -m benchmarks.bench_asgi [--concurrency 1,10,50,100] [--requests N]
+#   python -m benchmarks.bench_asgi serve --interface asgi --port 8101
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import aiohttp
+
+from .common import GUILD_ID, LEADER_ROLE, player_tag, report
+
+EVENT_NAME = 'Load'
+
+# Fewest requests per connection at each concurrency level
+ROUNDS = 5
+
+
+def serve(interface: str, port: int, db_latency: float, lookup_latency: float):
+    """Serve one build of the API until terminated."""
+    import uvicorn
+
+    def lookup(tag):
+        time.sleep(lookup_latency)
+        return {'tag': tag, 'name': f"Player {tag}", 'townHallLevel': 15}
+
+    async def async_lookup(tag):
+        await asyncio.sleep(lookup_latency)
+        return {'tag': tag, 'name': f"Player {tag}", 'townHallLevel': 15}
+
+    if interface == 'asgi':
+        from signup_bot.api.asgi import create_asgi_app
+        from signup_bot.api.services import AsyncMemoryStorage
+        from signup_bot.api.services.async_memory_client import AsyncMemoryClient
+
+        storage = AsyncMemoryStorage(AsyncMemoryClient(latency=db_latency))
+        app = create_asgi_app(storage=storage)
+        target, lookup_function = 'signup_bot.api.asgi.events.player_get', async_lookup
+    else:
+        from signup_bot.api import create_app
+        from signup_bot.api.services import MemoryStorage
+        from signup_bot.api.services.memory_client import MemoryClient
+
+        storage = MemoryStorage(MemoryClient(latency=db_latency))
+        app = create_app(storage=storage)
+        target, lookup_function = 'signup_bot.api.routes.events.player_get', lookup
+
+    with patch(target, side_effect=lookup_function):
+        uvicorn.run(app, host='127.0.0.1', port=port, interface='asgi3' if interface == 'asgi' else 'wsgi',
+                    log_level='warning')
+
+
+async def wait_ready(session, base_url: str, timeout: float = 20.0):
+    """Poll the health check until the server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+async def run_load(session, base_url: str, scenario: str, concurrency: int, total: int, offset: int):
+    """Send ``total`` requests with ``concurrency`` in flight; return (rps, p50 ms, p95 ms, errors)."""
+    latencies, errors = [], 0
+    queue = iter(range(total))
+
+    async def request(number):
+        if scenario == 'signup':
+            tag = player_tag(offset + number)
+            return session.post(f"{base_url}/api/events/{EVENT_NAME}/signup", json={
+                'player_tag': tag, 'discord_name': f"user-{tag}", 'guild_id': GUILD_ID,
+            })
+        return session.get(f"{base_url}/api/events/{EVENT_NAME}/summary", params={'guild_id': GUILD_ID})
+
+    async def worker():
+        nonlocal errors
+        for number in queue:
+            start = time.perf_counter()
+            async with await request(number) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return total / elapsed, statistics.median(latencies) * 1000, p95 * 1000, errors
+
+
+async def measure(interface: str, port: int, args) -> list:
+    """Start one build, run every scenario and concurrency level, and stop it."""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_asgi', 'serve', '--interface', interface, '--port', str(port),
+         '--db-latency', str(args.db_latency), '--lookup-latency', str(args.lookup_latency)],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    rows = []
+    try:
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_ready(session, base_url)
+            await session.post(f"{base_url}/api/servers/{GUILD_ID}/add_leader_role", json={'role_id': LEADER_ROLE})
+            await session.post(f"{base_url}/api/events", json={
+                'event_name': EVENT_NAME, 'guild_id': GUILD_ID, 'channel_id': '1', 'user_roles': [LEADER_ROLE],
+            })
+            offset = 0
+            for scenario in ('signup', 'summary'):
+                for concurrency in args.concurrency:
+                    await run_load(session, base_url, scenario, concurrency, concurrency, offset)
+                    offset += concurrency
+                    total = max(args.requests, ROUNDS * concurrency)
+                    rps, p50, p95, errors = await run_load(session, base_url, scenario, concurrency, total, offset)
+                    offset += total
+                    rows.append((interface, scenario, concurrency, f"{rps:,.1f}", f"{p50:.1f}", f"{p95:.1f}", errors))
+    finally:
+        server.terminate()
+        server.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the WSGI and ASGI builds of the API under load.")
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser('serve', help="Serve one build (used by the benchmark itself)")
+    serve_parser.add_argument('--interface', choices=['wsgi', 'asgi'], required=True)
+    serve_parser.add_argument('--port', type=int, required=True)
+    for target in (parser, serve_parser):
+        target.add_argument('--db-latency', type=float, default=0.01, help="Seconds per simulated Firestore RPC")
+        target.add_argument('--lookup-latency', type=float, default=0.1, help="Seconds per simulated player lookup")
+    parser.add_argument('--concurrency', type=lambda value: [int(v) for v in value.split(',')],
+                        default=[1, 10, 50, 100], help="Comma-separated numbers of requests in flight")
+    parser.add_argument('--requests', type=int, default=200, help="Fewest requests per scenario and concurrency level")
+    parser.add_argument('--port', type=int, default=8101, help="First port to serve on")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.interface, args.port, args.db_latency, args.lookup_latency)
+        return
+
+    rows = []
+    for number, interface in enumerate(('wsgi', 'asgi')):
+        rows += asyncio.run(measure(interface, args.port + number, args))
+    report(
+        f"Load test (at least {args.requests} requests per row, {args.db_latency * 1000:g} ms per Firestore RPC, "
+        f"{args.lookup_latency * 1000:g} ms per player lookup)",
+        rows, ['interface', 'scenario', 'in flight', 'req/s', 'p50 ms', 'p95 ms', 'errors'],
+    )
+
+
+if __name__ == '__main__':
+    main()
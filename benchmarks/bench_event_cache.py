@@ -0,0 +1,61 @@
+# Firestore reads per request with and without the event metadata cache.
+#
+# Every event carries a log channel, so each route also logs its action.
+#
+#   python -m benchmarks.bench_event_cache [--requests N]
+import argparse
+
+from .common import GUILD_ID, LEADER_ROLE, fake_players, make_client, player_tag, report, signup
+
+
+def scenarios(client, requests: int):
+    """Yield ``(name, function(i))`` for each route measured."""
+    yield 'signup', lambda i: signup(client, 'Hot', player_tag(i))
+    yield 'check', lambda i: client.post('/api/events/Hot/check', json={
+        'player_tag': player_tag(i), 'guild_id': GUILD_ID,
+    })
+    yield 'update_message_id', lambda i: client.post('/api/events/Hot/update_message_id', json={
+        'guild_id': GUILD_ID, 'message_id': str(i),
+    })
+    yield 'remove', lambda i: client.post('/api/events/Hot/remove', json={
+        'player_tag': player_tag(i), 'discord_name': 'leader', 'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE],
+    })
+    yield 'close', lambda i: client.post('/api/events/Hot/close', json={
+        'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE],
+    })
+
+
+def measure(cached: bool, requests: int) -> dict:
+    """Return the reads per request of each scenario."""
+    client, storage = make_client()
+    if not cached:
+        storage.event_cache.ttl = 0
+    client.post('/api/events', json={
+        'event_name': 'Hot', 'guild_id': GUILD_ID, 'channel_id': '1', 'log_channel_id': '2',
+        'user_roles': [LEADER_ROLE],
+    })
+    storage.get_leader_roles(GUILD_ID)  # Leader roles are cached either way
+
+    reads = {}
+    with fake_players():
+        for name, function in scenarios(client, requests):
+            storage.db.reset_stats()
+            for i in range(requests):
+                function(i)
+            reads[name] = storage.db.stats['reads'] / requests
+    return reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count Firestore reads per request with and without the event cache.")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per route")
+    args = parser.parse_args()
+
+    before, after = measure(False, args.requests), measure(True, args.requests)
+    rows = [(name, f"{before[name]:.2f}", f"{after[name]:.2f}") for name in before]
+    report(f"Firestore reads per request ({args.requests} requests per route)", rows,
+           ['route', 'no cache', 'event cache'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# JSON encoding time and payload size of a large roster response.
+#
+#   python -m benchmarks.bench_json [--signups N] [--repeat N]
+import argparse
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from .common import report, timed
+from signup_bot.api import compression
+from signup_bot.api.json_provider import OrjsonProvider, orjson
+
+
+def roster(size: int) -> dict:
+    """Build a get_event response with ``size`` signups."""
+    signups = [
+        {
+            'discord_name': f"member{number}",
+            'discord_user_id': str(10 ** 17 + number),
+            'index': number + 1,
+            'player_name': f"Player {number}",
+            'player_tag': f"#P{number:06d}",
+            'player_th': 10 + number % 8,
+            'position': number + 1,
+            'signed_up_at': f"2024-05-01T12:{number % 60:02d}:00.000000",
+        }
+        for number in range(size)
+    ]
+    return {
+        'event_name': 'Clan War League', 'is_open': True, 'signup_count': size,
+        'th_composition': {str(th): size // 8 for th in range(10, 18)}, 'signups': signups,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON providers and compression on a roster response.")
+    parser.add_argument('--signups', type=int, default=1000, help="Signups in the roster")
+    parser.add_argument('--repeat', type=int, default=200, help="Encodings per provider")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    document = roster(args.signups)
+    providers = [('stdlib json', DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+
+    rows = []
+    with app.app_context():
+        for name, provider in providers:
+            elapsed = timed(lambda i: provider.response(document).get_data(), args.repeat)
+            rows.append((name, f"{elapsed / args.repeat * 1000:.3f}"))
+    report(f"Encoding a {args.signups}-signup roster ({args.repeat} runs)", rows, ['provider', 'ms/response'])
+
+    payload = providers[-1][1].dumps(document).encode()
+    rows = [('identity', f"{len(payload) / 1024:,.1f}", '-')]
+    for encoding in reversed(compression.available_encodings()):
+        elapsed = timed(lambda i: compression.compress(payload, encoding), 50)
+        rows.append((encoding, f"{len(compression.compress(payload, encoding)) / 1024:,.1f}", f"{elapsed / 50 * 1000:.3f}"))
+    report("Payload size by content coding", rows, ['coding', 'KiB', 'ms to compress'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+# Size and speed of event listings with and without field projection.
+#
+#   python -m benchmarks.bench_list_events [--events N] [--requests N]
+import argparse
+
+from .common import GUILD_ID, create_event, make_client, report, timed
+
+# The projection the bot's /list_events command asks for
+BOT_FIELDS = 'event_name,is_open,signup_count,role_id'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and projected event listings.")
+    parser.add_argument('--events', type=int, default=300, help="Events in the guild")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per variant")
+    args = parser.parse_args()
+
+    client, _ = make_client()
+    for number in range(args.events):
+        create_event(client, f"Event {number:04d}")
+
+    rows = []
+    for name, query in [('full', ''), ('projected', f'&fields={BOT_FIELDS}')]:
+        url = f'/api/events?guild_id={GUILD_ID}{query}'
+        size = len(client.get(url).data)
+        elapsed = timed(lambda i: client.get(url), args.requests)
+        rows.append((name, f"{size / 1024:,.1f}", f"{elapsed / args.requests * 1000:.2f}"))
+
+    report(
+        f"list_events for {args.events} events ({args.requests} requests each)",
+        rows, ['listing', 'KiB/response', 'ms/req'],
+    )
+
+
+if __name__ == '__main__':
+    main()
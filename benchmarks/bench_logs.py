@@ -0,0 +1,77 @@
+# Firestore cost of the audit log of a signup rush: writing it, and the bot posting it.
+#
+# Compares one write per entry, batched commits and compact hourly buckets.
+#
+#   python -m benchmarks.bench_logs [--signups 300] [--batch-size 100]
+import argparse
+import asyncio
+
+from .common import GUILD_ID, create_event, fake_players, make_client, player_tag, report, signup
+from signup_bot.api.services import BatchedLogSink, LogDispatcher, set_log_dispatcher
+from signup_bot.utils.log_buckets import BUCKETS_COLLECTION
+from signup_bot.utils.log_feed import LogDelivery
+
+MODES = (
+    ('per entry', 1, 'documents'),
+    ('batched', None, 'documents'),
+    ('hourly', None, 'hourly'),
+)
+
+
+async def _skip_post(log_data):
+    pass
+
+
+def deliver(storage):
+    """Do what the bot's sweep does for the new log entries, without posting them."""
+    asyncio.run(LogDelivery(_skip_post).sweep(storage.db, limit=100))
+
+
+def run(signups: int, batch_size: int, log_format: str):
+    client, storage = make_client()
+    storage.log_format = log_format
+    create_event(client, 'Rush')
+    storage.update_event(GUILD_ID, 'Rush', {'log_channel_id': '2'})
+    sink = BatchedLogSink(storage, batch_size, flush_interval=0.5) if batch_size > 1 else None
+    dispatcher = LogDispatcher(storage, max_size=signups + 1, sink=sink)
+    set_log_dispatcher(dispatcher)
+
+    # Queue the rush's entries first so only log writes are counted
+    with fake_players():
+        for number in range(signups):
+            assert signup(client, 'Rush', player_tag(number)).status_code == 201
+    storage.db.reset_stats()
+    dispatcher.start()
+    dispatcher.close()
+    written = dict(storage.db.stats)
+
+    event_ref = storage._event_ref(GUILD_ID, 'Rush')
+    documents = (len(list(event_ref.collection('logs').list_documents()))
+                 + len(list(event_ref.collection(BUCKETS_COLLECTION).list_documents())))
+    storage.db.reset_stats()
+    deliver(storage)
+    delivered = dict(storage.db.stats)
+    return written, documents, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare audit log formats and write strategies.")
+    parser.add_argument('--signups', type=int, default=300, help="Signups in the rush")
+    parser.add_argument('--batch-size', type=int, default=100, help="Log entries per batched commit")
+    args = parser.parse_args()
+
+    rows = []
+    for name, batch_size, log_format in MODES:
+        written, documents, delivered = run(args.signups, batch_size or args.batch_size, log_format)
+        rows.append((
+            name, written.get('commits', 0), written.get('writes', 0), documents,
+            delivered.get('reads', 0), delivered.get('writes', 0),
+        ))
+    report(
+        f"Audit log of {args.signups} signups",
+        rows, ['mode', 'commits', 'doc writes', 'docs stored', 'bot reads', 'bot writes'],
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Player profile cache: hit ratio and upstream time saved on a signup workload.
+#
+# Every player signs up to each of several events, as clans do for CWL,
+# war and raid rosters; the proxy is simulated with a fixed latency.
+#
+#   python -m benchmarks.bench_players [--players N] [--events N] [--latency SECONDS]
+import argparse
+import time
+from unittest.mock import patch
+
+from .common import create_event, make_client, player_tag, report, signup
+from signup_bot.api.services import get_player_lookup
+
+
+def run(players: int, events: int, latency: float, cached: bool):
+    """Sign every player up to every event; return (seconds, lookup stats)."""
+    client, storage = make_client()
+    lookup = get_player_lookup()
+    if not cached:
+        lookup.cache.ttl = 0
+
+    def fetch(tag):
+        time.sleep(latency)
+        return {'tag': tag, 'name': f"Player {tag}", 'townHallLevel': 15}
+
+    names = [f"Event{number}" for number in range(events)]
+    for name in names:
+        create_event(client, name)
+    start = time.perf_counter()
+    with patch('signup_bot.api.routes.events.fetch_player', side_effect=fetch):
+        for name in names:
+            for number in range(players):
+                assert signup(client, name, player_tag(number)).status_code == 201
+    return time.perf_counter() - start, lookup.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the player profile cache on repeated signups.")
+    parser.add_argument('--players', type=int, default=50, help="Distinct players")
+    parser.add_argument('--events', type=int, default=3, help="Events each player signs up to")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds per simulated proxy call")
+    args = parser.parse_args()
+
+    rows = []
+    for cached in (False, True):
+        elapsed, stats = run(args.players, args.events, args.latency, cached)
+        rows.append((
+            'on' if cached else 'off', stats['upstream_calls'], f"{stats['hit_ratio']:.2f}",
+            f"{stats['saved_ms'] / 1000:.2f}", f"{elapsed:.2f}",
+        ))
+    report(
+        f"{args.players} players x {args.events} events, {args.latency * 1000:g} ms per proxy call",
+        rows, ['cache', 'proxy calls', 'hit ratio', 'saved s', 'total s'],
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Cost of removing a signup as the roster grows.
+#
+#   python -m benchmarks.bench_remove [--sizes 50,100,300,1000] [--removals N]
+import argparse
+from datetime import datetime
+
+from .common import GUILD_ID, LEADER_ROLE, create_event, make_client, player_tag, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure signup removal cost for growing rosters.")
+    parser.add_argument('--sizes', default='50,100,300,1000', help="Comma-separated roster sizes")
+    parser.add_argument('--removals', type=int, default=20, help="Signups removed per roster")
+    args = parser.parse_args()
+
+    rows = []
+    for size in (int(value) for value in args.sizes.split(',')):
+        client, storage = make_client()
+        event_name = f"Roster{size}"
+        create_event(client, event_name)
+        for number in range(size):
+            storage.add_signup(GUILD_ID, event_name, {
+                'player_tag': player_tag(number),
+                'player_name': f"Player {number}",
+                'player_th': 15,
+                'discord_name': f"user-{number}",
+                'signed_up_at': datetime.utcnow().isoformat(),
+            })
+
+        # Remove from the front of the roster, where a reindex would touch every later signup
+        storage.db.reset_stats()
+        for number in range(args.removals):
+            response = client.post(f'/api/events/{event_name}/remove', json={
+                'player_tag': player_tag(number), 'discord_name': 'leader',
+                'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE],
+            })
+            assert response.status_code == 200, response.get_json()
+
+        stats = storage.db.stats
+        rows.append((
+            size,
+            f"{stats['reads'] / args.removals:.1f}",
+            f"{(stats['writes'] + stats['deletes']) / args.removals:.1f}",
+            f"{stats['commits'] / args.removals:.1f}",
+        ))
+
+    report(
+        f"Remove cost per request ({args.removals} removals from the front of each roster)",
+        rows, ['roster', 'reads/req', 'writes/req', 'commits/req'],
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Shared helpers for the benchmarks.
+import os
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+# Benchmarks run against the in-memory backend and never need real credentials
+os.environ.setdefault('DISCORD_TOKEN', 'benchmark')
+os.environ.setdefault('AUTH', 'benchmark')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from signup_bot.api import create_app
+from signup_bot.api.services import MemoryStorage
+from signup_bot.api.services.memory_client import MemoryClient
+
+GUILD_ID = '1000'
+LEADER_ROLE = 'leader'
+
+
+def make_client(latency: float = 0.0):
+    """Create an API test client on a fresh in-memory backend.
+
+    Returns ``(client, storage)``; ``storage.db.stats`` counts Firestore operations.
+    """
+    storage = MemoryStorage(MemoryClient(latency=latency))
+    storage.set_leader_roles(GUILD_ID, [LEADER_ROLE])
+    app = create_app(storage=storage)
+    return app.test_client(), storage
+
+
+def create_event(client, event_name: str):
+    """Create an open event through the API."""
+    response = client.post('/api/events', json={
+        'event_name': event_name, 'guild_id': GUILD_ID, 'channel_id': '1', 'user_roles': [LEADER_ROLE],
+    })
+    assert response.status_code == 201, response.get_json()
+
+
+def player_tag(number: int) -> str:
+    """Return a distinct, valid player tag for ``number``."""
+    alphabet = '0289PYLQGRJCUV'
+    digits = ''
+    number += len(alphabet) ** 4  # Keep every tag at least five characters long
+    while number:
+        number, digit = divmod(number, len(alphabet))
+        digits = alphabet[digit] + digits
+    return f"#{digits}"
+
+
+@contextmanager
+def fake_players(th: int = 15):
+    """Answer CoC player lookups locally instead of calling the proxy."""
+    def lookup(tag):
+        return {'tag': tag, 'name': f"Player {tag}", 'townHallLevel': th}
+
+    with patch('signup_bot.api.routes.events.player_get', side_effect=lookup):
+        yield
+
+
+def signup(client, event_name: str, tag: str):
+    """Sign up ``tag`` for an event through the API."""
+    return client.post(f'/api/events/{event_name}/signup', json={
+        'player_tag': tag, 'discord_name': f"user-{tag}", 'guild_id': GUILD_ID,
+    })
+
+
+def timed(function, repeat: int):
+    """Run ``function(i)`` ``repeat`` times and return the elapsed seconds."""
+    start = time.perf_counter()
+    for i in range(repeat):
+        function(i)
+    return time.perf_counter() - start
+
+
+def report(title: str, rows, headers):
+    """Print a simple aligned table."""
+    print(f"\n{title}")
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(v).rjust(w) for v, w in zip(row, widths)))
@@ -73,9 +73,16 @@ if __name__ == "__main__":
             port = find_available_port(8001)
             logger.info(f"Found available port: {port}")
         
-        # Run the app using uvicorn with WSGI interface for Flask
+        # Run the Flask app over WSGI, or the Quart build natively over ASGI
+        from signup_bot import Config
+        if Config.API_INTERFACE == 'asgi':
+            app_factory, interface = "signup_bot.api.asgi:create_asgi_app", "asgi3"
+        else:
+            app_factory, interface = "signup_bot.api:create_app", "wsgi"
+        logger.info(f"Serving the API over {interface}")
+        
         config = uvicorn.Config(
-            "signup_bot.api:create_app",
+            app_factory,
             factory=True,
             host="0.0.0.0",
             port=port,
@@ -83,7 +90,7 @@ if __name__ == "__main__":
             reload=False,  # Disable reload to avoid port conflicts
             proxy_headers=True,
             forwarded_allow_ips="*",  # In production, replace with your actual trusted IPs
-            interface="wsgi"  # Explicitly use WSGI interface for Flask
+            interface=interface
         )
         
         server = uvicorn.Server(config)
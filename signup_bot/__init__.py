@@ -20,7 +20,41 @@ class Config:
     DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
     API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8001')
     FIREBASE_CRED = os.getenv('FIREBASE_CRED')  # Base64 encoded Firebase credentials
-    AUTH = os.getenv('AUTH')
+    AUTH = os.getenv('AUTH')  # Clash of Clans API token; several may be given, comma-separated
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore')  # 'firestore' or 'memory'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))  # Bytes; smaller responses are sent as-is
+    API_INTERFACE = os.getenv('API_INTERFACE', 'wsgi')  # 'wsgi' (Flask) or 'asgi' (Quart)
+    LEADER_ROLE_CACHE_TTL = float(os.getenv('LEADER_ROLE_CACHE_TTL', '30'))  # Seconds; 0 disables the cache
+    LEADER_ROLE_CACHE_SIZE = int(os.getenv('LEADER_ROLE_CACHE_SIZE', '1024'))  # Guilds kept per API process
+    EVENT_CACHE_TTL = float(os.getenv('EVENT_CACHE_TTL', '30'))  # Seconds; 0 disables the cache
+    EVENT_CACHE_SIZE = int(os.getenv('EVENT_CACHE_SIZE', '2048'))  # Events kept per API process
+    PLAYER_CACHE_TTL = float(os.getenv('PLAYER_CACHE_TTL', '3600'))  # Seconds; 0 disables the cache
+    PLAYER_CACHE_SIZE = int(os.getenv('PLAYER_CACHE_SIZE', '10000'))  # Profiles kept per API process
+    PLAYER_CACHE_STORE = os.getenv('PLAYER_CACHE_STORE', 'none')  # 'none', 'file' or 'firestore'
+    PLAYER_CACHE_FILE = os.getenv('PLAYER_CACHE_FILE', 'player_cache.jsonl')  # Used by the 'file' store
+    PLAYER_NOT_FOUND_TTL = float(os.getenv('PLAYER_NOT_FOUND_TTL', '300'))  # Seconds unknown tags are rejected locally
+    COC_API_URL = os.getenv('COC_API_URL', 'https://cocproxy.royaleapi.dev/v1')
+    COC_POOL_CONNECTIONS = int(os.getenv('COC_POOL_CONNECTIONS', '4'))  # Host pools of the proxy client
+    COC_POOL_MAXSIZE = int(os.getenv('COC_POOL_MAXSIZE', '32'))  # Open connections kept to the proxy
+    COC_CONNECT_TIMEOUT = float(os.getenv('COC_CONNECT_TIMEOUT', '3.05'))  # Seconds
+    COC_READ_TIMEOUT = float(os.getenv('COC_READ_TIMEOUT', '10'))  # Seconds
+    COC_RETRIES = int(os.getenv('COC_RETRIES', '3'))  # Retries on errors, 429 and 5xx
+    COC_BACKOFF = float(os.getenv('COC_BACKOFF', '0.5'))  # Base of the jittered exponential backoff, seconds
+    COC_RATE_LIMIT = float(os.getenv('COC_RATE_LIMIT', '10'))  # Requests per second per token; 0 disables
+    COC_RATE_BURST = float(os.getenv('COC_RATE_BURST', '20'))  # Requests a rested token may send at once
+    COC_RATE_MAX_WAIT = float(os.getenv('COC_RATE_MAX_WAIT', '2'))  # Seconds a lookup may queue for budget
+    COC_BREAKER_THRESHOLD = int(os.getenv('COC_BREAKER_THRESHOLD', '5'))  # Consecutive failures that open the circuit
+    COC_BREAKER_RESET = float(os.getenv('COC_BREAKER_RESET', '30'))  # Seconds before an open circuit is retried
+    ENRICHMENT_INTERVAL = float(os.getenv('ENRICHMENT_INTERVAL', '60'))  # Seconds between enrichment sweeps
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '5000'))  # Log entries queued before new ones are dropped
+    LOG_WORKERS = int(os.getenv('LOG_WORKERS', '2'))  # Workers writing log entries per API process
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '100'))  # Log entries per batched commit (at most 500)
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '0.5'))  # Seconds a log entry waits for its batch
+    LOG_BUFFER_SIZE = int(os.getenv('LOG_BUFFER_SIZE', '5000'))  # Log entries buffered before new ones are dropped
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'documents')  # 'documents' (one per entry) or 'hourly' (compact buckets)
+    LOG_POLL_INTERVAL = float(os.getenv('LOG_POLL_INTERVAL', '60'))  # Seconds between the bot's sweeps for missed log entries
+    LOG_POLL_LIMIT = int(os.getenv('LOG_POLL_LIMIT', '100'))  # Documents read per page of the bot's sweep
+    BOT_DEBUG = os.getenv('BOT_DEBUG', '').lower() in ('1', 'true', 'yes')  # Flags blocking Firestore calls on the bot's loop
     
     @classmethod
     def get_firebase_credentials(cls):
@@ -43,12 +77,18 @@ class Config:
     @classmethod
     def validate(cls):
         """Validate that all required environment variables are set."""
-        required = ['DISCORD_TOKEN', 'FIREBASE_CRED', 'AUTH']
+        required = ['DISCORD_TOKEN', 'AUTH']
+        # The in-memory backend runs without a Firebase project
+        if cls.STORAGE_BACKEND != 'memory':
+            required.insert(1, 'FIREBASE_CRED')
         missing = [var for var in required if not getattr(cls, var)]
         
         if missing:
             raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
         
+        if cls.STORAGE_BACKEND == 'memory':
+            return
+        
         # Test Firebase credentials decoding
         try:
             cls.get_firebase_credentials()
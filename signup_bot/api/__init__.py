@@ -9,6 +9,7 @@ import os
 import base64
 import json
 import logging
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -16,23 +17,16 @@ logger = logging.getLogger(__name__)
 
 # Import Config after setting up logging to ensure logging is configured
 from .. import Config
+from .compression import init_compression
+from .json_provider import json_provider_class
+from .services import (
+    BatchedLogSink, EnrichmentWorker, FirestoreStorage, LogDispatcher, MemoryStorage, create_player_lookup, get_coc_client,
+    get_enrichment_worker, get_log_dispatcher, get_player_lookup, get_storage, set_enrichment_worker,
+    set_log_dispatcher, set_player_lookup, set_storage,
+)
 
-def create_app():
-    # Create and configure the Flask application
-    app = Flask(__name__)
-    # Configure CORS
-    CORS(app, 
-         resources={
-             r"/api/*": {
-                 "origins": ["*"],
-                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                 "allow_headers": ["Content-Type", "Authorization"]
-             }
-         },
-         supports_credentials=True
-    )
-    
-    # Initialize Firebase only if it hasn't been initialized yet
+def _init_firestore():
+    """Initialize Firebase if needed and return a Firestore client."""
     try:
         if not firebase_admin._apps:
             logger.info("Starting Firebase initialization...")
@@ -67,10 +61,59 @@ def create_app():
         logger.error(f"Unexpected error initializing Firebase: {str(e)}")
         raise ValueError(f"Failed to initialize Firebase: {str(e)}")
     
+    return db
+
+def create_app(storage=None):
+    # Create and configure the Flask application
+    app = Flask(__name__)
+    app.json = json_provider_class()(app)
+    init_compression(app, Config.COMPRESS_MIN_SIZE)
+    # Configure CORS
+    CORS(app, 
+         resources={
+             r"/api/*": {
+                 "origins": ["*"],
+                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+                 "allow_headers": ["Content-Type", "Authorization"]
+             }
+         },
+         supports_credentials=True
+    )
+    
+    # Pick the storage backend the routes will use
+    if storage is None and Config.STORAGE_BACKEND == 'memory':
+        logger.info("Using in-memory storage backend")
+        storage = MemoryStorage()
+    elif storage is None:
+        storage = FirestoreStorage(_init_firestore())
+    set_storage(storage)
+    set_player_lookup(create_player_lookup(storage.db))
+    # Audit log entries are written off the request path in batches and drained at exit
+    log_sink = BatchedLogSink(storage, Config.LOG_BATCH_SIZE, Config.LOG_FLUSH_INTERVAL, Config.LOG_BUFFER_SIZE)
+    set_log_dispatcher(LogDispatcher(storage, Config.LOG_QUEUE_SIZE, Config.LOG_WORKERS, log_sink))
+    
     # Register blueprints
     from .routes import events_bp, admin_bp
     app.register_blueprint(events_bp, url_prefix='/api/events')
     app.register_blueprint(admin_bp, url_prefix='/api/servers')
+
+    # Fills in signups taken while the Clash of Clans proxy was down
+    from .routes.events import player_get
+    set_enrichment_worker(EnrichmentWorker(storage, player_get, Config.ENRICHMENT_INTERVAL))
+    
+    # Background threads start with the first request, so apps that are built
+    # but never serve one (tests, scripts) run none
+    started = threading.Event()
+    start_lock = threading.Lock()
+    
+    @app.before_request
+    def start_background_workers():
+        if not started.is_set():
+            with start_lock:
+                if not started.is_set():
+                    get_log_dispatcher().start()
+                    get_enrichment_worker().start()
+                    started.set()
     
     @app.errorhandler(500)
     def handle_500_error(e):
@@ -85,6 +128,17 @@ def create_app():
     @app.route('/health', methods=['GET'])
     def health_check():
         return jsonify({"status": "ok", "service": "signup-bot-api"})
+    
+    # Cache and Clash of Clans client counters of this process
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return jsonify({
+            "caches": dict(get_storage().cache_stats(), players=get_player_lookup().stats()),
+            "coc_tokens": get_coc_client().tokens.stats(),
+            "coc_circuit": get_coc_client().breaker.stats(),
+            "enrichment": get_enrichment_worker().stats(),
+            "logs": get_log_dispatcher().stats(),
+        })
         
     # Add a 404 handler
     @app.errorhandler(404)
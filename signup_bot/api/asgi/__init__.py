@@ -0,0 +1,128 @@
+"""
+ASGI build of the Signup Bot API.
+
+Same URLs and responses as the Flask app, served by Quart with the async
+Firestore client and a pooled aiohttp client for player lookups, so a request
+waiting on I/O does not hold a worker thread.
+"""
+import logging
+
+from quart import Quart, jsonify, request
+
+from ... import Config
+from ..compression import init_async_compression
+from ..json_provider import json_provider_class
+from ..services import (
+    AsyncBatchedLogSink, AsyncCocClient, AsyncEnrichmentWorker, AsyncFirestoreStorage, AsyncLogDispatcher,
+    AsyncMemoryStorage, create_player_lookup, get_async_storage, get_player_lookup, set_async_storage,
+    set_player_lookup,
+)
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the Flask app's CORS configuration
+CORS_METHODS = 'GET, POST, PUT, DELETE, OPTIONS'
+CORS_HEADERS = 'Content-Type, Authorization'
+
+
+def _sync_client():
+    """Return the sync Firestore client if the player cache persists to Firestore."""
+    if Config.PLAYER_CACHE_STORE != 'firestore':
+        return None
+    from firebase_admin import firestore
+    return firestore.client()
+
+
+def create_asgi_app(storage=None):
+    # Create and configure the Quart application
+    app = Quart(__name__)
+    app.json = json_provider_class()(app)
+    init_async_compression(app, Config.COMPRESS_MIN_SIZE)
+
+    # Pick the storage backend the routes will use; the player cache's
+    # Firestore store is written from a worker thread with the sync client
+    if storage is None and Config.STORAGE_BACKEND == 'memory':
+        logger.info("Using in-memory storage backend")
+        storage = AsyncMemoryStorage()
+    elif storage is None:
+        from firebase_admin import firestore_async
+        from .. import _init_firestore
+        _init_firestore()
+        storage = AsyncFirestoreStorage(firestore_async.client())
+    set_async_storage(storage)
+    set_player_lookup(create_player_lookup(getattr(storage.db, 'sync_client', None) or _sync_client()))
+
+    # Audit log entries are written off the request path in batches and drained on shutdown
+    log_sink = AsyncBatchedLogSink(storage, Config.LOG_BATCH_SIZE, Config.LOG_FLUSH_INTERVAL, Config.LOG_BUFFER_SIZE)
+    app.log_dispatcher = AsyncLogDispatcher(storage, Config.LOG_QUEUE_SIZE, Config.LOG_WORKERS, log_sink)
+
+    # One proxy client per process, so player lookups reuse connections, and
+    # the worker filling in signups taken while the proxy was down
+    @app.before_serving
+    async def open_coc_client():
+        app.log_dispatcher.start()
+        app.coc_client = AsyncCocClient.from_config()
+        app.enrichment_worker = AsyncEnrichmentWorker(
+            storage, lambda tag: get_player_lookup().get_async(tag, app.coc_client.get_player),
+            Config.ENRICHMENT_INTERVAL,
+        )
+        app.enrichment_worker.start()
+
+    @app.after_serving
+    async def close_coc_client():
+        await app.enrichment_worker.stop()
+        await app.coc_client.close()
+        await app.log_dispatcher.close()
+
+    @app.after_request
+    async def add_cors_headers(response):
+        origin = request.headers.get('Origin')
+        if origin and request.path.startswith('/api/'):
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.vary.add('Origin')
+            if request.method == 'OPTIONS':
+                response.headers['Access-Control-Allow-Methods'] = CORS_METHODS
+                response.headers['Access-Control-Allow-Headers'] = CORS_HEADERS
+        return response
+
+    # Register blueprints
+    from .events import events_bp
+    from .admin import admin_bp
+    app.register_blueprint(events_bp, url_prefix='/api/events')
+    app.register_blueprint(admin_bp, url_prefix='/api/servers')
+
+    @app.errorhandler(500)
+    async def handle_500_error(e):
+        logger.error(f"500 Error: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "error",
+            "message": "Internal Server Error",
+            "error": str(e)
+        }), 500
+
+    # Add a simple health check endpoint
+    @app.route('/health', methods=['GET'])
+    async def health_check():
+        return jsonify({"status": "ok", "service": "signup-bot-api"})
+
+    # Cache and Clash of Clans client counters of this process
+    @app.route('/metrics', methods=['GET'])
+    async def metrics():
+        return jsonify({
+            "caches": dict(get_async_storage().cache_stats(), players=get_player_lookup().stats()),
+            "coc_tokens": app.coc_client.tokens.stats(),
+            "coc_circuit": app.coc_client.breaker.stats(),
+            "enrichment": app.enrichment_worker.stats(),
+            "logs": app.log_dispatcher.stats(),
+        })
+
+    # Add a 404 handler
+    @app.errorhandler(404)
+    async def not_found(e):
+        return jsonify({
+            "status": "error",
+            "message": "Resource not found"
+        }), 404
+
+    return app
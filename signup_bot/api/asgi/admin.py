@@ -0,0 +1,25 @@
+# Admin-related API routes for the ASGI app.
+#
+# Same handlers as ``routes/admin.py`` (see ``event_handlers.py``).
+from quart import Blueprint, request
+
+from .. import event_handlers as handlers
+from .events import _context, _respond
+
+# Create blueprint
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/<guild_id>/add_leader_role', methods=['POST'])
+async def add_leader_role(guild_id):
+    """Add a role as a leader role."""
+    return await _respond(handlers.add_leader_role(_context(), await request.get_json(silent=True), guild_id))
+
+@admin_bp.route('/<guild_id>/remove_leader_role', methods=['POST'])
+async def remove_leader_role(guild_id):
+    """Remove a leader role."""
+    return await _respond(handlers.remove_leader_role(_context(), await request.get_json(silent=True), guild_id))
+
+@admin_bp.route('/<guild_id>/leader_roles', methods=['GET'])
+async def get_leader_roles(guild_id):
+    """Get all leader roles for a server."""
+    return await _respond(handlers.get_leader_roles(_context(), guild_id))
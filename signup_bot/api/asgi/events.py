@@ -0,0 +1,121 @@
+# Event-related API routes for the ASGI app.
+#
+# Same handlers as ``routes/events.py`` (see ``event_handlers.py``); every
+# Firestore and Clash of Clans call is awaited, so one worker serves many
+# requests that wait on I/O.
+from quart import Blueprint, Response, current_app, request, jsonify, send_file
+from quart.utils import run_sync
+
+from .. import event_handlers as handlers
+from ..conditional import set_validators
+from ..event_handlers import EventContext
+from ..services import (
+    CircuitOpen, PlayerNotFound, ProxyUnavailable, RateLimited, get_async_storage, get_player_lookup,
+)
+
+# Create blueprint
+events_bp = Blueprint('events', __name__)
+
+async def player_get(player_tag: str) -> dict:
+    """Return a player's profile, from the player cache when it holds it."""
+    return await get_player_lookup().get_async(player_tag, fetch_player)
+
+async def fetch_player(player_tag: str) -> dict:
+    try:
+        # Pooled connections, timeouts and retries on 429/5xx
+        return await current_app.coc_client.get_player(player_tag)
+    except PlayerNotFound:
+        raise  # Remembered by the player lookup
+    except (CircuitOpen, ProxyUnavailable, RateLimited):
+        raise  # Not the player's fault; the signup degrades or answers 503
+    except Exception as e:
+        print(f"Error fetching player data: {e}")
+        return {}
+
+async def _offload(func, *args):
+    return await run_sync(func)(*args)
+
+def _context() -> EventContext:
+    """Return the app's handler context, built on its first request."""
+    context = getattr(current_app, 'event_context', None)
+    if context is None:
+        # player_get is looked up per call, so a patched one is used
+        context = EventContext(get_async_storage(), lambda tag: player_get(tag), current_app.log_dispatcher, _offload)
+        current_app.event_context = context
+    return context
+
+async def _respond(handler):
+    """Await a handler coroutine and build its Quart response."""
+    reply = await handler
+    if reply.attachment is not None:
+        stream, file_name, mimetype = reply.attachment
+        return await send_file(stream, as_attachment=True, attachment_filename=file_name, mimetype=mimetype)
+    response = jsonify(reply.body) if reply.body is not None else Response('')
+    response.status_code = reply.status
+    if reply.headers:
+        response.headers.update(reply.headers)
+    if reply.etag is not None:
+        set_validators(response, reply.etag, reply.modified)
+    return response
+
+@events_bp.route('', methods=['POST'])
+async def create_event():
+    """Create a new event."""
+    return await _respond(handlers.create_event(_context(), await request.get_json(silent=True)))
+
+@events_bp.route('', methods=['GET'])
+async def list_events():
+    """List all events for a guild."""
+    return await _respond(handlers.list_events(_context(), request))
+
+@events_bp.route('/<event_name>', methods=['GET'])
+async def get_event(event_name):
+    """Get details for a specific event including signups."""
+    return await _respond(handlers.get_event(_context(), request, event_name))
+
+@events_bp.route('/<event_name>/summary', methods=['GET'])
+async def get_event_summary(event_name):
+    """Get an event's metadata and signup aggregates without the signups."""
+    return await _respond(handlers.get_event_summary(_context(), request, event_name))
+
+@events_bp.route('/<event_name>/signup', methods=['POST'])
+async def signup_player(event_name):
+    """Sign up a player for an event."""
+    return await _respond(handlers.signup_player(_context(), await request.get_json(silent=True), event_name))
+
+@events_bp.route('/<event_name>/signups', methods=['GET'])
+async def get_signups(event_name):
+    """Get all signups for an event."""
+    return await _respond(handlers.get_signups(_context(), request, event_name))
+
+@events_bp.route('/<event_name>/export', methods=['GET'])
+async def export_event(event_name):
+    """Export event data to Excel."""
+    return await _respond(handlers.export_event(_context(), request, event_name))
+
+@events_bp.route('/<event_name>/logs', methods=['GET'])
+async def get_logs(event_name):
+    """Get an event's audit log, optionally limited to ``since <= timestamp < until`` (ISO timestamps)."""
+    return await _respond(handlers.get_logs(_context(), request, event_name))
+
+@events_bp.route('/<event_name>/close', methods=['POST'])
+async def close_event(event_name):
+    """Close event registration."""
+    return await _respond(handlers.close_event(_context(), await request.get_json(silent=True), event_name))
+
+@events_bp.route('/<event_name>/check', methods=['POST'])
+async def check_player(event_name):
+    """Check if a player is signed up for an event."""
+    return await _respond(
+        handlers.check_player(_context(), request, await request.get_json(silent=True), event_name)
+    )
+
+@events_bp.route('/<event_name>/remove', methods=['POST'])
+async def remove_player(event_name):
+    """Remove a player from an event."""
+    return await _respond(handlers.remove_player(_context(), await request.get_json(silent=True), event_name))
+
+@events_bp.route('/<event_name>/update_message_id', methods=['POST'])
+async def update_message_id(event_name):
+    """Update the message ID for an event's embed."""
+    return await _respond(handlers.update_message_id(_context(), await request.get_json(silent=True), event_name))
@@ -0,0 +1,79 @@
+# Response compression for the API.
+#
+# Large JSON responses (rosters, listings) are compressed with Brotli or
+# gzip when the client accepts it. Brotli is optional; gzip is always there.
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+# Fast settings: the payloads are small and latency matters more than ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+def available_encodings():
+    """Return the content codings this process can produce, most preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress ``data`` with the ``br`` or ``gzip`` coding."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _compressible(response) -> bool:
+    """Return whether the status, encoding and type of ``response`` allow compressing it."""
+    return not (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or 'Content-Encoding' in response.headers
+        or not response.mimetype.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def _encode(response, data: bytes, min_size: int, accept_encodings) -> None:
+    """Replace the body of ``response`` with its compressed form if worthwhile."""
+    response.vary.add('Accept-Encoding')
+    if len(data) < min_size:
+        return
+
+    encoding = accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+
+def init_compression(app, min_size: int) -> None:
+    """Compress responses of at least ``min_size`` bytes for clients that accept it."""
+
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough or response.is_streamed or not _compressible(response):
+            return response
+        _encode(response, response.get_data(), min_size, request.accept_encodings)
+        return response
+
+
+def init_async_compression(app, min_size: int) -> None:
+    """``init_compression`` for the Quart app; only in-memory bodies are compressed."""
+    from quart import request as async_request
+    from quart.wrappers.response import DataBody
+
+    @app.after_request
+    async def compress_response(response):
+        if not isinstance(response.response, DataBody) or not _compressible(response):
+            return response
+        _encode(response, await response.get_data(), min_size, async_request.accept_encodings)
+        return response
@@ -0,0 +1,61 @@
+# Conditional GET support for the API routes.
+#
+# Every write to an event bumps its ``version`` and ``updated_at``, so a
+# route can build its validators from the event document alone and answer
+# 304 before it reads the signups or serializes anything. The helpers take
+# the Flask or Quart request, so they import neither framework.
+import hashlib
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+
+def _variant(query_string: bytes) -> str:
+    """Short digest of the query, so pages and projections get distinct tags."""
+    return hashlib.sha1(query_string).hexdigest()[:10]
+
+
+def event_etag(event_data: dict, req) -> str:
+    """Return the ETag value of a response built from ``event_data``."""
+    return f"{event_data.get('version', 0)}-{_variant(req.query_string)}"
+
+
+def listing_etag(events: Iterable[dict], req) -> str:
+    """Return the ETag value of a response listing ``events``."""
+    digest = hashlib.sha1(req.query_string)
+    for event in events:
+        digest.update(f"{event.get('id')}\0{event.get('version', 0)}\0".encode())
+    return digest.hexdigest()[:20]
+
+
+def last_modified(*events: dict) -> Optional[datetime]:
+    """Return the latest ``updated_at`` (or ``created_at``) of the events as a UTC datetime."""
+    latest = None
+    for event_data in events:
+        value = event_data.get('updated_at') or event_data.get('created_at')
+        if not value:
+            continue
+        try:
+            stamp = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            continue
+        stamp = stamp.replace(tzinfo=timezone.utc) if stamp.tzinfo is None else stamp
+        latest = stamp if latest is None or stamp > latest else latest
+    return latest
+
+
+def set_validators(response, etag: str, modified: Optional[datetime]):
+    """Attach a weak ETag and Last-Modified; weak because compression may change the bytes."""
+    response.set_etag(etag, weak=True)
+    if modified is not None:
+        response.last_modified = modified
+    return response
+
+
+def is_fresh(etag: str, modified: Optional[datetime], req) -> bool:
+    """Return True if the client's validators still match, so it can be answered with a 304."""
+    if req.if_none_match:
+        return req.if_none_match.contains_weak(etag)
+    if req.if_modified_since and modified is not None:
+        # HTTP dates have a resolution of one second
+        return modified.replace(microsecond=0) <= req.if_modified_since
+    return False
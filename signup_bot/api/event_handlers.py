@@ -0,0 +1,886 @@
+# Event and admin routes shared by the Flask (WSGI) and Quart (ASGI) apps.
+#
+# Each handler takes the request's arguments and JSON body and returns a
+# ``Reply``: the status, JSON body or file, headers and HTTP validators of the
+# response. The ``events`` and ``admin`` modules of ``routes/`` and ``asgi/``
+# only parse the request and turn the reply into their framework's response.
+#
+# Handlers are coroutines written against the ``AsyncStorage`` interface. The
+# ASGI app awaits them; the WSGI app runs them with ``run_inline`` on a
+# storage wrapped by ``InlineStorage``, whose calls complete without ever
+# suspending, so a Flask request never needs an event loop.
+import inspect
+import io
+import math
+import re
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from openpyxl import Workbook
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+from ..utils.player_tags import INVALID_PLAYER_TAG, is_valid_player_tag, normalize_player_tag
+from .conditional import event_etag, is_fresh, last_modified, listing_etag
+from .pagination import page_args, split_page
+from .services import AsyncStorage, CircuitOpen, ProxyUnavailable, RateLimited, SignupResult
+from .services.cache import MISSING
+
+# Event fields returned by the summary endpoint
+SUMMARY_FIELDS = (
+    'event_name', 'is_open', 'signup_count', 'th_composition', 'aggregate_updated_at',
+    'message_id', 'channel_id', 'role_id', 'log_channel_id', 'created_at', 'updated_at', 'version',
+)
+
+# Event fields always read for listings, since the HTTP validators are built from them
+VALIDATOR_FIELDS = ('version', 'updated_at', 'created_at')
+
+# Top-level field names accepted by the fields= projection
+FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Log reason, response message and status for signups the transaction rejected
+SIGNUP_ERRORS = {
+    SignupResult.EVENT_NOT_FOUND: ('Event not found', 'Event not found', 404),
+    SignupResult.EVENT_CLOSED: ('Event registration is closed', 'Event registration is closed', 400),
+    SignupResult.ALREADY_SIGNED_UP: ('Player already signed up for this event', 'You are already signed up for this event', 400),
+}
+
+# Response to a signup whose player lookup found no API budget; sent as a 503 with Retry-After
+RATE_LIMITED_ERROR = 'The Clash of Clans API is busy. Please try again in a moment.'
+
+EXPORT_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Reply:
+    """A handler's response, independent of the framework serving it.
+
+    ``body`` is sent as JSON; a reply with an ``attachment`` (stream, file
+    name, MIME type) sends the file instead, and one with neither is an
+    empty 304. With an ``etag`` the ETag and Last-Modified validators are set.
+    """
+
+    def __init__(self, body: Optional[dict] = None, status: int = 200, headers: Optional[dict] = None,
+                 etag: Optional[str] = None, modified: Optional[datetime] = None, attachment=None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+        self.etag = etag
+        self.modified = modified
+        self.attachment = attachment
+
+
+def error(message: str, status: int, headers: Optional[dict] = None) -> Reply:
+    return Reply({'error': message}, status, headers)
+
+
+class EventContext:
+    """What the handlers use of the app serving them.
+
+    Args:
+        storage: An ``AsyncStorage``, or a sync ``Storage`` in ``InlineStorage``.
+        player_get: Coroutine function returning a player's profile.
+        log_dispatcher: Queues audit log entries (``submit`` does not block).
+        offload: Coroutine function running CPU-bound ``func(*args)``, e.g. off the event loop.
+    """
+
+    def __init__(self, storage, player_get: Callable[[str], Awaitable[dict]], log_dispatcher,
+                 offload: Optional[Callable[..., Awaitable]] = None):
+        self.storage = storage
+        self.player_get = player_get
+        self.log_dispatcher = log_dispatcher
+        self.offload = offload or inline_async(lambda func, *args: func(*args))
+
+
+def inline_async(func: Callable) -> Callable[..., Awaitable]:
+    """Return a coroutine function calling the blocking ``func``, for ``run_inline``."""
+    async def call(*args, **kwargs):
+        return func(*args, **kwargs)
+    return call
+
+
+class InlineStorage:
+    """Presents a sync ``Storage`` with the ``AsyncStorage`` interface, for ``run_inline``.
+
+    Methods that are coroutines on ``AsyncStorage`` are wrapped with
+    ``inline_async``; its plain methods, like ``invalidate_leader_roles``,
+    are passed through.
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getattr__(self, name):
+        method = getattr(self._storage, name)
+        if inspect.iscoroutinefunction(getattr(AsyncStorage, name, None)):
+            return inline_async(method)
+        return method
+
+
+def run_inline(coroutine):
+    """Run a handler on the calling thread and return its result.
+
+    Only for handlers whose awaits all complete at once (``inline_async``
+    calls); one that suspends raises RuntimeError.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError("Handler suspended; run it on an event loop instead")
+
+
+def rate_limited_headers(error: RateLimited) -> dict:
+    return {'Retry-After': str(max(1, math.ceil(error.retry_after)))}
+
+def signup_details(player_name, player_tag, player_th, pending):
+    """Return the log details of a successful signup."""
+    if pending:
+        return f"Player {player_tag} signed up; name and TH will be filled in once the Clash of Clans API is back"
+    return f"Player {player_name} (TH{player_th}) signed up successfully"
+
+def build_log_entry(guild_id: str, event_name: str, action: str, user_name: str,
+                    user_avatar_url: str, success: bool, details: str = "",
+                    error_reason: str = "", additional_data: dict = None) -> dict:
+    """Build the log entry the bot posts to an event's log channel."""
+    return {
+        'guild_id': guild_id,
+        'event_name': event_name,
+        'action': action,
+        'user_name': user_name,
+        'user_avatar_url': user_avatar_url,
+        'success': success,
+        'details': details,
+        'error_reason': error_reason,
+        'additional_data': additional_data or {},
+        'timestamp': datetime.utcnow().isoformat(),
+        'processed': False
+    }
+
+def log_event_action(ctx: EventContext, guild_id: str, event_name: str, action: str, user_name: str,
+                     user_avatar_url: str, success: bool, details: str = "",
+                     error_reason: str = "", additional_data: dict = None, event_data=MISSING):
+    """Queue a log entry for the event's log channel; it is written in the background.
+
+    Pass the event the handler already loaded as ``event_data`` (None if it
+    does not exist) so the log channel is checked without reading it again.
+    """
+    try:
+        log_entry = build_log_entry(
+            guild_id, event_name, action, user_name, user_avatar_url, success,
+            details, error_reason, additional_data
+        )
+        ctx.log_dispatcher.submit(guild_id, event_name, log_entry, event_data)
+
+    except Exception as e:
+        print(f"Error logging action: {e}")
+
+def build_export(event_name: str, signups: list) -> io.BytesIO:
+    """Build the Excel export of an event's signups."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = event_name[:31]  # Excel sheet name limit
+
+    # Add headers
+    headers = ['#', 'Player Name', 'Player Tag', 'TH Level', 'Discord Name', 'Signed Up At']
+    for col_num, header in enumerate(headers, 1):
+        col_letter = get_column_letter(col_num)
+        ws[f'{col_letter}1'] = header
+        ws[f'{col_letter}1'].font = Font(bold=True)
+
+    # Add data
+    for row_num, signup in enumerate(signups, 2):
+        ws[f'A{row_num}'] = signup.get('position', '')
+        ws[f'B{row_num}'] = signup.get('player_name', '')
+        ws[f'C{row_num}'] = signup.get('player_tag', '')
+        ws[f'D{row_num}'] = signup.get('player_th', '')
+        ws[f'E{row_num}'] = signup.get('discord_name', '')
+        ws[f'F{row_num}'] = signup.get('signed_up_at', '')
+
+    # Auto-adjust column widths
+    for column in ws.columns:
+        max_length = 0
+        column_letter = column[0].column_letter
+        for cell in column:
+            try:
+                if len(str(cell.value)) > max_length:
+                    max_length = len(cell.value)
+            except:
+                pass
+        adjusted_width = (max_length + 2) * 1.2
+        ws.column_dimensions[column_letter].width = adjusted_width
+
+    # Save to bytes
+    file_stream = io.BytesIO()
+    wb.save(file_stream)
+    file_stream.seek(0)
+    return file_stream
+
+def fields_arg(args):
+    """Return the field names of a ``fields=a,b`` argument, or None for every field.
+
+    Raises ValueError for names that are not plain top-level fields.
+    """
+    value = args.get('fields')
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    invalid = [field for field in fields if not FIELD_NAME.match(field)]
+    if invalid:
+        raise ValueError(f"Invalid fields: {', '.join(invalid)}")
+    return fields
+
+async def is_user_leader(ctx: EventContext, guild_id: str, user_roles: list) -> bool:
+    """Check if user has any leader role."""
+    try:
+        leader_roles = await ctx.storage.get_leader_roles(guild_id)
+
+        if leader_roles is None:
+            return False
+
+        return any(role_id in leader_roles for role_id in user_roles)
+
+    except Exception as e:
+        print(f"Error checking leader role: {e}")
+        return False
+
+def not_modified(etag, modified, req) -> Optional[Reply]:
+    """Return an empty 304 reply if the client's copy is current, else None."""
+    if is_fresh(etag, modified, req):
+        return Reply(status=304, etag=etag, modified=modified)
+    return None
+
+async def create_event(ctx: EventContext, data: dict) -> Reply:
+    """Create a new event."""
+    try:
+        event_name = data.get('event_name')
+        guild_id = data.get('guild_id')
+        channel_id = data.get('channel_id')
+        role_id = data.get('role_id')  # Optional role ID
+        log_channel_id = data.get('log_channel_id')  # Optional log channel ID
+
+        if not event_name or not guild_id:
+            return error('Event name and guild ID are required', 400)
+
+        # Check if user is a leader
+        if not await is_user_leader(ctx, guild_id, data.get('user_roles', [])):
+            log_event_action(
+                ctx,
+                guild_id=str(guild_id),
+                event_name=event_name,
+                action='create',
+                user_name=data.get('user_name', 'Unknown User'),
+                user_avatar_url=data.get('user_avatar_url', ''),
+                success=False,
+                error_reason='User does not have leader permissions'
+            )
+            return error('You must be a leader to create events', 403)
+
+        # Create the event
+        event_data = {
+            'event_name': event_name,
+            'created_at': datetime.utcnow().isoformat(),
+            'signup_count': 0,
+            'th_composition': {},
+            'is_open': True,
+            'embed': {
+                'title': event_name,
+                'description': 'Event roster and signups',
+                'fields': [
+                    {'name': 'Total Signups', 'value': '0', 'inline': False},
+                    {'name': 'TH Composition', 'value': 'No signups yet', 'inline': False}
+                ],
+                'color': 0x00ff00
+            },
+            'channel_id': channel_id
+        }
+        if role_id:
+            event_data['role_id'] = role_id
+        if log_channel_id:
+            event_data['log_channel_id'] = log_channel_id
+
+        # Create the event unless one with this name already exists
+        if not await ctx.storage.create_event(guild_id, event_name, event_data):
+            return error('Event with this name already exists', 400)
+
+        log_event_action(
+            ctx,
+            guild_id=str(guild_id),
+            event_name=event_name,
+            event_data=event_data,
+            action='create',
+            user_name=data.get('user_name', 'Unknown User'),
+            user_avatar_url=data.get('user_avatar_url', ''),
+            success=True,
+            details=f"Event '{event_name}' created successfully",
+            additional_data={
+                'channel_id': channel_id,
+                'role_id': role_id,
+                'log_channel_id': log_channel_id
+            }
+        )
+
+        return Reply({'message': 'Event created successfully', 'event_name': event_name}, 201)
+
+    except Exception as e:
+        data = data or {}
+        log_event_action(
+            ctx,
+            guild_id=str(data.get('guild_id', '')),
+            event_name=data.get('event_name', ''),
+            action='create',
+            user_name=data.get('user_name', 'Unknown User'),
+            user_avatar_url=data.get('user_avatar_url', ''),
+            success=False,
+            error_reason=str(e)
+        )
+        return error(str(e), 500)
+
+async def list_events(ctx: EventContext, req) -> Reply:
+    """List all events for a guild."""
+    try:
+        guild_id = req.args.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        try:
+            limit, start_after = page_args(req.args, str)
+            fields = fields_arg(req.args)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        # Get the events for the guild, one extra to know if there is another page
+        read_fields = fields + [f for f in VALIDATOR_FIELDS if f not in fields] if fields else None
+        events = await ctx.storage.list_events(
+            guild_id, limit=limit + 1 if limit else None, start_after=start_after, fields=read_fields
+        )
+        events, next_cursor = split_page(events, limit, lambda event: event['id'])
+
+        etag, modified = listing_etag(events, req), last_modified(*events)
+        cached = not_modified(etag, modified, req)
+        if cached is not None:
+            return cached
+
+        if fields:
+            for event in events:
+                for field in VALIDATOR_FIELDS:
+                    if field not in fields:
+                        event.pop(field, None)
+
+        return Reply({'events': events, 'next_cursor': next_cursor}, etag=etag, modified=modified)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_event(ctx: EventContext, req, event_name: str) -> Reply:
+    """Get details for a specific event including signups."""
+    try:
+        guild_id = req.args.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        try:
+            limit, start_after = page_args(req.args, int)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        event_data = await ctx.storage.get_event(guild_id, event_name)
+
+        if event_data is None:
+            return error('Event not found', 404)
+
+        event_data['id'] = event_name
+
+        # Signup count and TH composition are kept on the event document;
+        # events from before that are counted once and stored
+        if 'th_composition' not in event_data:
+            event_data.update(await ctx.storage.refresh_aggregate(guild_id, event_name) or {})
+
+        # Answer from the event document alone if the client's copy is current
+        etag, modified = event_etag(event_data, req), last_modified(event_data)
+        cached = not_modified(etag, modified, req)
+        if cached is not None:
+            return cached
+
+        # Get signups for the event, a page at a time if a limit was given
+        signups = await ctx.storage.list_signups(
+            guild_id, event_name, limit=limit + 1 if limit else None, start_after=start_after
+        )
+        signups, next_cursor = split_page(signups, limit, lambda signup: signup['index'])
+        for signup in signups:
+            signup.pop('id', None)
+
+        event_data['signups'] = signups
+        event_data['next_cursor'] = next_cursor
+
+        return Reply(event_data, etag=etag, modified=modified)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_event_summary(ctx: EventContext, req, event_name: str) -> Reply:
+    """Get an event's metadata and signup aggregates without the signups."""
+    try:
+        guild_id = req.args.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        # A single read of the event document
+        event_data = await ctx.storage.get_event(guild_id, event_name)
+
+        if event_data is None:
+            return error('Event not found', 404)
+
+        if 'th_composition' not in event_data:
+            event_data.update(await ctx.storage.refresh_aggregate(guild_id, event_name) or {})
+
+        etag, modified = event_etag(event_data, req), last_modified(event_data)
+        cached = not_modified(etag, modified, req)
+        if cached is not None:
+            return cached
+
+        summary = {field: event_data.get(field) for field in SUMMARY_FIELDS}
+        summary['id'] = event_name
+        summary['th_composition'] = summary['th_composition'] or {}
+        summary['signup_count'] = summary['signup_count'] or 0
+
+        return Reply(summary, etag=etag, modified=modified)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def signup_player(ctx: EventContext, data: dict, event_name: str) -> Reply:
+    """Sign up a player for an event."""
+    try:
+        player_tag = normalize_player_tag(data.get('player_tag'))
+        discord_name = data.get('discord_name')
+        guild_id = data.get('guild_id')
+        discord_user_id = data.get('discord_user_id')
+
+        if not all([player_tag, discord_name, guild_id]):
+            return error('Missing required fields', 400)
+
+        # Malformed tags are rejected before any database read or API call
+        if not is_valid_player_tag(player_tag):
+            return error(INVALID_PLAYER_TAG, 400)
+
+        def log_failure(error_reason):
+            log_event_action(
+                ctx,
+                guild_id=str(guild_id),
+                event_name=event_name,
+                event_data=event_data,
+                action='signup',
+                user_name=discord_name,
+                user_avatar_url=data.get('user_avatar_url', ''),
+                success=False,
+                error_reason=error_reason
+            )
+
+        # Check if event exists and is open
+        event_data = await ctx.storage.get_event_metadata(guild_id, event_name)
+
+        if event_data is None:
+            log_failure('Event not found')
+            return error('Event not found', 404)
+
+        if not event_data.get('is_open', True):
+            log_failure('Event registration is closed')
+            return error('Event registration is closed', 400)
+
+        # Check if player is already signed up (a point read on the tag's document)
+        if await ctx.storage.find_signup(guild_id, event_name, player_tag) is not None:
+            log_failure('Player already signed up for this event')
+            return error('You are already signed up for this event', 400)
+
+        # Get player data from Clash of Clans API
+        pending = False
+        try:
+            player_data = await ctx.player_get(player_tag)
+            if player_data:
+                player_name = player_data.get('name', 'Unknown')
+                player_th = player_data.get('townHallLevel', 0)
+            else:
+                raise Exception('Please check the player tag.')
+        except RateLimited as e:
+            log_failure(str(e))
+            return error(RATE_LIMITED_ERROR, 503, rate_limited_headers(e))
+        except (CircuitOpen, ProxyUnavailable):
+            # The proxy is down or not answering: take the signup with the tag only, the enrichment worker
+            # fills it in
+            player_name, player_th, pending = player_tag, 0, True
+        except Exception as e:
+            log_failure(f'Failed to fetch player data: {str(e)}')
+            return error('Failed to fetch player data. Please check the player tag.', 400)
+
+        signup_data = {
+            'player_name': player_name,
+            'player_tag': player_tag,
+            'player_th': player_th,
+            'discord_name': discord_name,
+            'discord_user_id': discord_user_id,
+            'signed_up_at': datetime.utcnow().isoformat()
+        }
+        if pending:
+            signup_data['pending_enrichment'] = True
+
+        # Re-check the event and the tag, allocate the next index and insert the
+        # signup in one transaction; the checks above only avoid a wasted lookup
+        result, signup_data = await ctx.storage.add_signup(guild_id, event_name, signup_data)
+
+        if result != SignupResult.CREATED:
+            error_reason, message, status = SIGNUP_ERRORS[result]
+            log_failure(error_reason)
+            return error(message, status)
+
+        log_event_action(
+            ctx,
+            guild_id=str(guild_id),
+            event_name=event_name,
+            event_data=event_data,
+            action='signup',
+            user_name=discord_name,
+            user_avatar_url=data.get('user_avatar_url', ''),
+            success=True,
+            details=signup_details(player_name, player_tag, player_th, pending),
+            additional_data={
+                'player_name': player_name,
+                'player_tag': player_tag,
+                'player_th': player_th,
+                'signup_index': signup_data['index']
+            }
+        )
+
+        return Reply({
+            'message': 'Signup successful',
+            'player_name': player_name,
+            'player_th': player_th,
+            'pending_enrichment': pending,
+            'role_id': event_data.get('role_id'),  # Return role_id if it exists
+            'discord_user_id': discord_user_id
+        }, 201)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_signups(ctx: EventContext, req, event_name: str) -> Reply:
+    """Get all signups for an event."""
+    try:
+        guild_id = req.args.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        try:
+            limit, start_after = page_args(req.args, int)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        event_data = await ctx.storage.get_event(guild_id, event_name)
+        if event_data is None:
+            return error('Event not found', 404)
+
+        etag, modified = event_etag(event_data, req), last_modified(event_data)
+        cached = not_modified(etag, modified, req)
+        if cached is not None:
+            return cached
+
+        signups = await ctx.storage.list_signups(
+            guild_id, event_name, limit=limit + 1 if limit else None, start_after=start_after
+        )
+        signups, next_cursor = split_page(signups, limit, lambda signup: signup['index'])
+
+        # A page holds only part of the roster, so report the event's total
+        count = len(signups) if limit is None and start_after is None else event_data.get('signup_count', 0)
+
+        return Reply({'signups': signups, 'count': count, 'next_cursor': next_cursor}, etag=etag, modified=modified)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def export_event(ctx: EventContext, req, event_name: str) -> Reply:
+    """Export event data to Excel."""
+    try:
+        guild_id = req.args.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        event_data = await ctx.storage.get_event_metadata(guild_id, event_name)
+        if event_data is None:
+            return error('Event not found', 404)
+
+        signups = await ctx.storage.list_signups(guild_id, event_name)
+
+        # Building the workbook is CPU-bound; the ASGI app keeps it off the event loop
+        file_stream = await ctx.offload(build_export, event_name, signups)
+
+        log_event_action(
+            ctx,
+            guild_id=str(guild_id),
+            event_name=event_name,
+            event_data=event_data,
+            action='export',
+            user_name=req.args.get('user_name', 'Unknown User'),
+            user_avatar_url=req.args.get('user_avatar_url', ''),
+            success=True,
+            details=f"Event '{event_name}' data exported successfully",
+            additional_data={
+                'signup_count': len(signups),
+                'file_name': f"{event_name}_export.xlsx"
+            }
+        )
+
+        return Reply(attachment=(file_stream, f"{event_name}_export.xlsx", EXPORT_MIMETYPE))
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_logs(ctx: EventContext, req, event_name: str) -> Reply:
+    """Get an event's audit log, optionally limited to ``since <= timestamp < until`` (ISO timestamps)."""
+    try:
+        guild_id = req.args.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        if await ctx.storage.get_event_metadata(guild_id, event_name) is None:
+            return error('Event not found', 404)
+
+        logs = await ctx.storage.read_logs(guild_id, event_name, req.args.get('since'), req.args.get('until'))
+        return Reply({'event_name': event_name, 'logs': logs, 'count': len(logs)})
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def close_event(ctx: EventContext, data: dict, event_name: str) -> Reply:
+    """Close event registration."""
+    try:
+        guild_id = data.get('guild_id')
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        event_data = await ctx.storage.get_event_metadata(guild_id, event_name)
+        if event_data is None:
+            return error('Event not found', 404)
+
+        if not await is_user_leader(ctx, guild_id, data.get('user_roles', [])):
+            log_event_action(
+                ctx,
+                guild_id=str(guild_id),
+                event_name=event_name,
+                event_data=event_data,
+                action='close',
+                user_name=data.get('user_name', 'Unknown User'),
+                user_avatar_url=data.get('user_avatar_url', ''),
+                success=False,
+                error_reason='User does not have leader permissions'
+            )
+            return error('You must be a leader to close an event', 403)
+
+        await ctx.storage.update_event(guild_id, event_name, {'is_open': False})
+
+        log_event_action(
+            ctx,
+            guild_id=str(guild_id),
+            event_name=event_name,
+            event_data=event_data,
+            action='close',
+            user_name=data.get('user_name', 'Unknown User'),
+            user_avatar_url=data.get('user_avatar_url', ''),
+            success=True,
+            details=f"Event '{event_name}' registration closed successfully"
+        )
+
+        return Reply({'message': 'Event registration closed successfully'})
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def check_player(ctx: EventContext, req, data: dict, event_name: str) -> Reply:
+    """Check if a player is signed up for an event."""
+    try:
+        player_tag = normalize_player_tag(data.get('player_tag'))
+        guild_id = data.get('guild_id')
+
+        if not player_tag or not guild_id:
+            return error('Player tag and guild ID are required', 400)
+
+        if await ctx.storage.get_event_metadata(guild_id, event_name) is None:
+            return error('Event not found', 404)
+
+        signup_data = await ctx.storage.find_signup(guild_id, event_name, player_tag)
+
+        if signup_data is None:
+            return Reply({
+                'is_signed_up': False,
+                'message': 'Player is not signed up for this event'
+            })
+
+        player_data = {
+            'name': signup_data.get('player_name'),
+            'th_level': signup_data.get('player_th'),
+            'discord_name': signup_data.get('discord_name'),
+            'index': signup_data.get('index'),
+        }
+        # The display position costs a count query, so only clients asking for it pay for it
+        if req.args.get('position') in ('1', 'true'):
+            player_data['position'] = await ctx.storage.signup_position(guild_id, event_name, signup_data)
+        return Reply({
+            'is_signed_up': True,
+            'message': 'Player is signed up for this event',
+            'player_data': player_data
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def remove_player(ctx: EventContext, data: dict, event_name: str) -> Reply:
+    """Remove a player from an event."""
+    try:
+        player_tag = normalize_player_tag(data.get('player_tag'))
+        discord_name = data.get('discord_name')
+        guild_id = data.get('guild_id')
+
+        if not guild_id:
+            return error('Guild ID is required', 400)
+
+        is_leader = await is_user_leader(ctx, guild_id, data.get('user_roles', []))
+
+        if not all([player_tag, discord_name, guild_id]):
+            return error('Missing required fields', 400)
+
+        event_data = await ctx.storage.get_event_metadata(guild_id, event_name)
+
+        if event_data is None:
+            return error('Event not found', 404)
+
+        signup_data = await ctx.storage.find_signup(guild_id, event_name, player_tag)
+
+        if signup_data is None:
+            return error('Player not found in this event', 404)
+
+        if not is_leader and signup_data.get('discord_name') != discord_name:
+            return error('You can only remove your own signup', 403)
+
+        player_data = {
+            'name': signup_data.get('player_name'),
+            'th_level': signup_data.get('player_th'),
+            'discord_user_id': signup_data.get('discord_user_id')
+        }
+        is_self_removal = signup_data.get('discord_name') == discord_name
+
+        # Delete the signup and decrement the total count; later signups keep
+        # their index, so this costs the same however large the event is
+        if not await ctx.storage.remove_signup(guild_id, event_name, player_tag):
+            return error('Player not found in this event', 404)
+
+        log_event_action(
+            ctx,
+            guild_id=str(guild_id),
+            event_name=event_name,
+            event_data=event_data,
+            action='remove',
+            user_name=discord_name,
+            user_avatar_url=data.get('user_avatar_url', ''),
+            success=True,
+            details=f"Player {player_data['name']} (TH{player_data['th_level']}) removed from event",
+            additional_data={
+                'player_name': player_data['name'],
+                'player_th': player_data['th_level'],
+                'removed_index': signup_data.get('index', 0),
+                'is_self_removal': is_self_removal
+            }
+        )
+
+        return Reply({
+            'message': 'Player removed successfully',
+            'player_data': player_data,
+            'role_id': event_data.get('role_id'),  # Return role_id if it exists
+            'is_self_removal': is_self_removal
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def update_message_id(ctx: EventContext, data: dict, event_name: str) -> Reply:
+    """Update the message ID for an event's embed."""
+    try:
+        guild_id = data.get('guild_id')
+        message_id = data.get('message_id')
+        channel_id = data.get('channel_id')
+
+        if not guild_id or not message_id:
+            return error('Guild ID and message ID are required', 400)
+
+        if await ctx.storage.get_event_metadata(guild_id, event_name) is None:
+            return error('Event not found', 404)
+        update_data = {'message_id': message_id}
+        if channel_id:
+            update_data['channel_id'] = channel_id
+        await ctx.storage.update_event(guild_id, event_name, update_data)
+        return Reply({'message': 'Message ID updated successfully'})
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def add_leader_role(ctx: EventContext, data: dict, guild_id: str) -> Reply:
+    """Add a role as a leader role."""
+    try:
+        role_id = data.get('role_id')
+
+        if not role_id:
+            return error('Role ID is required', 400)
+
+        # Get or create the leader roles document, bypassing this process's cache
+        # so a change made elsewhere is not overwritten
+        ctx.storage.invalidate_leader_roles(guild_id)
+        leader_roles = await ctx.storage.get_leader_roles(guild_id)
+
+        if leader_roles is not None:
+            # Add the role if it's not already a leader
+            if role_id not in leader_roles:
+                leader_roles.append(role_id)
+                await ctx.storage.set_leader_roles(guild_id, leader_roles)
+        else:
+            # Create new leader roles document
+            await ctx.storage.set_leader_roles(guild_id, [role_id])
+
+        return Reply({'message': 'Leader role added successfully'})
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def remove_leader_role(ctx: EventContext, data: dict, guild_id: str) -> Reply:
+    """Remove a leader role."""
+    try:
+        role_id = data.get('role_id')
+
+        if not role_id:
+            return error('Role ID is required', 400)
+
+        # Get the leader roles document, bypassing this process's cache
+        ctx.storage.invalidate_leader_roles(guild_id)
+        leader_roles = await ctx.storage.get_leader_roles(guild_id)
+
+        if leader_roles is None:
+            return error('No leader roles found', 404)
+
+        # Remove the role if it exists
+        if role_id in leader_roles:
+            leader_roles.remove(role_id)
+            await ctx.storage.set_leader_roles(guild_id, leader_roles)
+            return Reply({'message': 'Leader role removed successfully'})
+        else:
+            return error('Role is not a leader role', 400)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_leader_roles(ctx: EventContext, guild_id: str) -> Reply:
+    """Get all leader roles for a server."""
+    try:
+        # Get the leader roles document
+        leader_roles = await ctx.storage.get_leader_roles(guild_id)
+
+        return Reply({'leader_role_ids': leader_roles or []})
+
+    except Exception as e:
+        return error(str(e), 500)
@@ -0,0 +1,268 @@
+"""
+Data migrations for the Signup Bot API.
+
+Usage:
+    python -m signup_bot.api.migrate signup-ids [--guild GUILD_ID] [--dry-run]
+    python -m signup_bot.api.migrate event-aggregates [--guild GUILD_ID] [--dry-run]
+    python -m signup_bot.api.migrate log-buckets [--guild GUILD_ID] [--dry-run] [--keep]
+"""
+import argparse
+import logging
+from datetime import datetime
+
+from firebase_admin import firestore
+
+from ..utils.firestore_limits import MAX_WRITES_PER_COMMIT
+from ..utils.log_buckets import BUCKETS_COLLECTION, bucket_doc_id, bucket_id, compact_entry, split_parts
+from ..utils.player_tags import normalize_player_tag, signup_doc_id
+from .services.storage import count_th_levels
+
+logger = logging.getLogger(__name__)
+
+
+class BatchCommitter:
+    """Groups writes into batches that stay under Firestore's per-commit limit."""
+
+    def __init__(self, db, dry_run: bool = False):
+        self.db = db
+        self.dry_run = dry_run
+        self.writes = 0
+        self.commits = 0
+        self._batch = db.batch()
+        self._pending = 0
+
+    def reserve(self, writes: int) -> None:
+        """Commit early if the next ``writes`` operations would not fit."""
+        if self._pending + writes > MAX_WRITES_PER_COMMIT:
+            self.flush()
+
+    def create(self, reference, data):
+        self._batch.create(reference, data)
+        self._pending += 1
+
+    def set(self, reference, data):
+        self._batch.set(reference, data)
+        self._pending += 1
+
+    def update(self, reference, data):
+        self._batch.update(reference, data)
+        self._pending += 1
+
+    def delete(self, reference):
+        self._batch.delete(reference)
+        self._pending += 1
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        if not self.dry_run:
+            self._batch.commit()
+        self.writes += self._pending
+        self.commits += 1
+        self._batch = self.db.batch()
+        self._pending = 0
+
+
+def _touched(fields: dict) -> dict:
+    """Bump the event version so cached API responses are revalidated."""
+    return dict(fields, version=firestore.Increment(1), updated_at=datetime.utcnow().isoformat())
+
+
+def _guild_refs(db, guild_id=None):
+    servers = db.collection('servers')
+    if guild_id:
+        return [servers.document(str(guild_id))]
+    return list(servers.list_documents())
+
+
+def migrate_signup_ids(db, guild_id=None, dry_run: bool = False) -> dict:
+    """Move signups to documents keyed by their normalized player tag.
+
+    Duplicate signups of the same tag are collapsed into the earliest one,
+    in which case the remaining signups are renumbered and the event's
+    ``signup_count`` and ``th_composition`` are corrected.
+
+    Returns counters describing what was (or, with ``dry_run``, would be) changed.
+    """
+    stats = {'events': 0, 'signups': 0, 'moved': 0, 'duplicates': 0, 'writes': 0, 'commits': 0}
+    committer = BatchCommitter(db, dry_run=dry_run)
+
+    for server_ref in _guild_refs(db, guild_id):
+        for event_doc in server_ref.collection('events').stream():
+            stats['events'] += 1
+            signups_ref = event_doc.reference.collection('signups')
+            signup_docs = sorted(
+                signups_ref.stream(),
+                key=lambda doc: (doc.to_dict().get('index', 0), doc.to_dict().get('signed_up_at', ''))
+            )
+
+            seen = set()
+            kept = []
+            for doc in signup_docs:
+                stats['signups'] += 1
+                data = doc.to_dict()
+                data['player_tag'] = normalize_player_tag(data.get('player_tag'))
+                target_id = signup_doc_id(data['player_tag'])
+                if not target_id or target_id in seen:
+                    stats['duplicates'] += 1
+                    committer.reserve(1)
+                    committer.delete(doc.reference)
+                    continue
+                seen.add(target_id)
+                kept.append((doc, target_id, data))
+
+            renumber = len(kept) != len(signup_docs)
+            changed = renumber
+            for position, (doc, target_id, data) in enumerate(kept, 1):
+                if renumber:
+                    data['index'] = position
+                if doc.id == target_id and not renumber:
+                    continue
+                # Write the new document and delete the old one in the same batch
+                committer.reserve(2)
+                committer.set(signups_ref.document(target_id), data)
+                changed = True
+                if doc.id != target_id:
+                    committer.delete(doc.reference)
+                    stats['moved'] += 1
+
+            if renumber:
+                committer.reserve(1)
+                committer.update(event_doc.reference, _touched({
+                    'signup_count': len(kept),
+                    'last_index': len(kept),
+                    'th_composition': count_th_levels(data for _, _, data in kept),
+                    'aggregate_updated_at': datetime.utcnow().isoformat(),
+                }))
+            elif changed:
+                committer.reserve(1)
+                committer.update(event_doc.reference, _touched({}))
+
+    committer.flush()
+    stats['writes'] = committer.writes
+    stats['commits'] = committer.commits
+    return stats
+
+
+def backfill_event_aggregates(db, guild_id=None, dry_run: bool = False) -> dict:
+    """Store ``signup_count`` and ``th_composition`` on events that predate the aggregate.
+
+    Events that already carry the aggregate are left alone; the API keeps those
+    up to date with every signup and removal.
+    """
+    stats = {'events': 0, 'updated': 0, 'signups': 0, 'writes': 0, 'commits': 0}
+    committer = BatchCommitter(db, dry_run=dry_run)
+
+    for server_ref in _guild_refs(db, guild_id):
+        for event_doc in server_ref.collection('events').stream():
+            stats['events'] += 1
+            if 'th_composition' in event_doc.to_dict():
+                continue
+            signups = [doc.to_dict() for doc in event_doc.reference.collection('signups').stream()]
+            stats['signups'] += len(signups)
+            stats['updated'] += 1
+            committer.reserve(1)
+            committer.update(event_doc.reference, _touched({
+                'signup_count': len(signups),
+                'th_composition': count_th_levels(signups),
+                'aggregate_updated_at': datetime.utcnow().isoformat(),
+            }))
+
+    committer.flush()
+    stats['writes'] = committer.writes
+    stats['commits'] = committer.commits
+    return stats
+
+
+def migrate_log_buckets(db, guild_id=None, dry_run: bool = False, keep: bool = False) -> dict:
+    """Move log documents into compact hourly buckets (see ``utils.log_buckets``).
+
+    An hour is moved once the bot has posted all of its entries, if it is over
+    and has no bucket yet, so buckets the API is appending to are never touched;
+    run it again later for the rest. The log documents are deleted unless ``keep``.
+    """
+    stats = {'events': 0, 'logs': 0, 'moved': 0, 'buckets': 0, 'hours_pending': 0, 'hours_existing': 0,
+             'writes': 0, 'commits': 0}
+    committer = BatchCommitter(db, dry_run=dry_run)
+    current_hour = bucket_id(datetime.utcnow().isoformat())
+
+    for server_ref in _guild_refs(db, guild_id):
+        # Events are not read; deleted events may still hold logs
+        for event_ref in server_ref.collection('events').list_documents():
+            stats['events'] += 1
+            hours = {}
+            for doc in event_ref.collection('logs').order_by('timestamp').stream():
+                stats['logs'] += 1
+                data = doc.to_dict()
+                hours.setdefault(bucket_id(data.get('timestamp') or ''), []).append((doc, data))
+
+            buckets_ref = event_ref.collection(BUCKETS_COLLECTION)
+            for bucket, docs in hours.items():
+                if not bucket or bucket >= current_hour or not all(data.get('processed') for _, data in docs):
+                    stats['hours_pending'] += 1
+                    continue
+                if buckets_ref.document(bucket).get().exists:
+                    stats['hours_existing'] += 1
+                    continue
+                # An hour too large for one document continues in further parts
+                for part, entries in enumerate(split_parts([compact_entry(data) for _, data in docs])):
+                    committer.reserve(1)
+                    committer.create(buckets_ref.document(bucket_doc_id(bucket, part)), {
+                        'hour': bucket, 'entries': entries, 'delivered': len(entries), 'pending': False,
+                    })
+                    stats['buckets'] += 1
+                stats['moved'] += len(docs)
+                if not keep:
+                    # Queued after the bucket, so no entry is deleted before it is copied
+                    for doc, _ in docs:
+                        committer.reserve(1)
+                        committer.delete(doc.reference)
+
+    committer.flush()
+    stats['writes'] = committer.writes
+    stats['commits'] = committer.commits
+    return stats
+
+
+def main(argv=None):
+    """Run a migration from the command line."""
+    parser = argparse.ArgumentParser(description="Signup Bot data migrations")
+    subparsers = parser.add_subparsers(dest='migration', required=True)
+
+    signup_ids = subparsers.add_parser('signup-ids', help="Key signup documents by normalized player tag")
+    signup_ids.add_argument('--guild', help="Only migrate this guild ID")
+    signup_ids.add_argument('--dry-run', action='store_true', help="Report changes without writing them")
+
+    aggregates = subparsers.add_parser('event-aggregates', help="Store signup counts and TH composition on events")
+    aggregates.add_argument('--guild', help="Only migrate this guild ID")
+    aggregates.add_argument('--dry-run', action='store_true', help="Report changes without writing them")
+
+    log_buckets = subparsers.add_parser('log-buckets', help="Move posted log entries into hourly buckets")
+    log_buckets.add_argument('--guild', help="Only migrate this guild ID")
+    log_buckets.add_argument('--dry-run', action='store_true', help="Report changes without writing them")
+    log_buckets.add_argument('--keep', action='store_true', help="Keep the log documents after copying them")
+
+    args = parser.parse_args(argv)
+
+    from . import _init_firestore
+    db = _init_firestore()
+
+    if args.migration == 'signup-ids':
+        stats = migrate_signup_ids(db, guild_id=args.guild, dry_run=args.dry_run)
+        prefix = "[dry run] " if args.dry_run else ""
+        logger.info(f"{prefix}Migrated signup IDs: {stats}")
+        print(f"{prefix}{stats}")
+    elif args.migration == 'event-aggregates':
+        stats = backfill_event_aggregates(db, guild_id=args.guild, dry_run=args.dry_run)
+        prefix = "[dry run] " if args.dry_run else ""
+        logger.info(f"{prefix}Backfilled event aggregates: {stats}")
+        print(f"{prefix}{stats}")
+    elif args.migration == 'log-buckets':
+        stats = migrate_log_buckets(db, guild_id=args.guild, dry_run=args.dry_run, keep=args.keep)
+        prefix = "[dry run] " if args.dry_run else ""
+        logger.info(f"{prefix}Moved logs into hourly buckets: {stats}")
+        print(f"{prefix}{stats}")
+
+
+if __name__ == "__main__":
+    main()
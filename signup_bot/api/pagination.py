@@ -0,0 +1,55 @@
+# Cursor pagination for the API listings.
+#
+# A cursor is the order key of the last item on a page, encoded so clients
+# treat it as opaque. Storage resumes the query with Firestore's start_after.
+import base64
+import json
+from typing import Optional, Tuple
+
+# Largest page a client may ask for
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(value) -> str:
+    """Encode an order key as an opaque, URL-safe cursor."""
+    raw = json.dumps(value, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor made by ``encode_cursor``. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def page_args(args, key_type) -> Tuple[Optional[int], Optional[object]]:
+    """Read ``limit`` and ``cursor`` from request arguments.
+
+    Returns ``(limit, start_after)``; ``limit`` is None when the client wants every item.
+    Raises ValueError for a malformed limit or a cursor whose key is not a ``key_type``.
+    """
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    cursor = args.get('cursor')
+    start_after = decode_cursor(cursor) if cursor else None
+    if start_after is not None and (not isinstance(start_after, key_type) or isinstance(start_after, bool)):
+        raise ValueError('Invalid cursor')
+    return limit, start_after
+
+
+def split_page(items: list, limit: Optional[int], cursor_key) -> Tuple[list, Optional[str]]:
+    """Trim a page fetched with ``limit + 1`` items and return ``(page, next_cursor)``."""
+    if limit is None or len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, encode_cursor(cursor_key(page[-1]))
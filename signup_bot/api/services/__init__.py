@@ -1 +1,24 @@
-# Services package for the Signup Bot API 
\ No newline at end of file
+# Services package for the Signup Bot API
+from .storage import Storage, FirestoreStorage, MemoryStorage, SignupResult, create_storage, get_storage, set_storage
+from .coc_client import (
+    AsyncCocClient, CocClient, PlayerNotFound, ProxyUnavailable, get_coc_client, set_coc_client
+)
+from .rate_limit import RateLimited, TokenPool
+from .circuit_breaker import CircuitBreaker, CircuitOpen
+from .enrichment import AsyncEnrichmentWorker, EnrichmentWorker, get_enrichment_worker, set_enrichment_worker
+from .log_dispatcher import AsyncLogDispatcher, LogDispatcher, get_log_dispatcher, set_log_dispatcher
+from .log_sink import AsyncBatchedLogSink, BatchedLogSink
+from .players import PlayerLookup, create_player_lookup, get_player_lookup, set_player_lookup
+from .async_storage import (
+    AsyncStorage, AsyncFirestoreStorage, AsyncMemoryStorage, create_async_storage, get_async_storage, set_async_storage
+)
+
+__all__ = [
+    'Storage', 'FirestoreStorage', 'MemoryStorage', 'SignupResult', 'create_storage', 'get_storage', 'set_storage',
+    'AsyncStorage', 'AsyncFirestoreStorage', 'AsyncMemoryStorage', 'create_async_storage', 'get_async_storage',
+    'set_async_storage', 'PlayerLookup', 'create_player_lookup', 'get_player_lookup', 'set_player_lookup',
+    'CocClient', 'AsyncCocClient', 'PlayerNotFound', 'ProxyUnavailable', 'get_coc_client', 'set_coc_client',
+    'RateLimited', 'TokenPool', 'CircuitBreaker', 'CircuitOpen', 'EnrichmentWorker', 'AsyncEnrichmentWorker', 'get_enrichment_worker',
+    'set_enrichment_worker', 'LogDispatcher', 'AsyncLogDispatcher', 'get_log_dispatcher', 'set_log_dispatcher',
+    'BatchedLogSink', 'AsyncBatchedLogSink',
+]
@@ -0,0 +1,258 @@
+# asyncio facade over the in-memory Firestore stand-in.
+#
+# Mirrors the parts of ``firestore.AsyncClient`` the async storage uses, so
+# the ASGI app can run and be tested without a Firebase project. Simulated
+# latency is awaited rather than slept, like a real network round trip.
+import asyncio
+import functools
+from typing import Optional
+
+from .memory_client import MemoryClient, MemoryDocumentReference, MemoryQuery, MemoryTransaction
+
+
+def _unwrap(value):
+    """Return the sync object behind a facade, for cursors and batch writes."""
+    if isinstance(value, AsyncMemoryDocumentReference):
+        return value._ref
+    if isinstance(value, dict):
+        return {key: _unwrap(item) for key, item in value.items()}
+    return value
+
+
+class AsyncMemoryDocumentReference:
+    """Async counterpart of ``MemoryDocumentReference``."""
+
+    def __init__(self, client: 'AsyncMemoryClient', ref: MemoryDocumentReference):
+        self._client = client
+        self._ref = ref
+
+    @property
+    def id(self) -> str:
+        return self._ref.id
+
+    @property
+    def path(self) -> str:
+        return self._ref.path
+
+    @property
+    def parent(self) -> 'AsyncMemoryCollectionReference':
+        return AsyncMemoryCollectionReference(self._client, self._ref.parent)
+
+    def collection(self, collection_id: str) -> 'AsyncMemoryCollectionReference':
+        return AsyncMemoryCollectionReference(self._client, self._ref.collection(collection_id))
+
+    async def get(self, field_paths=None, transaction=None):
+        await self._client._rpc()
+        return self._ref.get(field_paths=field_paths, transaction=_sync_transaction(transaction))
+
+    async def create(self, document_data: dict):
+        await self._client._rpc()
+        self._ref.create(document_data)
+
+    async def set(self, document_data: dict, merge: bool = False):
+        await self._client._rpc()
+        self._ref.set(document_data, merge=merge)
+
+    async def update(self, field_updates: dict, option=None):
+        await self._client._rpc()
+        self._ref.update(field_updates)
+
+    async def delete(self, option=None):
+        await self._client._rpc()
+        self._ref.delete()
+
+    def __eq__(self, other):
+        return isinstance(other, AsyncMemoryDocumentReference) and other._ref == self._ref
+
+    def __hash__(self):
+        return hash(self._ref)
+
+
+class AsyncMemoryAggregationQuery:
+    """Async counterpart of ``count()`` aggregations."""
+
+    def __init__(self, client: 'AsyncMemoryClient', aggregation):
+        self._client = client
+        self._aggregation = aggregation
+
+    async def get(self, transaction=None):
+        await self._client._rpc()
+        return self._aggregation.get(transaction=_sync_transaction(transaction))
+
+
+class AsyncMemoryQuery:
+    """Async counterpart of ``MemoryQuery``; builders return new facades."""
+
+    def __init__(self, client: 'AsyncMemoryClient', query: MemoryQuery):
+        self._client = client
+        self._query = query
+
+    def _wrap(self, query: MemoryQuery) -> 'AsyncMemoryQuery':
+        return AsyncMemoryQuery(self._client, query)
+
+    def where(self, *args, **kwargs) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.where(*args, **kwargs))
+
+    def order_by(self, field_path, direction: str = MemoryQuery.ASCENDING) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.order_by(field_path, direction=direction))
+
+    def limit(self, count: int) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.limit(count))
+
+    def offset(self, num_to_skip: int) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.offset(num_to_skip))
+
+    def select(self, field_paths) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.select(field_paths))
+
+    def start_at(self, document_fields) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.start_at(_unwrap(document_fields)))
+
+    def start_after(self, document_fields) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.start_after(_unwrap(document_fields)))
+
+    def end_before(self, document_fields) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.end_before(_unwrap(document_fields)))
+
+    def end_at(self, document_fields) -> 'AsyncMemoryQuery':
+        return self._wrap(self._query.end_at(_unwrap(document_fields)))
+
+    def count(self, alias: str = 'count') -> AsyncMemoryAggregationQuery:
+        return AsyncMemoryAggregationQuery(self._client, self._query.count(alias))
+
+    async def stream(self, transaction=None):
+        await self._client._rpc()
+        for snapshot in self._query.get(transaction=_sync_transaction(transaction)):
+            yield snapshot
+
+    async def get(self, transaction=None):
+        return [snapshot async for snapshot in self.stream(transaction=transaction)]
+
+
+class AsyncMemoryCollectionReference(AsyncMemoryQuery):
+    """Async counterpart of ``MemoryCollectionReference``."""
+
+    @property
+    def id(self) -> str:
+        return self._query.id
+
+    def document(self, document_id: Optional[str] = None) -> AsyncMemoryDocumentReference:
+        return AsyncMemoryDocumentReference(self._client, self._query.document(document_id))
+
+    async def add(self, document_data: dict, document_id: Optional[str] = None):
+        await self._client._rpc()
+        update_time, ref = self._query.add(document_data, document_id)
+        return update_time, AsyncMemoryDocumentReference(self._client, ref)
+
+    async def list_documents(self):
+        await self._client._rpc()
+        for ref in self._query.list_documents():
+            yield AsyncMemoryDocumentReference(self._client, ref)
+
+
+class AsyncMemoryWriteBatch:
+    """Async counterpart of ``MemoryWriteBatch``."""
+
+    def __init__(self, client: 'AsyncMemoryClient', batch):
+        self._client = client
+        self._batch = batch
+
+    def __len__(self):
+        return len(self._batch)
+
+    def create(self, reference, document_data):
+        self._batch.create(_unwrap(reference), document_data)
+
+    def set(self, reference, document_data, merge: bool = False):
+        self._batch.set(_unwrap(reference), document_data, merge=merge)
+
+    def update(self, reference, field_updates, option=None):
+        self._batch.update(_unwrap(reference), field_updates)
+
+    def delete(self, reference, option=None):
+        self._batch.delete(_unwrap(reference))
+
+    async def commit(self):
+        await self._client._rpc()
+        return self._batch.commit()
+
+
+class AsyncMemoryTransaction(AsyncMemoryWriteBatch):
+    """Async counterpart of ``MemoryTransaction``."""
+
+    async def get(self, ref_or_query):
+        if isinstance(ref_or_query, AsyncMemoryDocumentReference):
+            return iter([await ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+
+def _sync_transaction(transaction) -> Optional[MemoryTransaction]:
+    return transaction._batch if transaction is not None else None
+
+
+def async_transactional(to_wrap):
+    """In-memory counterpart of ``firestore.async_transactional``.
+
+    Transactions on one client are serialized by an asyncio lock held until
+    the commit, so they always observe each other's writes; the document locks
+    of ``MemoryTransaction`` are then always free, and are released here.
+    """
+    @functools.wraps(to_wrap)
+    async def wrapper(transaction: AsyncMemoryTransaction, *args, **kwargs):
+        async with transaction._client._transaction_lock:
+            try:
+                result = await to_wrap(transaction, *args, **kwargs)
+                await transaction.commit()
+            except BaseException:
+                transaction._batch._rollback()
+                raise
+        return result
+    return wrapper
+
+
+class AsyncMemoryClient:
+    """In-memory database with the ``firestore.AsyncClient`` interface.
+
+    Args:
+        client: The ``MemoryClient`` holding the data; a new one if omitted.
+            Its own latency should be zero, since it would block the event loop.
+        latency: Seconds to await on every simulated RPC.
+    """
+
+    def __init__(self, client: Optional[MemoryClient] = None, latency: float = 0.0):
+        self.sync_client = client or MemoryClient()
+        self.latency = latency
+        self._lock = None
+
+    @property
+    def stats(self):
+        return self.sync_client.stats
+
+    @property
+    def _transaction_lock(self) -> asyncio.Lock:
+        # Created lazily so the lock binds to the loop that uses it
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def collection(self, *collection_path: str) -> AsyncMemoryCollectionReference:
+        return AsyncMemoryCollectionReference(self, self.sync_client.collection(*collection_path))
+
+    def document(self, *document_path: str) -> AsyncMemoryDocumentReference:
+        return AsyncMemoryDocumentReference(self, self.sync_client.document(*document_path))
+
+    def collection_group(self, collection_id: str) -> AsyncMemoryQuery:
+        return AsyncMemoryQuery(self, self.sync_client.collection_group(collection_id))
+
+    def batch(self) -> AsyncMemoryWriteBatch:
+        return AsyncMemoryWriteBatch(self, self.sync_client.batch())
+
+    def transaction(self, **kwargs) -> AsyncMemoryTransaction:
+        return AsyncMemoryTransaction(self, self.sync_client.transaction())
+
+    def reset_stats(self) -> None:
+        self.sync_client.reset_stats()
+
+    async def _rpc(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
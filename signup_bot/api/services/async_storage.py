@@ -0,0 +1,374 @@
+# Async data-access layer for the ASGI API.
+#
+# Same documents and semantics as ``storage.py``, on ``firestore.AsyncClient``
+# so request handlers never block the event loop on Firestore.
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.api_core import exceptions
+
+from ... import Config
+from ...utils.log_buckets import group_by_bucket
+from .async_memory_client import AsyncMemoryClient, async_transactional
+from .cache import MISSING
+from .storage import TRANSACTION_ATTEMPTS, FirestoreDocuments, SignupResult, count_th_levels
+
+
+class AsyncStorage(ABC):
+    """Async counterpart of ``Storage``; see there for the semantics of each method."""
+
+    # Events
+
+    @abstractmethod
+    async def get_event(self, guild_id: str, event_name: str) -> Optional[dict]:
+        """Return the event document, or None if it does not exist."""
+
+    @abstractmethod
+    async def get_event_metadata(self, guild_id: str, event_name: str) -> Optional[dict]:
+        """Return the event document from this process's cache if it holds it, else like ``get_event``."""
+
+    @abstractmethod
+    async def list_events(self, guild_id: str, limit: Optional[int] = None,
+                          start_after: Optional[str] = None, fields: Optional[List[str]] = None) -> List[dict]:
+        """Return the events of a guild ordered by name, each with its document ``id``."""
+
+    @abstractmethod
+    async def create_event(self, guild_id: str, event_name: str, event_data: dict) -> bool:
+        """Create an event. Returns False if it already exists."""
+
+    @abstractmethod
+    async def update_event(self, guild_id: str, event_name: str, fields: dict) -> None:
+        """Update fields of an existing event."""
+
+    @abstractmethod
+    async def refresh_aggregate(self, guild_id: str, event_name: str) -> Optional[dict]:
+        """Recount ``signup_count`` and ``th_composition`` from the signups and store them."""
+
+    # Signups
+
+    @abstractmethod
+    async def list_signups(self, guild_id: str, event_name: str, limit: Optional[int] = None,
+                           start_after: Optional[int] = None) -> List[dict]:
+        """Return the signups of an event in signup order, with ``id`` and ``position``."""
+
+    @abstractmethod
+    async def find_signup(self, guild_id: str, event_name: str, player_tag: str) -> Optional[dict]:
+        """Return the signup for a normalized player tag, or None if not signed up."""
+
+    @abstractmethod
+    async def add_signup(self, guild_id: str, event_name: str, signup_data: dict) -> Tuple[str, Optional[dict]]:
+        """Atomically check the event is open, allocate the next index and store the signup."""
+
+    @abstractmethod
+    async def signup_position(self, guild_id: str, event_name: str, signup: dict) -> int:
+        """Return the 1-based display position of a signup."""
+
+    @abstractmethod
+    async def remove_signup(self, guild_id: str, event_name: str, player_tag: str) -> bool:
+        """Delete a signup and update the event's aggregate. Returns False if it or the event is gone."""
+
+    @abstractmethod
+    async def list_pending_signups(self, limit: Optional[int] = None) -> List[dict]:
+        """Return signups of any guild still marked ``pending_enrichment``."""
+
+    @abstractmethod
+    async def enrich_signup(self, guild_id: str, event_name: str, player_tag: str, profile: Optional[dict]) -> bool:
+        """Fill in a pending signup from ``profile`` (None gives up on it) and clear the mark."""
+
+    # Leader roles
+
+    @abstractmethod
+    async def get_leader_roles(self, guild_id: str) -> Optional[List[str]]:
+        """Return the leader role IDs of a guild, or None if none were ever set."""
+
+    @abstractmethod
+    async def set_leader_roles(self, guild_id: str, role_ids: List[str]) -> None:
+        """Replace the leader role IDs of a guild."""
+
+    @abstractmethod
+    def invalidate_leader_roles(self, guild_id: str) -> None:
+        """Drop the cached leader roles of a guild so the next read goes to the database."""
+
+    # Caches
+
+    @abstractmethod
+    def cache_stats(self) -> dict:
+        """Return the hit and miss counters of each cache, by name."""
+
+    # Logs
+
+    @abstractmethod
+    async def add_log(self, guild_id: str, event_name: str, log_entry: dict) -> None:
+        """Append an audit log entry for an event."""
+
+    @abstractmethod
+    async def add_logs(self, entries: List[Tuple[str, str, dict]]) -> None:
+        """Append ``(guild_id, event_name, log_entry)`` entries in one batched commit (at most 500)."""
+
+    @abstractmethod
+    async def read_logs(self, guild_id: str, event_name: str, since: Optional[str] = None,
+                        until: Optional[str] = None) -> List[dict]:
+        """Return the log entries of an event with ``since <= timestamp < until``, oldest first."""
+
+
+class AsyncFirestoreStorage(FirestoreDocuments, AsyncStorage):
+    """Async storage backed by a ``firestore.AsyncClient``."""
+
+    # Decorator that turns a coroutine function into a retried transaction
+    _transactional = staticmethod(firestore.async_transactional)
+
+    async def _run_transaction(self, function, *args):
+        """Run ``function(transaction, *args)`` in a transaction and return its result."""
+        transaction = self.db.transaction(max_attempts=TRANSACTION_ATTEMPTS)
+        return await self._transactional(function)(transaction, *args)
+
+    async def _read_aggregate(self, transaction, event_ref, event_data):
+        """Return ``(signup_count, th_composition)`` of an event read in ``transaction``."""
+        if 'th_composition' in event_data:
+            return event_data.get('signup_count', 0), dict(event_data['th_composition'])
+        # Events created before the aggregate existed are counted once, then kept up to date
+        signups = [doc.to_dict() async for doc in event_ref.collection('signups').stream(transaction=transaction)]
+        return len(signups), count_th_levels(signups)
+
+    async def get_event(self, guild_id, event_name):
+        event_doc = await self._event_ref(guild_id, event_name).get()
+        event_data = event_doc.to_dict() if event_doc.exists else None
+        self._cache_event(guild_id, event_name, event_data)
+        return event_data
+
+    async def get_event_metadata(self, guild_id, event_name):
+        event_data = self._cached_event(guild_id, event_name)
+        return event_data if event_data is not MISSING else await self.get_event(guild_id, event_name)
+
+    async def list_events(self, guild_id, limit=None, start_after=None, fields=None):
+        events = []
+        async for doc in self._events_query(guild_id, limit, start_after, fields).stream():
+            event_data = doc.to_dict()
+            event_data['id'] = doc.id
+            events.append(event_data)
+        return events
+
+    async def create_event(self, guild_id, event_name, event_data):
+        event_data = self._new_event(event_data)
+        try:
+            await self._event_ref(guild_id, event_name).create(event_data)
+        except exceptions.AlreadyExists:
+            return False
+        self._cache_event(guild_id, event_name, event_data)
+        return True
+
+    async def update_event(self, guild_id, event_name, fields):
+        fields = self._touch(fields)
+        await self._event_ref(guild_id, event_name).update(fields)
+        self._cache_event_update(guild_id, event_name, fields)
+
+    async def refresh_aggregate(self, guild_id, event_name):
+        event_ref = self._event_ref(guild_id, event_name)
+
+        async def refresh_in_transaction(transaction):
+            event_doc = await event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                return None
+            signups = [doc.to_dict() async for doc in event_ref.collection('signups').stream(transaction=transaction)]
+            fields = self._aggregate_fields(len(signups), count_th_levels(signups))
+            written[:] = [event_doc.to_dict(), self._touch(fields)]
+            transaction.update(event_ref, written[1])
+            return fields
+
+        written = []
+        fields = await self._run_transaction(refresh_in_transaction)
+        if written:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return fields
+
+    async def list_signups(self, guild_id, event_name, limit=None, start_after=None):
+        first_position = 1
+        if start_after is not None:
+            first_position += await self._count_signups_up_to(guild_id, event_name, start_after)
+        signups = []
+        position = first_position
+        async for doc in self._signups_query(guild_id, event_name, limit, start_after).stream():
+            signup = doc.to_dict()
+            signup['id'] = doc.id
+            signup['position'] = position
+            signups.append(signup)
+            position += 1
+        return signups
+
+    async def _count_signups_up_to(self, guild_id, event_name, index):
+        result = await self._signups_up_to_query(guild_id, event_name, index).get()
+        return int(result[0][0].value)
+
+    async def signup_position(self, guild_id, event_name, signup):
+        return await self._count_signups_up_to(guild_id, event_name, signup.get('index', 0))
+
+    async def find_signup(self, guild_id, event_name, player_tag):
+        signup_doc = await self._signup_ref(guild_id, event_name, player_tag).get()
+        if not signup_doc.exists:
+            return None
+        signup = signup_doc.to_dict()
+        signup['id'] = signup_doc.id
+        return signup
+
+    async def add_signup(self, guild_id, event_name, signup_data):
+        event_ref = self._event_ref(guild_id, event_name)
+        signup_ref = self._signup_ref(guild_id, event_name, signup_data['player_tag'])
+
+        async def signup_in_transaction(transaction):
+            # All reads must happen before the first write of the transaction
+            event_doc = await event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                return SignupResult.EVENT_NOT_FOUND, None
+            event_data = event_doc.to_dict()
+            if not event_data.get('is_open', True):
+                return SignupResult.EVENT_CLOSED, None
+            if (await signup_ref.get(transaction=transaction)).exists:
+                return SignupResult.ALREADY_SIGNED_UP, None
+
+            signup_count, composition = await self._read_aggregate(transaction, event_ref, event_data)
+            signup, event_fields = self._signup_writes(event_data, signup_data, signup_count, composition)
+            transaction.create(signup_ref, signup)
+            transaction.update(event_ref, event_fields)
+            written[:] = [event_data, event_fields]
+            return SignupResult.CREATED, signup
+
+        # The event as of the committed attempt, to keep the cache current
+        written = []
+        result = await self._run_transaction(signup_in_transaction)
+        if result[0] == SignupResult.CREATED:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return result
+
+    async def remove_signup(self, guild_id, event_name, player_tag):
+        event_ref = self._event_ref(guild_id, event_name)
+        signup_ref = self._signup_ref(guild_id, event_name, player_tag)
+
+        async def remove_in_transaction(transaction):
+            signup_doc = await signup_ref.get(transaction=transaction)
+            if not signup_doc.exists:
+                return False
+            event_doc = await event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                return False
+            event_data = event_doc.to_dict()
+            signup_count, composition = await self._read_aggregate(transaction, event_ref, event_data)
+
+            event_fields = self._removal_writes(signup_doc.to_dict(), signup_count, composition)
+            transaction.delete(signup_ref)
+            transaction.update(event_ref, event_fields)
+            written[:] = [event_data, event_fields]
+            return True
+
+        written = []
+        removed = await self._run_transaction(remove_in_transaction)
+        if removed:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return removed
+
+    async def list_pending_signups(self, limit=None):
+        return [self._pending_signup(doc) async for doc in self._pending_signups_query(limit).stream()]
+
+    async def enrich_signup(self, guild_id, event_name, player_tag, profile):
+        event_ref = self._event_ref(guild_id, event_name)
+        signup_ref = self._signup_ref(guild_id, event_name, player_tag)
+
+        async def enrich_in_transaction(transaction):
+            signup_doc = await signup_ref.get(transaction=transaction)
+            if not signup_doc.exists or not signup_doc.to_dict().get('pending_enrichment'):
+                return False
+            event_doc = await event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                transaction.update(signup_ref, {'pending_enrichment': False})
+                return True
+            event_data = event_doc.to_dict()
+            signup_count, composition = await self._read_aggregate(transaction, event_ref, event_data)
+
+            signup_fields, event_fields = self._enrichment_writes(
+                signup_doc.to_dict(), profile, signup_count, composition)
+            transaction.update(signup_ref, signup_fields)
+            transaction.update(event_ref, event_fields)
+            written[:] = [event_data, event_fields]
+            return True
+
+        written = []
+        enriched = await self._run_transaction(enrich_in_transaction)
+        if written:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return enriched
+
+    async def get_leader_roles(self, guild_id):
+        role_ids = self._cached_leader_roles(guild_id)
+        if role_ids is not MISSING:
+            return role_ids
+        leader_doc = await self._leader_roles_ref(guild_id).get()
+        role_ids = leader_doc.to_dict().get('leader_role_ids', []) if leader_doc.exists else None
+        self._cache_leader_roles(guild_id, role_ids)
+        return role_ids
+
+    async def set_leader_roles(self, guild_id, role_ids):
+        await self._leader_roles_ref(guild_id).set({'leader_role_ids': list(role_ids)}, merge=True)
+        self._cache_leader_roles(guild_id, role_ids)
+
+    async def add_log(self, guild_id, event_name, log_entry):
+        if self.log_format == 'hourly':
+            await self.add_logs([(guild_id, event_name, log_entry)])
+        else:
+            await self._event_ref(guild_id, event_name).collection('logs').add(log_entry)
+
+    async def add_logs(self, entries):
+        try:
+            await self._log_batch(entries).commit()
+        except exceptions.InvalidArgument:
+            if self.log_format != 'hourly':
+                raise
+            for key, compact in group_by_bucket(entries).items():
+                while True:
+                    try:
+                        await self._bucket_batch(key, compact).commit()
+                        break
+                    except exceptions.InvalidArgument:
+                        if not self._bucket_full(key, compact):
+                            break
+
+    async def read_logs(self, guild_id, event_name, since=None, until=None):
+        log_docs = [doc async for doc in self._logs_query(guild_id, event_name, since, until).stream()]
+        bucket_docs = [doc async for doc in self._log_buckets_query(guild_id, event_name, since, until).stream()]
+        return self._merge_logs(guild_id, event_name, log_docs, bucket_docs, since, until)
+
+
+class AsyncMemoryStorage(AsyncFirestoreStorage):
+    """Async storage kept in process memory, for tests, benchmarks and offline runs."""
+
+    _transactional = staticmethod(async_transactional)
+
+    def __init__(self, client: Optional[AsyncMemoryClient] = None):
+        super().__init__(client or AsyncMemoryClient())
+
+
+_async_storage: Optional[AsyncStorage] = None
+
+
+def create_async_storage(backend: Optional[str] = None) -> AsyncStorage:
+    """Create the async storage backend named by ``backend`` or ``Config.STORAGE_BACKEND``."""
+    backend = (backend or Config.STORAGE_BACKEND).lower()
+    if backend == 'memory':
+        return AsyncMemoryStorage()
+    if backend == 'firestore':
+        from firebase_admin import firestore_async
+        return AsyncFirestoreStorage(firestore_async.client())
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def get_async_storage() -> AsyncStorage:
+    """Return the async storage used by the ASGI API, creating it on first use."""
+    global _async_storage
+    if _async_storage is None:
+        _async_storage = create_async_storage()
+    return _async_storage
+
+
+def set_async_storage(storage: Optional[AsyncStorage]) -> None:
+    """Replace the async storage used by the ASGI API."""
+    global _async_storage
+    _async_storage = storage
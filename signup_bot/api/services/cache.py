@@ -0,0 +1,90 @@
+# In-process caches for the storage layer.
+#
+# Each API process keeps its own copy, so entries written by another process
+# are only picked up once they expire; keep TTLs short for data that matters.
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# Returned by ``TTLCache.get`` for keys that are absent or expired
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted.
+        ttl: Seconds an entry stays valid; 0 disables the cache.
+        clock: Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for ``key``, or ``MISSING``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the cached value for ``key`` like ``get``, without counting or reordering."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None and entry[0] > self.clock() else MISSING
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store ``value`` for ``key``, evicting the least recently used entry if full."""
+        self.set_until(key, value, self.clock() + self.ttl)
+
+    def set_until(self, key: Hashable, value: Any, expires_at: float) -> None:
+        """Store ``value`` for ``key`` until ``expires_at`` on the cache's clock."""
+        if not self.enabled or expires_at <= self.clock():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` so the next read goes to the database."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
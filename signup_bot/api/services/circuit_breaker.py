@@ -0,0 +1,100 @@
+# Circuit breaker for calls to the Clash of Clans proxy.
+#
+# After ``failure_threshold`` consecutive failures the circuit opens and calls
+# are refused at once for ``reset_timeout`` seconds. Then one trial call is let
+# through (half-open): its success closes the circuit, its failure reopens it.
+import threading
+import time
+from typing import Callable
+
+
+class CircuitOpen(Exception):
+    """The proxy is failing; the call was not attempted."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Clash of Clans API unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Thread-safe breaker; ``failure_threshold`` 0 keeps it closed for good.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit.
+        reset_timeout: Seconds the circuit stays open before a trial call.
+        clock: Monotonic time source, replaceable in tests.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self.clock())
+
+    def _current_state(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def before_call(self) -> None:
+        """Claim permission for a call; raises ``CircuitOpen`` if it must not be made.
+
+        Every permitted call must be followed by ``record_success``,
+        ``record_failure`` or ``release``.
+        """
+        with self._lock:
+            now = self.clock()
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+            raise CircuitOpen(max(0.0, self._opened_at + self.reset_timeout - now))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            trial, self._trial_running = self._trial_running, False
+            if trial or (self.failure_threshold and self.failures >= self.failure_threshold
+                         and self._state == self.CLOSED):
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self.opened += 1
+
+    def release(self) -> None:
+        """End a permitted call that said nothing about the proxy's health."""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._current_state(self.clock()),
+                'consecutive_failures': self.failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,278 @@
+# HTTP clients for the Clash of Clans API proxy.
+#
+# One pooled client per process keeps connections to the proxy open between
+# signups, bounds every request with connect/read timeouts and retries server
+# errors with jittered exponential backoff. Requests are spread over the
+# configured API tokens and held to their rate limits by a ``TokenPool``; a
+# 429 benches the token that earned it and the request moves to another.
+# A ``CircuitBreaker`` stops calling a proxy that keeps failing, so lookups
+# fail fast with ``CircuitOpen`` instead of each waiting out the timeouts.
+# Lookups the proxy could not answer raise ``ProxyUnavailable``, so callers
+# can tell a struggling proxy from an unknown player tag.
+import asyncio
+import random
+from typing import List, Optional, Sequence, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ... import Config
+from .circuit_breaker import CircuitBreaker
+from .rate_limit import RateLimited, TokenPool
+
+# Statuses worth retrying with backoff: the proxy/upstream is struggling.
+# 429s are retried too, but on another token rather than after a backoff.
+RETRY_STATUSES = (500, 502, 503, 504)
+RATE_LIMITED = 429
+NOT_FOUND = 404
+
+# Longest backoff between attempts, and the most of a Retry-After we honour,
+# in seconds; a signup should fail fast rather than hold a worker for minutes
+BACKOFF_MAX = 5.0
+RETRY_AFTER_MAX = 5.0
+
+
+class PlayerNotFound(Exception):
+    """The API answered that no player has the tag."""
+
+
+class ProxyUnavailable(Exception):
+    """The proxy timed out, could not be reached or kept answering server errors."""
+
+
+def backoff_delay(attempt: int, factor: float) -> float:
+    """Return a "full jitter" delay before retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, factor * 2 ** attempt))
+
+
+def player_url(base_url: str, player_tag: str) -> str:
+    return f"{base_url}/players/%23{player_tag.lstrip('#')}"
+
+
+def split_tokens(tokens: Union[str, Sequence[str], None]) -> List[str]:
+    """Return the API tokens in ``tokens``, a list or a comma-separated string like ``AUTH``."""
+    if isinstance(tokens, str):
+        tokens = tokens.split(',')
+    return [token.strip() for token in tokens or () if token and token.strip()]
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    try:
+        return float(headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def token_pool_from_config(tokens=None) -> TokenPool:
+    return TokenPool(split_tokens(Config.AUTH if tokens is None else tokens), Config.COC_RATE_LIMIT,
+                     Config.COC_RATE_BURST, Config.COC_RATE_MAX_WAIT)
+
+
+def breaker_from_config() -> CircuitBreaker:
+    return CircuitBreaker(Config.COC_BREAKER_THRESHOLD, Config.COC_BREAKER_RESET)
+
+
+def _record(breaker: CircuitBreaker, status: int) -> None:
+    # Server errors that outlived the retries count against the proxy; any other answer shows it is up
+    if status in RETRY_STATUSES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _player_result(breaker: CircuitBreaker, status: int, profile: dict, player_tag: str) -> dict:
+    _record(breaker, status)
+    if status == NOT_FOUND:
+        raise PlayerNotFound(player_tag)
+    if status in RETRY_STATUSES:
+        raise ProxyUnavailable(f"Clash of Clans API answered {status}")
+    return profile
+
+
+class JitteredRetry(Retry):
+    """urllib3 retry policy with full-jitter backoff and a capped Retry-After."""
+
+    def get_backoff_time(self) -> float:
+        if not self.history:
+            return 0
+        return backoff_delay(len(self.history) - 1, self.backoff_factor)
+
+    def is_retry(self, method, status_code, has_retry_after=False) -> bool:
+        # urllib3 retries any 429 carrying Retry-After on the same token; the client moves it to another
+        if status_code == RATE_LIMITED:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        return min(retry_after, RETRY_AFTER_MAX) if retry_after is not None else None
+
+
+class CocClient:
+    """Pooled, retrying client for the proxy, built on ``requests.Session``.
+
+    Args:
+        base_url: Proxy URL up to and including the API version, e.g. ``.../v1``.
+        token: ``Authorization`` header value, or several as a list or comma-separated string.
+        pool_connections: Host pools kept by the adapter.
+        pool_maxsize: Connections kept open per host; more threads than this reconnect.
+        connect_timeout: Seconds to establish a connection.
+        read_timeout: Seconds to wait for each chunk of the response.
+        retries: Retries after the first attempt, for errors and ``RETRY_STATUSES``, and
+            separately for 429s.
+        backoff: Base of the exponential backoff, in seconds.
+        tokens: ``TokenPool`` limiting the requests; by default one without a rate limit.
+        breaker: ``CircuitBreaker`` guarding the proxy; by default one with the default thresholds.
+    """
+
+    def __init__(self, base_url: str, token: Union[str, Sequence[str], None], pool_connections: int = 4,
+                 pool_maxsize: int = 32, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 retries: int = 3, backoff: float = 0.5, tokens: Optional[TokenPool] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.tokens = tokens or TokenPool(split_tokens(token), rate=0)
+        self.breaker = breaker or CircuitBreaker()
+        retry = JitteredRetry(
+            total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}), respect_retry_after_header=True, raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_config(cls) -> 'CocClient':
+        return cls(Config.COC_API_URL, Config.AUTH, Config.COC_POOL_CONNECTIONS, Config.COC_POOL_MAXSIZE,
+                   Config.COC_CONNECT_TIMEOUT, Config.COC_READ_TIMEOUT, Config.COC_RETRIES, Config.COC_BACKOFF,
+                   token_pool_from_config(), breaker_from_config())
+
+    def get_player(self, player_tag: str) -> dict:
+        """Return the proxy's profile of a player, or {} for an answer without one.
+
+        Raises ``PlayerNotFound`` for unknown tags, ``CircuitOpen`` while the
+        proxy is considered down, ``RateLimited`` if no token has budget in
+        time, and ``ProxyUnavailable`` if no response could be read or the
+        retries ran out on server errors.
+        """
+        self.breaker.before_call()
+        try:
+            status, profile = self._request_player(player_url(self.base_url, player_tag))
+        except RateLimited:
+            self.breaker.release()
+            raise
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise ProxyUnavailable(str(e)) from e
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        return _player_result(self.breaker, status, profile, player_tag)
+
+    def _request_player(self, url):
+        for _ in range(self.retries + 1):
+            token = self.tokens.acquire()
+            headers = {'Authorization': token} if token else None
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code != RATE_LIMITED:
+                return response.status_code, response.json() if response.status_code == 200 else {}
+            self.tokens.penalize(token, parse_retry_after(response.headers))
+        raise RateLimited(parse_retry_after(response.headers) or 1.0)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncCocClient:
+    """``CocClient`` for the ASGI app, on an ``aiohttp`` connection pool.
+
+    Create it inside the event loop that will use it.
+    """
+
+    def __init__(self, base_url: str, token: Union[str, Sequence[str], None], pool_maxsize: int = 32,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0, retries: int = 3, backoff: float = 0.5,
+                 tokens: Optional[TokenPool] = None, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.backoff = backoff
+        self.tokens = tokens or TokenPool(split_tokens(token), rate=0)
+        self.breaker = breaker or CircuitBreaker()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_maxsize, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+        )
+
+    @classmethod
+    def from_config(cls) -> 'AsyncCocClient':
+        return cls(Config.COC_API_URL, Config.AUTH, Config.COC_POOL_MAXSIZE, Config.COC_CONNECT_TIMEOUT,
+                   Config.COC_READ_TIMEOUT, Config.COC_RETRIES, Config.COC_BACKOFF, token_pool_from_config(),
+                   breaker_from_config())
+
+    async def get_player(self, player_tag: str) -> dict:
+        """Return the proxy's profile of a player, or {} for an answer without one.
+
+        Raises like ``CocClient.get_player``.
+        """
+        self.breaker.before_call()
+        try:
+            status, profile = await self._request_player(player_url(self.base_url, player_tag))
+        except (RateLimited, asyncio.CancelledError):
+            self.breaker.release()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.breaker.record_failure()
+            raise ProxyUnavailable(str(e) or type(e).__name__) from e
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        return _player_result(self.breaker, status, profile, player_tag)
+
+    async def _request_player(self, url):
+        attempt = limited = 0
+        while True:
+            token = await self.tokens.acquire_async()
+            try:
+                async with self.session.get(url, headers={'Authorization': token} if token else None) as response:
+                    if response.status == RATE_LIMITED:
+                        # Another token, or this one once it is off the bench; no backoff needed
+                        self.tokens.penalize(token, parse_retry_after(response.headers))
+                        limited += 1
+                        if limited > self.retries:
+                            raise RateLimited(parse_retry_after(response.headers) or 1.0)
+                        continue
+                    if response.status == 200:
+                        return response.status, await response.json()
+                    if response.status not in RETRY_STATUSES or attempt == self.retries:
+                        return response.status, {}
+                    delay = parse_retry_after(response.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+                delay = None
+            delay = min(delay, RETRY_AFTER_MAX) if delay is not None else backoff_delay(attempt, self.backoff)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        await self.session.close()
+
+
+_coc_client: Optional[CocClient] = None
+
+
+def get_coc_client() -> CocClient:
+    """Return the process-wide proxy client, creating it on first use."""
+    global _coc_client
+    if _coc_client is None:
+        _coc_client = CocClient.from_config()
+    return _coc_client
+
+
+def set_coc_client(client: Optional[CocClient]) -> None:
+    """Replace the process-wide proxy client."""
+    global _coc_client
+    _coc_client = client
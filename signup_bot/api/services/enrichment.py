@@ -0,0 +1,188 @@
+# Background enrichment of signups taken while the Clash of Clans proxy was down.
+#
+# Degraded signups are stored with the tag only and marked
+# ``pending_enrichment``. A worker sweeps them every ``interval`` seconds and
+# fills in name and town hall once lookups succeed again; a sweep stops early
+# while the circuit is still open or the API budget is spent.
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+
+from .circuit_breaker import CircuitOpen
+from .coc_client import ProxyUnavailable
+from .rate_limit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+# Empty answers for a tag before it is taken to be wrong and given up on
+MAX_ATTEMPTS = 5
+
+
+class _Sweeps:
+    """Counters and give-up bookkeeping shared by the sync and async workers."""
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sweeps = 0
+        self.enriched = 0
+        self.failed = 0
+        self.pending = 0
+        self._attempts: Dict[str, int] = {}
+
+    def _give_up(self, tag: str) -> bool:
+        """Count an empty answer for ``tag``; True once it has had ``MAX_ATTEMPTS``."""
+        self._attempts[tag] = self._attempts.get(tag, 0) + 1
+        return self._attempts[tag] >= MAX_ATTEMPTS
+
+    def _done(self, tag: str, profile: Optional[dict]) -> None:
+        self._attempts.pop(tag, None)
+        if profile is None:
+            self.failed += 1
+        else:
+            self.enriched += 1
+
+    def stats(self) -> dict:
+        return {
+            'sweeps': self.sweeps,
+            # Pending signups seen by the last sweep
+            'pending': self.pending,
+            'enriched': self.enriched,
+            'failed': self.failed,
+        }
+
+
+class EnrichmentWorker(_Sweeps):
+    """Daemon thread enriching pending signups through a sync ``Storage``.
+
+    Args:
+        storage: Storage holding the signups.
+        lookup: ``lookup(tag)`` returning a profile, or {} if there is none;
+            raises ``CircuitOpen`` or ``RateLimited`` to end the sweep.
+        interval: Seconds between sweeps.
+        batch_size: Pending signups read per sweep.
+    """
+
+    def __init__(self, storage, lookup: Callable[[str], dict], interval: float = 60.0, batch_size: int = 50):
+        super().__init__(interval, batch_size)
+        self.storage = storage
+        self.lookup = lookup
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='signup-enrichment', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"Signup enrichment failed: {e}")
+
+    def run_once(self) -> int:
+        """Enrich one batch of pending signups; returns how many were filled in."""
+        self.sweeps += 1
+        signups = self.storage.list_pending_signups(self.batch_size)
+        self.pending = len(signups)
+        enriched = 0
+        for signup in signups:
+            tag = signup['player_tag']
+            try:
+                profile = self.lookup(tag)
+            except (CircuitOpen, ProxyUnavailable, RateLimited):
+                break  # The proxy is still down or busy; next sweep
+            except Exception as e:
+                logger.warning(f"Could not look up {tag} for enrichment: {e}")
+                profile = {}
+            if not profile and not self._give_up(tag):
+                continue
+            profile = profile or None
+            if self.storage.enrich_signup(signup['guild_id'], signup['event_name'], tag, profile):
+                self._done(tag, profile)
+                enriched += profile is not None
+        return enriched
+
+
+class AsyncEnrichmentWorker(_Sweeps):
+    """``EnrichmentWorker`` for the ASGI app: an asyncio task over an ``AsyncStorage``.
+
+    Start it inside the event loop that will run it.
+    """
+
+    def __init__(self, storage, lookup: Callable[[str], Awaitable[dict]], interval: float = 60.0,
+                 batch_size: int = 50):
+        super().__init__(interval, batch_size)
+        self.storage = storage
+        self.lookup = lookup
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Signup enrichment failed: {e}")
+
+    async def run_once(self) -> int:
+        """Enrich one batch of pending signups; returns how many were filled in."""
+        self.sweeps += 1
+        signups = await self.storage.list_pending_signups(self.batch_size)
+        self.pending = len(signups)
+        enriched = 0
+        for signup in signups:
+            tag = signup['player_tag']
+            try:
+                profile = await self.lookup(tag)
+            except (CircuitOpen, ProxyUnavailable, RateLimited):
+                break
+            except Exception as e:
+                logger.warning(f"Could not look up {tag} for enrichment: {e}")
+                profile = {}
+            if not profile and not self._give_up(tag):
+                continue
+            profile = profile or None
+            if await self.storage.enrich_signup(signup['guild_id'], signup['event_name'], tag, profile):
+                self._done(tag, profile)
+                enriched += profile is not None
+        return enriched
+
+
+_enrichment_worker: Optional[EnrichmentWorker] = None
+
+
+def get_enrichment_worker() -> Optional[EnrichmentWorker]:
+    """Return the enrichment worker of the Flask app, if one was set."""
+    return _enrichment_worker
+
+
+def set_enrichment_worker(worker: Optional[EnrichmentWorker]) -> None:
+    """Replace the enrichment worker of the Flask app, stopping the previous one."""
+    global _enrichment_worker
+    if _enrichment_worker is not None and _enrichment_worker is not worker:
+        _enrichment_worker.stop()
+    _enrichment_worker = worker
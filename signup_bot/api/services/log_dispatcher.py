@@ -0,0 +1,287 @@
+# Background dispatch of audit log entries.
+#
+# Routes hand their log entry to a bounded queue and return; worker threads
+# (or asyncio tasks in the ASGI app) write it for the bot to post. The route
+# passes the event it already loaded, so the log channel is checked without
+# another read. A full queue drops entries rather than slowing requests down,
+# and the queue is drained when the app shuts down.
+import asyncio
+import atexit
+from abc import ABC, abstractmethod
+import logging
+import queue
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from .cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+
+class _Dispatch(ABC):
+    """Counters and the log-channel check shared by the sync and async dispatchers."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.submitted = 0
+        self.written = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _has_log_channel(event_data) -> bool:
+        return bool(event_data and event_data.get('log_channel_id'))
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _accept(self, event_data) -> bool:
+        """Count a submitted entry; False if its event is known to have no log channel."""
+        self._count('submitted')
+        if event_data is not MISSING and not self._has_log_channel(event_data):
+            self._count('skipped')
+            return False
+        return True
+
+    def _queued(self, depth: int) -> None:
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Return the number of entries waiting in the queue."""
+
+    def _sink_method(self, name: str):
+        """Return the named method of a buffering sink, or None for a plain function."""
+        return getattr(self.sink, name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'depth': self.depth(),
+                'max_depth': self.max_depth,
+                'max_size': self.max_size,
+                'submitted': self.submitted,
+                'written': self.written,
+                # Entries of events without a log channel
+                'skipped': self.skipped,
+                # Entries lost to a full queue or a failed write
+                'dropped': self.dropped,
+                'failed': self.failed,
+                **({'sink': self.sink.stats()} if self._sink_method('stats') else {}),
+            }
+
+
+class LogDispatcher(_Dispatch):
+    """Worker threads writing log entries through a sync ``Storage``.
+
+    Args:
+        storage: Storage holding the events and their logs.
+        max_size: Entries the queue holds before new ones are dropped.
+        workers: Threads writing entries.
+        sink: ``sink(guild_id, event_name, entry)`` storing one entry; defaults
+            to ``storage.add_log``. A sink with ``start``, ``flush`` and
+            ``close`` (a ``BatchedLogSink``) is run along with the dispatcher.
+    """
+
+    def __init__(self, storage, max_size: int = 5000, workers: int = 2,
+                 sink: Optional[Callable[[str, str, dict], None]] = None):
+        super().__init__(max_size)
+        self.storage = storage
+        self.sink = sink or storage.add_log
+        self.workers = max(1, workers)
+        self._queue: queue.Queue = queue.Queue(max_size)
+        self._threads: List[threading.Thread] = []
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._sink_method('start'):
+            self.sink.start()
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f'log-dispatch-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, guild_id: str, event_name: str, entry: dict, event_data=MISSING) -> bool:
+        """Queue ``entry`` without blocking; returns False if it will not be written.
+
+        ``event_data`` is the event as the caller loaded it (None if it does not
+        exist); when left out, a worker reads the event's metadata instead.
+        """
+        if not self._accept(event_data):
+            return False
+        try:
+            self._queue.put_nowait((guild_id, event_name, entry, event_data))
+        except queue.Full:
+            self._count('dropped')
+            logger.warning(f"Log queue full, dropped a '{entry.get('action')}' entry of {event_name}")
+            return False
+        self._queued(self._queue.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                self._count('failed')
+                self._count('dropped')
+                logger.warning(f"Could not write log entry: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, guild_id, event_name, entry, event_data):
+        if event_data is MISSING:
+            event_data = self.storage.get_event_metadata(guild_id, event_name)
+            if not self._has_log_channel(event_data):
+                self._count('skipped')
+                return
+        self.sink(guild_id, event_name, entry)
+        self._count('written')
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued entry is written; False if ``timeout`` passed first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        if self._sink_method('flush'):
+            self.sink.flush()
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Drain the queue and stop the workers."""
+        if not self.flush(timeout):
+            logger.warning(f"Log queue not drained on shutdown, {self.depth()} entries lost")
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        if self._sink_method('close'):
+            self.sink.close()
+
+
+class AsyncLogDispatcher(_Dispatch):
+    """``LogDispatcher`` for the ASGI app: asyncio tasks over an ``AsyncStorage``.
+
+    Start it inside the event loop that will run it.
+    """
+
+    def __init__(self, storage, max_size: int = 5000, workers: int = 2,
+                 sink: Optional[Callable[[str, str, dict], Awaitable[None]]] = None):
+        super().__init__(max_size)
+        self.storage = storage
+        self.sink = sink or storage.add_log
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _get_queue(self) -> asyncio.Queue:
+        # Created on first use, so entries submitted before ``start`` wait for the workers
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_size)
+        return self._queue
+
+    def start(self) -> None:
+        self._get_queue()
+        if self._sink_method('start'):
+            self.sink.start()
+        loop = asyncio.get_running_loop()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(loop.create_task(self._run()))
+
+    def submit(self, guild_id: str, event_name: str, entry: dict, event_data=MISSING) -> bool:
+        """Queue ``entry`` without waiting; returns False if it will not be written."""
+        if not self._accept(event_data):
+            return False
+        try:
+            self._get_queue().put_nowait((guild_id, event_name, entry, event_data))
+        except asyncio.QueueFull:
+            self._count('dropped')
+            logger.warning(f"Log queue full, dropped a '{entry.get('action')}' entry of {event_name}")
+            return False
+        self._queued(self._queue.qsize())
+        return True
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._write(*item)
+            except Exception as e:
+                self._count('failed')
+                self._count('dropped')
+                logger.warning(f"Could not write log entry: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _write(self, guild_id, event_name, entry, event_data):
+        if event_data is MISSING:
+            event_data = await self.storage.get_event_metadata(guild_id, event_name)
+            if not self._has_log_channel(event_data):
+                self._count('skipped')
+                return
+        await self.sink(guild_id, event_name, entry)
+        self._count('written')
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued entry is written; False if ``timeout`` passed first."""
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        if self._sink_method('flush'):
+            await self.sink.flush()
+        return True
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Drain the queue and stop the workers."""
+        if not await self.flush(timeout):
+            logger.warning(f"Log queue not drained on shutdown, {self.depth()} entries lost")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._sink_method('close'):
+            await self.sink.close()
+
+
+_log_dispatcher: Optional[LogDispatcher] = None
+
+
+def get_log_dispatcher() -> Optional[LogDispatcher]:
+    """Return the log dispatcher of the Flask app, if one was set."""
+    return _log_dispatcher
+
+
+def set_log_dispatcher(dispatcher: Optional[LogDispatcher]) -> None:
+    """Replace the log dispatcher of the Flask app, draining the previous one."""
+    global _log_dispatcher
+    if _log_dispatcher is not None and _log_dispatcher is not dispatcher:
+        _log_dispatcher.close()
+    _log_dispatcher = dispatcher
+
+
+# Entries still queued when the process exits are written first
+atexit.register(lambda: set_log_dispatcher(None))
@@ -0,0 +1,232 @@
+# Batched writes of audit log entries.
+#
+# The log dispatcher hands entries to a sink one at a time. This sink buffers
+# them and commits up to ``batch_size`` entries per batched write, once enough
+# have gathered or ``flush_interval`` seconds have passed, instead of one RPC
+# per entry. A failed commit is retried on the next timed flush; entries beyond
+# ``max_buffer`` or past ``max_retries`` failed commits are dropped and counted.
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Deque, List, Optional
+
+from ...utils.firestore_limits import MAX_WRITES_PER_COMMIT
+
+logger = logging.getLogger(__name__)
+
+
+class _Batches:
+    """Buffer, retry bookkeeping and counters shared by the sync and async sinks."""
+
+    def __init__(self, storage, batch_size: int, flush_interval: float, max_buffer: int, max_retries: int):
+        self.storage = storage
+        self.batch_size = max(1, min(batch_size, MAX_WRITES_PER_COMMIT))
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.flushes = 0
+        self.commits = 0
+        self.written = 0
+        self.retried = 0
+        self.dropped = 0
+        self.last_flush = {'written': 0, 'commits': 0, 'failed': 0}
+        # [guild_id, event_name, entry, failed commits]
+        self._buffer: Deque[list] = deque()
+        # After a failed commit only the timer flushes, so a struggling backend is not hammered
+        self._backing_off = False
+        self._lock = threading.Lock()
+
+    def _add(self, guild_id: str, event_name: str, entry: dict) -> bool:
+        """Buffer an entry; True once a full batch is waiting."""
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                logger.warning(f"Log buffer full, dropped a '{entry.get('action')}' entry of {event_name}")
+                return False
+            self._buffer.append([guild_id, event_name, entry, 0])
+            return len(self._buffer) >= self.batch_size and not self._backing_off
+
+    def _take(self) -> List[list]:
+        with self._lock:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _retry(self, items: List[list], error: Exception) -> None:
+        """Put the entries of a failed commit back at the front, in order, unless they ran out of retries."""
+        logger.warning(f"Could not write {len(items)} log entries: {error}")
+        with self._lock:
+            for item in reversed(items):
+                item[3] += 1
+                if item[3] > self.max_retries or len(self._buffer) >= self.max_buffer:
+                    self.dropped += 1
+                else:
+                    self._buffer.appendleft(item)
+                    self.retried += 1
+
+    def _put_back(self, items: List[list]) -> None:
+        """Return entries whose commit was cancelled, without counting a failure."""
+        with self._lock:
+            self._buffer.extendleft(reversed(items))
+
+    def _flushed(self, written: int, commits: int, failed: int) -> dict:
+        with self._lock:
+            self._backing_off = failed > 0
+            self.flushes += 1
+            self.commits += commits
+            self.written += written
+            self.last_flush = {'written': written, 'commits': commits, 'failed': failed}
+        if written or failed:
+            logger.debug(f"Flushed {written} log entries in {commits} commits, {failed} failed")
+        return self.last_flush
+
+    @staticmethod
+    def _entries(items: List[list]) -> list:
+        return [(guild_id, event_name, entry) for guild_id, event_name, entry, _ in items]
+
+    def buffered(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'buffered': len(self._buffer),
+                'max_buffer': self.max_buffer,
+                'flushes': self.flushes,
+                'commits': self.commits,
+                'written': self.written,
+                'entries_per_commit': round(self.written / self.commits, 1) if self.commits else 0.0,
+                # Entries put back after a failed commit, and entries given up on
+                'retried': self.retried,
+                'dropped': self.dropped,
+                'last_flush': dict(self.last_flush),
+            }
+
+
+class BatchedLogSink(_Batches):
+    """Log sink committing buffered entries through a sync ``Storage``'s ``add_logs``.
+
+    Args:
+        storage: Storage holding the logs.
+        batch_size: Entries per commit, and the buffer size that triggers a flush.
+        flush_interval: Longest an entry waits in the buffer, in seconds.
+        max_buffer: Entries buffered before new ones are dropped.
+        max_retries: Failed commits an entry survives before it is dropped.
+    """
+
+    def __init__(self, storage, batch_size: int = 100, flush_interval: float = 0.5, max_buffer: int = 5000,
+                 max_retries: int = 3):
+        super().__init__(storage, batch_size, flush_interval, max_buffer, max_retries)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, guild_id: str, event_name: str, entry: dict) -> None:
+        if self._add(guild_id, event_name, entry):
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='log-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> dict:
+        """Commit the buffered entries; returns the counts of this flush.
+
+        Stops at the first failed commit, whose entries wait for the next flush.
+        """
+        with self._flush_lock:
+            written = commits = failed = 0
+            while True:
+                items = self._take()
+                if not items:
+                    break
+                try:
+                    self.storage.add_logs(self._entries(items))
+                except Exception as e:
+                    failed += len(items)
+                    self._retry(items, e)
+                    break
+                written += len(items)
+                commits += 1
+            return self._flushed(written, commits, failed)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the flush thread and write what is left, retrying failed commits."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        for _ in range(self.max_retries + 1):
+            self.flush()
+            if not self.buffered():
+                break
+
+
+class AsyncBatchedLogSink(_Batches):
+    """``BatchedLogSink`` for the ASGI app: flushes from an asyncio task over an ``AsyncStorage``.
+
+    Start it inside the event loop that will run it.
+    """
+
+    def __init__(self, storage, batch_size: int = 100, flush_interval: float = 0.5, max_buffer: int = 5000,
+                 max_retries: int = 3):
+        super().__init__(storage, batch_size, flush_interval, max_buffer, max_retries)
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def __call__(self, guild_id: str, event_name: str, entry: dict) -> None:
+        if self._add(guild_id, event_name, entry):
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> dict:
+        """Commit the buffered entries; returns the counts of this flush."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            written = commits = failed = 0
+            while True:
+                items = self._take()
+                if not items:
+                    break
+                try:
+                    await self.storage.add_logs(self._entries(items))
+                except asyncio.CancelledError:
+                    self._put_back(items)
+                    raise
+                except Exception as e:
+                    failed += len(items)
+                    self._retry(items, e)
+                    break
+                written += len(items)
+                commits += 1
+            return self._flushed(written, commits, failed)
+
+    async def close(self) -> None:
+        """Stop the flush task and write what is left, retrying failed commits."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(self.max_retries + 1):
+            await self.flush()
+            if not self.buffered():
+                break
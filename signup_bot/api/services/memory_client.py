@@ -0,0 +1,769 @@
+# In-memory stand-in for the Firestore client.
+#
+# Mirrors the subset of ``google.cloud.firestore`` the API uses (documents,
+# collections, ``where``/``order_by``/``limit`` queries, batches and
+# transactions) so the service can be benchmarked and tested without a live
+# Firebase project. Every RPC is counted in ``MemoryClient.stats`` so hot
+# paths can be compared by Firestore operation count.
+import copy
+import functools
+import random
+import string
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from google.api_core import exceptions
+from google.cloud.firestore_v1 import ReadAfterWriteError, transforms
+from google.cloud.firestore_v1.field_path import FieldPath, parse_field_path
+
+from ...utils.firestore_limits import MAX_DOCUMENT_BYTES, MAX_WRITES_PER_COMMIT, document_size
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+_MISSING = object()
+
+
+def _auto_id() -> str:
+    """Generate a 20 character document ID like Firestore does."""
+    return ''.join(random.choice(_AUTO_ID_CHARS) for _ in range(20))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _split_path(path) -> List[str]:
+    """Split a field path given as a string or ``FieldPath`` into its parts."""
+    if isinstance(path, FieldPath):
+        return list(path.parts)
+    return parse_field_path(path)
+
+
+def _get_field(data: dict, path) -> Any:
+    """Return the value at ``path`` or ``_MISSING`` if it is absent."""
+    return _get_parts(data, _split_path(path))
+
+
+def _get_parts(data: dict, parts) -> Any:
+    """``_get_field`` for a path already split into its parts."""
+    value = data
+    for part in parts:
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_field(data: dict, parts: List[str], value) -> None:
+    """Set the value at ``parts``, applying Firestore transforms."""
+    for part in parts[:-1]:
+        child = data.get(part)
+        if not isinstance(child, dict):
+            child = data[part] = {}
+        data = child
+
+    key = parts[-1]
+    if value is transforms.DELETE_FIELD:
+        data.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP:
+        data[key] = _now()
+    elif isinstance(value, transforms.Increment):
+        current = data.get(key)
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        data[key] = base + value.value
+    elif isinstance(value, transforms.Maximum):
+        current = data.get(key)
+        data[key] = value.value if not isinstance(current, (int, float)) else max(current, value.value)
+    elif isinstance(value, transforms.Minimum):
+        current = data.get(key)
+        data[key] = value.value if not isinstance(current, (int, float)) else min(current, value.value)
+    elif isinstance(value, transforms.ArrayUnion):
+        current = data.get(key)
+        current = list(current) if isinstance(current, list) else []
+        for item in value.values:
+            if item not in current:
+                current.append(copy.deepcopy(item))
+        data[key] = current
+    elif isinstance(value, transforms.ArrayRemove):
+        current = data.get(key)
+        current = list(current) if isinstance(current, list) else []
+        data[key] = [item for item in current if item not in value.values]
+    elif isinstance(value, dict):
+        # Nested maps may contain transforms of their own
+        child = {}
+        for child_key, child_value in value.items():
+            _set_field(child, [child_key], child_value)
+        data[key] = child
+    else:
+        data[key] = copy.deepcopy(value)
+
+
+def _merge(target: dict, source: dict) -> None:
+    """Deep merge ``source`` into ``target`` like ``set(..., merge=True)``."""
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            _set_field(target, [key], value)
+
+
+# Firestore orders values of different types by type first
+_TYPE_ORDER = (
+    (type(None),),
+    (bool,),
+    (int, float),
+    (datetime,),
+    (str,),
+    (bytes,),
+    (list, tuple),
+    (dict,),
+)
+
+
+def _sort_key(value):
+    """Build a key that orders values the way Firestore does."""
+    for rank, types in enumerate(_TYPE_ORDER):
+        if isinstance(value, types):
+            if rank == 6:
+                return rank, [_sort_key(item) for item in value]
+            if rank == 7:
+                return rank, sorted((k, _sort_key(v)) for k, v in value.items())
+            return rank, value
+    return len(_TYPE_ORDER), str(value)
+
+
+def _compare(left, op: str, right) -> bool:
+    """Evaluate a single ``where`` filter."""
+    if op == '==':
+        return _sort_key(left) == _sort_key(right)
+    if op == '!=':
+        return left is not None and _sort_key(left) != _sort_key(right)
+    if op == 'in':
+        return any(_sort_key(left) == _sort_key(item) for item in right)
+    if op == 'not-in':
+        return left is not None and all(_sort_key(left) != _sort_key(item) for item in right)
+    if op == 'array-contains':
+        return isinstance(left, list) and any(_sort_key(item) == _sort_key(right) for item in left)
+    if op == 'array-contains-any':
+        return isinstance(left, list) and any(
+            _sort_key(item) == _sort_key(candidate) for item in left for candidate in right
+        )
+
+    # Range filters only match values of the same type
+    left_key, right_key = _sort_key(left), _sort_key(right)
+    if left_key[0] != right_key[0]:
+        return False
+    if op == '<':
+        return left_key < right_key
+    if op == '<=':
+        return left_key <= right_key
+    if op == '>':
+        return left_key > right_key
+    if op == '>=':
+        return left_key >= right_key
+    raise ValueError(f"Operator string {op!r} is invalid")
+
+
+class _StoredDocument:
+    """A document as held by the in-memory store."""
+
+    __slots__ = ('data', 'create_time', 'update_time')
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.create_time = self.update_time = _now()
+
+
+class MemoryDocumentSnapshot:
+    """Snapshot of a document at the time it was read."""
+
+    def __init__(self, reference: 'MemoryDocumentReference', data: Optional[dict],
+                 create_time=None, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.create_time = create_time
+        self.update_time = update_time
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        if self._data is None:
+            return None
+        value = _get_field(self._data, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class MemoryDocumentReference:
+    """Reference to a single document path."""
+
+    def __init__(self, client: 'MemoryClient', path: tuple):
+        self._client = client
+        self._path = path
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    @property
+    def path(self) -> str:
+        return '/'.join(self._path)
+
+    @property
+    def parent(self) -> 'MemoryCollectionReference':
+        return MemoryCollectionReference(self._client, self._path[:-1])
+
+    def collection(self, collection_id: str) -> 'MemoryCollectionReference':
+        return MemoryCollectionReference(self._client, self._path + (collection_id,))
+
+    def get(self, field_paths=None, transaction=None) -> MemoryDocumentSnapshot:
+        if transaction is not None:
+            transaction._check_read()
+            transaction._lock(self)
+        snapshot = self._client._read(self)
+        if field_paths is not None and snapshot.exists:
+            snapshot._data = _project(snapshot._data, [_split_path(path) for path in field_paths])
+        return snapshot
+
+    def create(self, document_data: dict):
+        self._client._commit([('create', self, document_data, None)])
+
+    def set(self, document_data: dict, merge: bool = False):
+        self._client._commit([('set', self, document_data, merge)])
+
+    def update(self, field_updates: dict, option=None):
+        self._client._commit([('update', self, field_updates, None)])
+
+    def delete(self, option=None):
+        self._client._commit([('delete', self, None, None)])
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other._path == self._path
+
+    def __hash__(self):
+        return hash(self._path)
+
+    def __repr__(self):
+        return f"<MemoryDocumentReference {self.path}>"
+
+
+def _project(data: dict, field_parts) -> dict:
+    """Keep only the fields at ``field_parts`` (split field paths) of ``data``, as ``select`` does."""
+    projected = {}
+    for parts in field_parts:
+        value = _get_parts(data, parts)
+        if value is not _MISSING:
+            _set_field(projected, parts, value)
+    return projected
+
+
+class MemoryQuery:
+    """Immutable query over one collection or a collection group."""
+
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, client: 'MemoryClient', parent_path: tuple, all_descendants: bool = False,
+                 filters=(), orders=(), limit=None, offset=0, projection=None,
+                 start=None, end=None):
+        self._client = client
+        self._parent_path = parent_path
+        self._all_descendants = all_descendants
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._projection = projection
+        self._start = start
+        self._end = end
+
+    def _copy(self, **overrides) -> 'MemoryQuery':
+        params = dict(
+            filters=self._filters, orders=self._orders, limit=self._limit,
+            offset=self._offset, projection=self._projection,
+            start=self._start, end=self._end,
+        )
+        params.update(overrides)
+        return MemoryQuery(self._client, self._parent_path, self._all_descendants, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None) -> 'MemoryQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction: str = ASCENDING) -> 'MemoryQuery':
+        if direction not in (self.ASCENDING, self.DESCENDING):
+            raise ValueError(f"Invalid direction {direction!r}")
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'MemoryQuery':
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> 'MemoryQuery':
+        return self._copy(offset=num_to_skip)
+
+    def select(self, field_paths) -> 'MemoryQuery':
+        # Split once here rather than for every matching document
+        return self._copy(projection=[_split_path(path) for path in field_paths])
+
+    def start_at(self, document_fields) -> 'MemoryQuery':
+        return self._copy(start=(document_fields, True))
+
+    def start_after(self, document_fields) -> 'MemoryQuery':
+        return self._copy(start=(document_fields, False))
+
+    def end_before(self, document_fields) -> 'MemoryQuery':
+        return self._copy(end=(document_fields, False))
+
+    def end_at(self, document_fields) -> 'MemoryQuery':
+        return self._copy(end=(document_fields, True))
+
+    def count(self, alias: str = 'count') -> 'MemoryAggregationQuery':
+        return MemoryAggregationQuery(self, alias)
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        # Inequality filters imply an order on their field
+        if not orders:
+            for field_path, op, _ in self._filters:
+                if op in ('<', '<=', '>', '>=', '!=', 'not-in'):
+                    orders.append((field_path, self.ASCENDING))
+                    break
+        if not any(path == FieldPath.document_id() for path, _ in orders):
+            direction = orders[-1][1] if orders else self.ASCENDING
+            orders.append((FieldPath.document_id(), direction))
+        return orders
+
+    def _cursor_values(self, cursor, orders) -> list:
+        fields, _ = cursor
+        if isinstance(fields, MemoryDocumentSnapshot):
+            snapshot = fields
+            fields = dict(snapshot._data or {})
+            fields[FieldPath.document_id()] = snapshot.reference
+        if isinstance(fields, dict):
+            values = []
+            for path, _ in orders[:len(fields)]:
+                if path in fields:
+                    values.append(fields[path])
+                else:
+                    value = _get_field(fields, path)
+                    if value is _MISSING:
+                        raise ValueError(f"Cursor is missing the order_by field {path!r}")
+                    values.append(value)
+            fields = values
+        return list(fields)
+
+    @staticmethod
+    def _value_for(path, reference, data):
+        if path == FieldPath.document_id():
+            return reference.path
+        return _get_field(data, path)
+
+    def _position(self, reference, data, values, orders) -> int:
+        """Compare a document against cursor ``values`` (-1, 0 or 1)."""
+        for (path, direction), cursor_value in zip(orders, values):
+            if path == FieldPath.document_id():
+                if isinstance(cursor_value, MemoryDocumentReference):
+                    cursor_value = cursor_value.path
+                elif '/' not in str(cursor_value):
+                    cursor_value = '/'.join(reference._path[:-1] + (cursor_value,))
+            left = _sort_key(self._value_for(path, reference, data))
+            right = _sort_key(cursor_value)
+            if left != right:
+                result = -1 if left < right else 1
+                return -result if direction == self.DESCENDING else result
+        return 0
+
+    def _run(self) -> List[MemoryDocumentSnapshot]:
+        orders = self._effective_orders()
+        matches = []
+        for reference, stored in self._client._documents(self._parent_path, self._all_descendants):
+            data = stored.data
+            if not all(
+                (value := _get_field(data, path)) is not _MISSING and _compare(value, op, expected)
+                for path, op, expected in self._filters
+            ):
+                continue
+            # Documents without an order_by field are excluded by Firestore
+            if any(path != FieldPath.document_id() and _get_field(data, path) is _MISSING
+                   for path, _ in orders):
+                continue
+            matches.append((reference, stored))
+
+        for path, direction in reversed(orders):
+            matches.sort(
+                key=lambda item: _sort_key(self._value_for(path, item[0], item[1].data)),
+                reverse=direction == self.DESCENDING,
+            )
+
+        if self._start is not None:
+            values = self._cursor_values(self._start, orders)
+            inclusive = self._start[1]
+            matches = [
+                item for item in matches
+                if (pos := self._position(item[0], item[1].data, values, orders)) > 0
+                or (inclusive and pos == 0)
+            ]
+        if self._end is not None:
+            values = self._cursor_values(self._end, orders)
+            inclusive = self._end[1]
+            matches = [
+                item for item in matches
+                if (pos := self._position(item[0], item[1].data, values, orders)) < 0
+                or (inclusive and pos == 0)
+            ]
+
+        matches = matches[self._offset:]
+        if self._limit is not None:
+            matches = matches[:self._limit]
+
+        snapshots = []
+        for reference, stored in matches:
+            data = stored.data
+            if self._projection is not None:
+                # Projected first, so fields left out are never copied
+                data = _project(data, self._projection)
+            data = copy.deepcopy(data)
+            snapshots.append(MemoryDocumentSnapshot(reference, data, stored.create_time, stored.update_time))
+        return snapshots
+
+    def stream(self, transaction=None):
+        if transaction is not None:
+            transaction._check_read()
+        snapshots = self._client._query(self)
+        if transaction is not None:
+            # Documents matched by a query are locked once read, so one another
+            # transaction holds may have changed since: retry instead of waiting.
+            # Documents inserted later are not locked.
+            for snapshot in snapshots:
+                transaction._lock(snapshot.reference, wait=False)
+        yield from snapshots
+
+    def get(self, transaction=None) -> List[MemoryDocumentSnapshot]:
+        return list(self.stream(transaction=transaction))
+
+
+class MemoryAggregationResult:
+    """Result of an aggregation such as ``count()``."""
+
+    def __init__(self, alias: str, value):
+        self.alias = alias
+        self.value = value
+
+
+class MemoryAggregationQuery:
+    """``count()`` aggregation over a query."""
+
+    def __init__(self, query: MemoryQuery, alias: str):
+        self._query = query
+        self._alias = alias
+
+    def get(self, transaction=None):
+        if transaction is not None:
+            transaction._check_read()
+        count = self._query._client._count(self._query)
+        return [[MemoryAggregationResult(self._alias, count)]]
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """Reference to a collection, usable as a query over it."""
+
+    def __init__(self, client: 'MemoryClient', path: tuple):
+        super().__init__(client, path)
+        self._path = path
+
+    @property
+    def id(self) -> str:
+        return self._path[-1]
+
+    def document(self, document_id: Optional[str] = None) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self._client, self._path + (document_id or _auto_id(),))
+
+    def add(self, document_data: dict, document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return _now(), reference
+
+    def list_documents(self):
+        # Like Firestore, include "missing" documents that only hold subcollections
+        return [self.document(document_id) for document_id in self._client._document_ids(self._path)]
+
+
+class MemoryWriteBatch:
+    """Collects writes and applies them atomically on ``commit``."""
+
+    def __init__(self, client: 'MemoryClient'):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def create(self, reference, document_data):
+        self._writes.append(('create', reference, document_data, None))
+
+    def set(self, reference, document_data, merge: bool = False):
+        self._writes.append(('set', reference, document_data, merge))
+
+    def update(self, reference, field_updates, option=None):
+        self._writes.append(('update', reference, field_updates, None))
+
+    def delete(self, reference, option=None):
+        self._writes.append(('delete', reference, None, None))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit(writes)
+        return [_now() for _ in writes]
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """Transaction that buffers writes until the transactional function returns.
+
+    Like Firestore's server libraries, reading a document in the transaction
+    locks it until the transaction commits or rolls back, so a concurrent
+    transaction reading the same document waits for the commit. A lock not
+    obtained within ``lock_timeout`` seconds aborts the attempt, which breaks
+    deadlocks between transactions locking documents in opposite orders.
+    """
+
+    def __init__(self, client: 'MemoryClient', max_attempts: int = 5):
+        super().__init__(client)
+        self.max_attempts = max_attempts
+        self._held: Dict[tuple, threading.Lock] = {}
+
+    def _check_read(self):
+        if self._writes:
+            raise ReadAfterWriteError("Attempted read after write in a transaction.")
+
+    def _lock(self, reference, wait: bool = True) -> None:
+        """Lock ``reference`` for the rest of the transaction, or abort the attempt."""
+        if reference._path in self._held:
+            return
+        lock = self._client._document_lock(reference._path)
+        if not lock.acquire(timeout=self._client.lock_timeout if wait else 0):
+            raise exceptions.Aborted(f"Transaction lock timeout on {reference.path}")
+        self._held[reference._path] = lock
+
+    def _release(self) -> None:
+        held, self._held = self._held, {}
+        for lock in held.values():
+            lock.release()
+
+    def _rollback(self) -> None:
+        self._writes = []
+        self._release()
+
+    def commit(self):
+        try:
+            return super().commit()
+        finally:
+            self._release()
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, MemoryDocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+
+def transactional(to_wrap):
+    """In-memory counterpart of ``firestore.transactional``.
+
+    Runs the function and commits its writes, retrying from scratch (after a
+    short jittered wait) when an attempt is aborted, up to the transaction's
+    ``max_attempts``.
+    """
+    @functools.wraps(to_wrap)
+    def wrapper(transaction: MemoryTransaction, *args, **kwargs):
+        for attempt in range(1, transaction.max_attempts + 1):
+            try:
+                result = to_wrap(transaction, *args, **kwargs)
+                transaction.commit()
+                return result
+            except exceptions.Aborted:
+                transaction._rollback()
+                with transaction._client._lock:
+                    transaction._client.stats['aborted'] += 1
+                if attempt == transaction.max_attempts:
+                    raise
+                time.sleep(random.uniform(0, 0.01 * attempt))
+            except BaseException:
+                transaction._rollback()
+                raise
+    return wrapper
+
+
+class MemoryClient:
+    """Thread-safe in-memory database with the Firestore client interface.
+
+    Args:
+        latency: Seconds to sleep on every simulated RPC, to approximate
+            network round trips in benchmarks.
+        lock_timeout: Seconds a transaction waits for a document another
+            transaction has read before its attempt is aborted.
+        max_document_bytes: Size above which writes are rejected, like
+            Firestore's 1 MiB document limit.
+    """
+
+    def __init__(self, latency: float = 0.0, lock_timeout: float = 2.0,
+                 max_document_bytes: int = MAX_DOCUMENT_BYTES):
+        self.latency = latency
+        self.lock_timeout = lock_timeout
+        self.max_document_bytes = max_document_bytes
+        self.stats = Counter()
+        self._collections: Dict[tuple, Dict[str, _StoredDocument]] = {}
+        self._lock = threading.RLock()
+        self._document_locks: Dict[tuple, threading.Lock] = {}
+
+    # References
+
+    def collection(self, *collection_path: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self, tuple('/'.join(collection_path).split('/')))
+
+    def document(self, *document_path: str) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self, tuple('/'.join(document_path).split('/')))
+
+    def collection_group(self, collection_id: str) -> MemoryQuery:
+        return MemoryQuery(self, (collection_id,), all_descendants=True)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, **kwargs) -> MemoryTransaction:
+        return MemoryTransaction(self, max_attempts)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        if transaction is not None:
+            transaction._check_read()
+        for reference in references:
+            yield reference.get(field_paths=field_paths)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    # Storage internals
+
+    def _document_lock(self, path: tuple) -> threading.Lock:
+        with self._lock:
+            return self._document_locks.setdefault(path, threading.Lock())
+
+    def _rpc(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _documents(self, parent_path: tuple, all_descendants: bool):
+        if all_descendants:
+            collection_id = parent_path[0]
+            paths = [path for path in self._collections if path[-1] == collection_id]
+        else:
+            paths = [parent_path] if parent_path in self._collections else []
+        for path in paths:
+            for document_id, stored in self._collections[path].items():
+                yield MemoryDocumentReference(self, path + (document_id,)), stored
+
+    def _document_ids(self, collection_path: tuple) -> List[str]:
+        with self._lock:
+            ids = set(self._collections.get(collection_path, {}))
+            depth = len(collection_path)
+            for path in self._collections:
+                if len(path) > depth + 1 and path[:depth] == collection_path and self._collections[path]:
+                    ids.add(path[depth])
+        return sorted(ids)
+
+    def _read(self, reference: MemoryDocumentReference) -> MemoryDocumentSnapshot:
+        self._rpc()
+        with self._lock:
+            self.stats['reads'] += 1
+            stored = self._collections.get(reference._path[:-1], {}).get(reference.id)
+            if stored is None:
+                return MemoryDocumentSnapshot(reference, None)
+            return MemoryDocumentSnapshot(reference, copy.deepcopy(stored.data),
+                                          stored.create_time, stored.update_time)
+
+    def _query(self, query: MemoryQuery) -> List[MemoryDocumentSnapshot]:
+        self._rpc()
+        with self._lock:
+            snapshots = query._run()
+            self.stats['queries'] += 1
+            # Firestore bills one read per returned document, minimum one
+            self.stats['reads'] += max(1, len(snapshots))
+        return snapshots
+
+    def _count(self, query: MemoryQuery) -> int:
+        self._rpc()
+        with self._lock:
+            count = len(query._copy(projection=[])._run())
+            self.stats['queries'] += 1
+            # Aggregations bill one read per 1000 index entries
+            self.stats['reads'] += max(1, (count + 999) // 1000)
+        return count
+
+    def _commit(self, writes: list) -> None:
+        if len(writes) > MAX_WRITES_PER_COMMIT:
+            raise exceptions.InvalidArgument(
+                f"maximum {MAX_WRITES_PER_COMMIT} writes allowed per request"
+            )
+        self._rpc()
+        with self._lock:
+            # Validate the whole commit before applying any of it
+            staged: Dict[tuple, Optional[_StoredDocument]] = {}
+
+            def current(reference):
+                if reference._path in staged:
+                    return staged[reference._path]
+                return self._collections.get(reference._path[:-1], {}).get(reference.id)
+
+            for kind, reference, data, merge in writes:
+                existing = current(reference)
+                if kind == 'create':
+                    if existing is not None:
+                        raise exceptions.AlreadyExists(f"Document already exists: {reference.path}")
+                    stored = _StoredDocument({})
+                    _merge(stored.data, data)
+                elif kind == 'set':
+                    stored = _StoredDocument({})
+                    if existing is not None:
+                        stored.create_time = existing.create_time
+                        if merge:
+                            stored.data = copy.deepcopy(existing.data)
+                    _merge(stored.data, data)
+                elif kind == 'update':
+                    if existing is None:
+                        raise exceptions.NotFound(f"No document to update: {reference.path}")
+                    stored = _StoredDocument(copy.deepcopy(existing.data))
+                    stored.create_time = existing.create_time
+                    for path, value in data.items():
+                        _set_field(stored.data, _split_path(path), value)
+                else:
+                    stored = None
+                if stored is not None and document_size(reference.path, stored.data) > self.max_document_bytes:
+                    raise exceptions.InvalidArgument(
+                        f"Document {reference.path} exceeds the maximum allowed size of "
+                        f"{self.max_document_bytes} bytes"
+                    )
+                staged[reference._path] = stored
+
+            for path, stored in staged.items():
+                documents = self._collections.setdefault(path[:-1], {})
+                if stored is None:
+                    documents.pop(path[-1], None)
+                else:
+                    documents[path[-1]] = stored
+
+            # Firestore bills every write in a commit, deletes included
+            for kind, _, _, _ in writes:
+                self.stats['deletes' if kind == 'delete' else 'writes'] += 1
+            self.stats['commits'] += 1
@@ -0,0 +1,272 @@
+# Clash of Clans player lookups for the API.
+#
+# Profiles are cached by normalized tag, so a player signing up to several
+# events is fetched from the proxy once per TTL, and concurrent misses for one
+# tag share a single proxy call. The cache can be persisted
+# to a local file or a Firestore collection so a restart starts warm. Tags the
+# API reported as not found are remembered briefly, so repeated submissions
+# of a bad tag are rejected without a proxy call.
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from ... import Config
+from ...utils.player_tags import normalize_player_tag, signup_doc_id
+from .cache import MISSING, TTLCache
+from .coc_client import PlayerNotFound
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Profile fields the API uses; the rest of the proxy's answer is not kept
+PROFILE_FIELDS = ('tag', 'name', 'townHallLevel')
+
+
+def trim_profile(profile: dict) -> dict:
+    """Return the fields of a proxy profile that are worth caching."""
+    return {field: profile[field] for field in PROFILE_FIELDS if field in profile}
+
+
+class FilePlayerStore:
+    """Persists profiles as JSON lines in a local file; the last line for a tag wins.
+
+    Expired and superseded lines are dropped when the file is loaded, and
+    whenever it has grown to ``compact_lines`` lines (or twice the profiles it
+    held after the last compaction, if more), so a long-running process does
+    not grow it without bound.
+    """
+
+    def __init__(self, path: str, compact_lines: int = 10000, max_age: Optional[float] = None):
+        self.path = path
+        self.compact_lines = compact_lines
+        # Set by load(); until then compaction only drops superseded lines
+        self.max_age = max_age
+        self.compactions = 0
+        self._lines: Optional[int] = None
+        self._limit = compact_lines
+        self._lock = threading.Lock()
+
+    def load(self, max_age: float) -> Iterator[Tuple[str, dict, float]]:
+        """Yield ``(tag, profile, fetched_at)`` for entries younger than ``max_age`` seconds.
+
+        Expired and superseded lines are dropped from the file as it is read.
+        """
+        with self._lock:
+            self.max_age = max_age
+            entries = self._compact()
+        for tag, (profile, fetched_at) in entries.items():
+            yield tag, profile, fetched_at
+
+    def save(self, tag: str, profile: dict, fetched_at: float) -> None:
+        line = json.dumps({'tag': tag, 'profile': profile, 'fetched_at': fetched_at})
+        with self._lock:
+            if self._lines is None:
+                self._lines = self._count_lines()
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+            self._lines += 1
+            if self._lines >= self._limit:
+                self._compact()
+
+    def _count_lines(self) -> int:
+        try:
+            with open(self.path, 'rb') as file:
+                return sum(1 for _ in file)
+        except FileNotFoundError:
+            return 0
+
+    def _read(self) -> Dict[str, Tuple[dict, float]]:
+        entries: Dict[str, Tuple[dict, float]] = {}
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        entries[entry['tag']] = (entry['profile'], float(entry['fetched_at']))
+                    except (ValueError, KeyError, TypeError):
+                        continue  # A line cut short by a crash
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _compact(self) -> Dict[str, Tuple[dict, float]]:
+        """Rewrite the file with the live entry of each tag and return them; called with the lock held."""
+        entries = self._read()
+        if self.max_age is not None:
+            oldest = time.time() - self.max_age
+            entries = {tag: entry for tag, entry in entries.items() if entry[1] > oldest}
+        if entries or os.path.exists(self.path):
+            self._rewrite(entries)
+        self.compactions += 1
+        self._lines = len(entries)
+        # A cache holding more live profiles than the threshold is not rewritten on every save
+        self._limit = max(self.compact_lines, 2 * len(entries))
+        return entries
+
+    def _rewrite(self, entries):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            for tag, (profile, fetched_at) in entries.items():
+                file.write(json.dumps({'tag': tag, 'profile': profile, 'fetched_at': fetched_at}) + '\n')
+        os.replace(temporary, self.path)
+
+
+class FirestorePlayerStore:
+    """Persists profiles in a Firestore collection, one document per tag."""
+
+    def __init__(self, db, collection: str = 'player_cache'):
+        self.collection = db.collection(collection)
+
+    def load(self, max_age: float) -> Iterator[Tuple[str, dict, float]]:
+        query = self.collection.where('fetched_at', '>', time.time() - max_age)
+        for doc in query.stream():
+            entry = doc.to_dict()
+            yield entry['tag'], entry['profile'], entry['fetched_at']
+
+    def save(self, tag: str, profile: dict, fetched_at: float) -> None:
+        self.collection.document(signup_doc_id(tag)).set({'tag': tag, 'profile': profile, 'fetched_at': fetched_at})
+
+
+class PlayerLookup:
+    """Cache of player profiles in front of the Clash of Clans proxy.
+
+    Args:
+        ttl: Seconds a profile is served from the cache.
+        max_entries: Profiles kept in memory.
+        store: Optional ``FilePlayerStore`` or ``FirestorePlayerStore``.
+        not_found_ttl: Seconds a tag the API did not know is answered with {} locally.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, store=None, not_found_ttl: float = 0.0):
+        # Wall-clock expiry, so persisted entries keep their age across restarts
+        self.cache = TTLCache(max_entries, ttl, clock=time.time)
+        self.not_found = TTLCache(max_entries, not_found_ttl)
+        self.store = store
+        # Concurrent misses for one tag (double clicks, retries, parallel events) share a call
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def warm(self) -> int:
+        """Load the persisted profiles into memory; returns how many were loaded."""
+        if self.store is None or not self.cache.enabled:
+            return 0
+        loaded = 0
+        try:
+            for tag, profile, fetched_at in self.store.load(self.cache.ttl):
+                self.cache.set_until(tag, profile, fetched_at + self.cache.ttl)
+                loaded += 1
+        except Exception as e:
+            logger.warning(f"Could not load the player cache: {e}")
+        return loaded
+
+    def get(self, player_tag: str, fetch: Callable[[str], dict]) -> dict:
+        """Return the profile of a player, calling ``fetch(tag)`` on a miss.
+
+        Empty results are returned but not cached;
+        ``fetch`` raising ``PlayerNotFound`` returns {} and is remembered.
+        """
+        tag = normalize_player_tag(player_tag)
+        profile = self.cache.get(tag)
+        if profile is MISSING and self.not_found.get(tag) is MISSING:
+            profile = self.flights.do(tag, lambda: self._fetch(tag, fetch))
+        return dict(profile) if profile is not MISSING else {}
+
+    def _fetch(self, tag, fetch):
+        start = time.perf_counter()
+        try:
+            profile = fetch(tag)
+        except PlayerNotFound:
+            self.not_found.set(tag, True)
+            profile = {}
+        self._remember(tag, profile, time.perf_counter() - start)
+        return profile
+
+    async def get_async(self, player_tag: str, fetch: Callable[[str], Awaitable[dict]]) -> dict:
+        """``get`` for a coroutine ``fetch``; the store is written off the event loop."""
+        tag = normalize_player_tag(player_tag)
+        profile = self.cache.get(tag)
+        if profile is MISSING and self.not_found.get(tag) is MISSING:
+            profile = await self.async_flights.do(tag, lambda: self._fetch_async(tag, fetch))
+        return dict(profile) if profile is not MISSING else {}
+
+    async def _fetch_async(self, tag, fetch):
+        start = time.perf_counter()
+        try:
+            profile = await fetch(tag)
+        except PlayerNotFound:
+            self.not_found.set(tag, True)
+            profile = {}
+        await asyncio.to_thread(self._remember, tag, profile, time.perf_counter() - start)
+        return profile
+
+    def _remember(self, tag, profile, elapsed):
+        with self._lock:
+            self.upstream_calls += 1
+            self.upstream_seconds += elapsed
+        if not profile:
+            return
+        profile = trim_profile(profile)
+        self.cache.set(tag, profile)
+        if self.store is not None and self.cache.enabled:
+            try:
+                self.store.save(tag, profile, time.time())
+            except Exception as e:
+                logger.warning(f"Could not persist player {tag}: {e}")
+
+    def stats(self) -> dict:
+        """Return the cache and coalescing counters and the upstream time the hits saved."""
+        stats = self.cache.stats()
+        flights, async_flights = self.flights.stats(), self.async_flights.stats()
+        with self._lock:
+            calls, seconds = self.upstream_calls, self.upstream_seconds
+        average = seconds / calls if calls else 0.0
+        stats.update({
+            'upstream_calls': calls,
+            'upstream_ms_avg': round(average * 1000, 2),
+            # Each hit would have cost an average upstream call
+            'saved_ms': round(stats['hits'] * average * 1000, 1),
+            # Misses that waited for another request's proxy call instead of making their own
+            'coalesced': flights['coalesced'] + async_flights['coalesced'],
+            'in_flight': flights['in_flight'] + async_flights['in_flight'],
+            # Lookups of known-bad tags answered without a proxy call
+            'not_found_hits': self.not_found.hits,
+        })
+        return stats
+
+
+def create_player_lookup(db=None) -> PlayerLookup:
+    """Create the lookup configured by ``Config.PLAYER_CACHE_*``; ``db`` backs the Firestore store."""
+    store = None
+    if Config.PLAYER_CACHE_STORE == 'file':
+        store = FilePlayerStore(Config.PLAYER_CACHE_FILE)
+    elif Config.PLAYER_CACHE_STORE == 'firestore' and db is not None:
+        store = FirestorePlayerStore(db)
+    lookup = PlayerLookup(Config.PLAYER_CACHE_TTL, Config.PLAYER_CACHE_SIZE, store, Config.PLAYER_NOT_FOUND_TTL)
+    loaded = lookup.warm()
+    if loaded:
+        logger.info(f"Loaded {loaded} cached players")
+    return lookup
+
+
+_player_lookup: Optional[PlayerLookup] = None
+
+
+def get_player_lookup() -> PlayerLookup:
+    """Return the player lookup used by the API, creating it on first use."""
+    global _player_lookup
+    if _player_lookup is None:
+        _player_lookup = create_player_lookup()
+    return _player_lookup
+
+
+def set_player_lookup(lookup: Optional[PlayerLookup]) -> None:
+    """Replace the player lookup used by the API."""
+    global _player_lookup
+    _player_lookup = lookup
@@ -0,0 +1,154 @@
+# Client-side rate limiting of the Clash of Clans API.
+#
+# Each API token gets a token bucket refilled at the rate the API allows it.
+# A request takes budget from the token with the most left, so a burst is
+# spread over all configured tokens; when every bucket is empty the request
+# waits for its turn, up to a short limit, instead of earning a 429.
+import asyncio
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+class RateLimited(Exception):
+    """No API token has budget within the allowed wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Clash of Clans API rate limit reached, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Budget of one API token: ``rate`` requests per second, bursts of up to ``burst``.
+
+    Not thread-safe on its own; ``TokenPool`` serializes access. ``rate`` 0
+    means unlimited, except while blocked by a 429.
+    """
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def remaining(self, now: float) -> float:
+        """Requests that can be sent right now (after ``refill``)."""
+        if now < self.blocked_until:
+            return 0.0
+        return self.tokens if self.rate > 0 else float('inf')
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until the next request can be sent (after ``refill``)."""
+        blocked = max(0.0, self.blocked_until - now)
+        if self.rate <= 0 or self.tokens >= 1:
+            return blocked
+        return max(blocked, (1 - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        # May go negative: the debt is the queue of requests already waiting on this token
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def block(self, now: float, seconds: float) -> None:
+        """Stop using the token for ``seconds``, after the API answered 429."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class TokenPool:
+    """Process-wide rate limiter over one or more API tokens.
+
+    Args:
+        tokens: API tokens; each gets its own budget.
+        rate: Requests per second allowed per token; 0 disables limiting.
+        burst: Requests a token can send at once after being idle (defaults to ``rate``).
+        max_wait: Longest a request queues for budget before ``RateLimited`` is raised.
+        clock: Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(self, tokens: Sequence[Optional[str]], rate: float, burst: Optional[float] = None,
+                 max_wait: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.tokens: List[Optional[str]] = list(tokens) or [None]
+        self.max_wait = max_wait
+        self.clock = clock
+        now = clock()
+        burst = burst if burst else max(rate, 1.0)
+        self._buckets = [TokenBucket(rate, burst, now) for _ in self.tokens]
+        self.acquired = 0
+        self.queued = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> Tuple[Optional[str], float]:
+        """Claim budget for one request; returns the token to use and the seconds to wait first.
+
+        Raises ``RateLimited`` if no token frees up within ``max_wait``.
+        """
+        with self._lock:
+            now = self.clock()
+            for bucket in self._buckets:
+                bucket.refill(now)
+            # The token with the most budget left, or else the one that frees up first
+            index = max(range(len(self._buckets)), key=lambda i: self._buckets[i].remaining(now))
+            if self._buckets[index].remaining(now) < 1:
+                index = min(range(len(self._buckets)), key=lambda i: self._buckets[i].wait_time(now))
+            bucket = self._buckets[index]
+            delay = bucket.wait_time(now)
+            if delay > self.max_wait:
+                self.rejected += 1
+                raise RateLimited(delay)
+            bucket.take()
+            self.acquired += 1
+            if delay > 0:
+                self.queued += 1
+                self.waited += delay
+            return self.tokens[index], delay
+
+    def acquire(self) -> Optional[str]:
+        """Wait for budget and return the token to send the request with."""
+        token, delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return token
+
+    async def acquire_async(self) -> Optional[str]:
+        """``acquire`` that waits without blocking the event loop."""
+        token, delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return token
+
+    def penalize(self, token: Optional[str], retry_after: Optional[float]) -> None:
+        """Record a 429 for ``token``: it is skipped until ``retry_after`` seconds have passed."""
+        with self._lock:
+            self.rate_limited += 1
+            now = self.clock()
+            bucket = self._buckets[self.tokens.index(token)]
+            bucket.refill(now)
+            bucket.block(now, 1.0 if retry_after is None else retry_after)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = self.clock()
+            remaining = []
+            for bucket in self._buckets:
+                bucket.refill(now)
+                remaining.append(round(min(bucket.remaining(now), bucket.burst), 1))
+            return {
+                'tokens': len(self._buckets),
+                # Budget left per token, in configuration order; the tokens themselves are secret
+                'remaining': remaining,
+                'acquired': self.acquired,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'rate_limited': self.rate_limited,
+                'wait_ms_avg': round(self.waited / self.queued * 1000, 1) if self.queued else 0.0,
+            }
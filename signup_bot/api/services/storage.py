@@ -0,0 +1,686 @@
+# Data-access layer for the Signup Bot API.
+#
+# Routes talk to a ``Storage`` instead of the Firestore client so the same
+# code can run against Firestore or against the in-memory stand-in.
+import copy
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.api_core import exceptions
+from google.cloud.firestore_v1 import transforms
+
+from ... import Config
+from ...utils.log_buckets import (
+    BUCKETS_COLLECTION, MAX_BUCKET_PARTS, bucket_append, bucket_doc_id, bucket_id, expand_entry, group_by_bucket,
+    in_range,
+)
+from ...utils.player_tags import signup_doc_id
+from . import memory_client
+from .cache import MISSING, TTLCache
+from .memory_client import MemoryClient
+
+logger = logging.getLogger(__name__)
+
+# Attempts before a contended transaction gives up (Firestore's default is 5)
+TRANSACTION_ATTEMPTS = 10
+
+
+class SignupResult:
+    """Outcomes of ``Storage.add_signup``."""
+    CREATED = 'created'
+    EVENT_NOT_FOUND = 'event_not_found'
+    EVENT_CLOSED = 'event_closed'
+    ALREADY_SIGNED_UP = 'already_signed_up'
+
+
+def count_th_levels(signups) -> dict:
+    """Return the number of signups per town hall level, keyed by the level as a string."""
+    composition = {}
+    for signup in signups:
+        th = str(signup.get('player_th', 0))
+        composition[th] = composition.get(th, 0) + 1
+    return composition
+
+
+class Storage(ABC):
+    """Interface for the events, signups, leader roles and logs the API stores."""
+
+    # Events
+
+    @abstractmethod
+    def get_event(self, guild_id: str, event_name: str) -> Optional[dict]:
+        """Return the event document, or None if it does not exist."""
+
+    @abstractmethod
+    def get_event_metadata(self, guild_id: str, event_name: str) -> Optional[dict]:
+        """Return the event document from this process's cache if it holds it, else like ``get_event``.
+
+        For existence, ``is_open``, ``role_id`` and ``log_channel_id`` checks; the
+        HTTP validators are built from ``get_event``, which always reads the database.
+        """
+
+    @abstractmethod
+    def list_events(self, guild_id: str, limit: Optional[int] = None,
+                    start_after: Optional[str] = None, fields: Optional[List[str]] = None) -> List[dict]:
+        """Return the events of a guild ordered by name, each with its document ``id``.
+
+        ``limit`` and ``start_after`` (an event ID) select a page; ``fields``
+        limits each event to those fields.
+        """
+
+    @abstractmethod
+    def create_event(self, guild_id: str, event_name: str, event_data: dict) -> bool:
+        """Create an event. Returns False if it already exists.
+
+        Every write to an event or its signups bumps the event's ``version`` and
+        ``updated_at``, which the API uses as HTTP validators.
+        """
+
+    @abstractmethod
+    def update_event(self, guild_id: str, event_name: str, fields: dict) -> None:
+        """Update fields of an existing event."""
+
+    @abstractmethod
+    def refresh_aggregate(self, guild_id: str, event_name: str) -> Optional[dict]:
+        """Recount ``signup_count`` and ``th_composition`` from the signups and store them.
+
+        Returns the stored aggregate fields, or None if the event does not exist.
+        """
+
+    # Signups
+
+    @abstractmethod
+    def list_signups(self, guild_id: str, event_name: str, limit: Optional[int] = None,
+                     start_after: Optional[int] = None) -> List[dict]:
+        """Return the signups of an event in signup order.
+
+        Each signup carries its document ``id`` and its 1-based display ``position``.
+        ``limit`` and ``start_after`` (a signup index) select a page.
+        """
+
+    @abstractmethod
+    def find_signup(self, guild_id: str, event_name: str, player_tag: str) -> Optional[dict]:
+        """Return the signup for a normalized player tag, or None if not signed up."""
+
+    @abstractmethod
+    def add_signup(self, guild_id: str, event_name: str, signup_data: dict) -> Tuple[str, Optional[dict]]:
+        """Atomically check the event is open, allocate the next index and store the signup.
+
+        The event's aggregate (``signup_count``, ``th_composition``) is updated in the same commit.
+        Returns a ``SignupResult`` and, when created, the stored signup including its index.
+        """
+
+    @abstractmethod
+    def signup_position(self, guild_id: str, event_name: str, signup: dict) -> int:
+        """Return the 1-based display position of a signup."""
+
+    @abstractmethod
+    def remove_signup(self, guild_id: str, event_name: str, player_tag: str) -> bool:
+        """Delete a signup and update the event's aggregate. Returns False if it or the event is gone."""
+
+    @abstractmethod
+    def list_pending_signups(self, limit: Optional[int] = None) -> List[dict]:
+        """Return signups of any guild still marked ``pending_enrichment``.
+
+        Each carries its document ``id``, ``guild_id`` and ``event_name``.
+        """
+
+    @abstractmethod
+    def enrich_signup(self, guild_id: str, event_name: str, player_tag: str, profile: Optional[dict]) -> bool:
+        """Fill in a pending signup's name and town hall from ``profile`` and clear the mark.
+
+        The event's ``th_composition`` moves the signup to its real town hall.
+        With ``profile`` None the signup is given up on and marked ``enrichment_failed``.
+        A signup whose event was deleted is only unmarked.
+        Returns False if the signup is gone or no longer pending.
+        """
+
+    # Leader roles
+
+    @abstractmethod
+    def get_leader_roles(self, guild_id: str) -> Optional[List[str]]:
+        """Return the leader role IDs of a guild, or None if none were ever set."""
+
+    @abstractmethod
+    def set_leader_roles(self, guild_id: str, role_ids: List[str]) -> None:
+        """Replace the leader role IDs of a guild."""
+
+    @abstractmethod
+    def invalidate_leader_roles(self, guild_id: str) -> None:
+        """Drop the cached leader roles of a guild so the next read goes to the database."""
+
+    # Caches
+
+    @abstractmethod
+    def cache_stats(self) -> dict:
+        """Return the hit and miss counters of each cache, by name."""
+
+    # Logs
+
+    @abstractmethod
+    def add_log(self, guild_id: str, event_name: str, log_entry: dict) -> None:
+        """Append an audit log entry for an event."""
+
+    @abstractmethod
+    def add_logs(self, entries: List[Tuple[str, str, dict]]) -> None:
+        """Append ``(guild_id, event_name, log_entry)`` entries in one batched commit (at most 500)."""
+
+    @abstractmethod
+    def read_logs(self, guild_id: str, event_name: str, since: Optional[str] = None,
+                  until: Optional[str] = None) -> List[dict]:
+        """Return the log entries of an event with ``since <= timestamp < until``, oldest first.
+
+        Entries are read from both log formats and returned in full form.
+        """
+
+
+class FirestoreDocuments:
+    """Document layout shared by the sync and async Firestore storages.
+
+    Works with any client exposing ``collection()``, including ``firestore.AsyncClient``.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # Leader roles are read on every permission check and almost never change
+        self.leader_roles_cache = TTLCache(Config.LEADER_ROLE_CACHE_SIZE, Config.LEADER_ROLE_CACHE_TTL)
+        # Event documents, kept current by this process's own writes
+        self.event_cache = TTLCache(Config.EVENT_CACHE_SIZE, Config.EVENT_CACHE_TTL)
+        # 'documents' (one per log entry) or 'hourly' (see utils.log_buckets)
+        self.log_format = Config.LOG_FORMAT
+        # Part of each recent event's hourly bucket that log entries are appended to
+        self.log_bucket_parts = TTLCache(Config.EVENT_CACHE_SIZE, 2 * 3600)
+
+    def invalidate_leader_roles(self, guild_id):
+        self.leader_roles_cache.invalidate(str(guild_id))
+
+    def cache_stats(self):
+        return {'leader_roles': self.leader_roles_cache.stats(), 'events': self.event_cache.stats()}
+
+    def _cached_event(self, guild_id, event_name):
+        """Return a copy of the cached event document, or ``MISSING``."""
+        event_data = self.event_cache.get((str(guild_id), event_name))
+        return copy.deepcopy(event_data) if event_data is not MISSING else MISSING
+
+    def _cache_event(self, guild_id, event_name, event_data):
+        if event_data is not None:
+            self.event_cache.set((str(guild_id), event_name), copy.deepcopy(event_data))
+
+    def _cache_event_update(self, guild_id, event_name, fields, event_data=None):
+        """Apply an event update to ``event_data``, or to the cached copy, and cache the result.
+
+        ``event_data`` is the document read in the transaction that wrote ``fields``.
+        """
+        if event_data is None:
+            event_data = self.event_cache.peek((str(guild_id), event_name))
+            if event_data is MISSING:
+                return
+        updated = copy.deepcopy(event_data)
+        for field, value in fields.items():
+            if isinstance(value, transforms.Increment):
+                updated[field] = updated.get(field, 0) + value.value
+            else:
+                updated[field] = value
+        self._cache_event(guild_id, event_name, updated)
+
+    def _cached_leader_roles(self, guild_id):
+        """Return a copy of the cached leader roles of a guild, or ``MISSING``."""
+        role_ids = self.leader_roles_cache.get(str(guild_id))
+        return list(role_ids) if isinstance(role_ids, tuple) else role_ids
+
+    def _cache_leader_roles(self, guild_id, role_ids):
+        # Stored as a tuple so callers can't mutate the cached value
+        self.leader_roles_cache.set(str(guild_id), tuple(role_ids) if role_ids is not None else None)
+
+    def _server_ref(self, guild_id):
+        return self.db.collection('servers').document(str(guild_id))
+
+    def _event_ref(self, guild_id, event_name):
+        return self._server_ref(guild_id).collection('events').document(event_name)
+
+    def _signups_ref(self, guild_id, event_name):
+        return self._event_ref(guild_id, event_name).collection('signups')
+
+    def _signup_ref(self, guild_id, event_name, player_tag):
+        # Signups are keyed by player tag so lookups are point reads
+        return self._signups_ref(guild_id, event_name).document(signup_doc_id(player_tag))
+
+    def _leader_roles_ref(self, guild_id):
+        return self._server_ref(guild_id).collection('server_leaders').document('roles')
+
+    @staticmethod
+    def _touch(fields: dict) -> dict:
+        """Add the version bump and modification time to an event update."""
+        return dict(fields, version=firestore.Increment(1), updated_at=datetime.utcnow().isoformat())
+
+    @staticmethod
+    def _new_event(event_data: dict) -> dict:
+        return dict(event_data, version=1, updated_at=datetime.utcnow().isoformat())
+
+    @staticmethod
+    def _aggregate_fields(signup_count, composition):
+        return {
+            'signup_count': signup_count,
+            'th_composition': {th: count for th, count in composition.items() if count > 0},
+            'aggregate_updated_at': datetime.utcnow().isoformat(),
+        }
+
+    def _signup_writes(self, event_data, signup_data, signup_count, composition):
+        """Return the signup to create and the event update for a new signup."""
+        # The event document is part of the transaction, so two signups can
+        # never be handed the same index. Indexes only ever grow: removals
+        # leave gaps and display positions are derived when reading.
+        # Events from before last_index existed have compact indexes.
+        index = event_data.get('last_index', event_data.get('signup_count', 0)) + 1
+        signup = dict(signup_data, index=index)
+        th = str(signup.get('player_th', 0))
+        composition[th] = composition.get(th, 0) + 1
+        event_fields = dict(self._aggregate_fields(signup_count + 1, composition), last_index=index)
+        return signup, self._touch(event_fields)
+
+    def _enrichment_writes(self, signup_data, profile, signup_count, composition):
+        """Return the signup update and event update for enriching a pending signup."""
+        if profile is None:
+            signup_fields = {'pending_enrichment': False, 'enrichment_failed': True}
+        else:
+            signup_fields = {
+                'player_name': profile.get('name', 'Unknown'),
+                'player_th': profile.get('townHallLevel', 0),
+                'pending_enrichment': False,
+            }
+            old_th, new_th = str(signup_data.get('player_th', 0)), str(signup_fields['player_th'])
+            composition[old_th] = composition.get(old_th, 0) - 1
+            composition[new_th] = composition.get(new_th, 0) + 1
+        return signup_fields, self._touch(self._aggregate_fields(signup_count, composition))
+
+    def _removal_writes(self, signup_data, signup_count, composition):
+        """Return the event update for removing a signup."""
+        th = str(signup_data.get('player_th', 0))
+        composition[th] = composition.get(th, 0) - 1
+        return self._touch(self._aggregate_fields(max(signup_count - 1, 0), composition))
+
+    def _log_buckets_ref(self, guild_id, event_name):
+        return self._event_ref(guild_id, event_name).collection(BUCKETS_COLLECTION)
+
+    def _log_batch(self, entries):
+        """Return a write batch adding each ``(guild_id, event_name, log_entry)``.
+
+        Each entry gets its own document, or with the hourly format each event
+        and hour gets one write appending all of its entries.
+        """
+        batch = self.db.batch()
+        if self.log_format == 'hourly':
+            for key, compact in group_by_bucket(entries).items():
+                self._append_to_bucket(batch, key, compact)
+            return batch
+        for guild_id, event_name, log_entry in entries:
+            batch.set(self._event_ref(guild_id, event_name).collection('logs').document(), log_entry)
+        return batch
+
+    def _append_to_bucket(self, batch, key, compact):
+        """Add the write appending compact entries to the current part of a ``(guild_id, event_name, bucket)``."""
+        guild_id, event_name, bucket = key
+        part = self.log_bucket_parts.get(key)
+        bucket_ref = self._log_buckets_ref(guild_id, event_name).document(bucket_doc_id(bucket, 0 if part is MISSING else part))
+        batch.set(bucket_ref, bucket_append(bucket, compact), merge=True)
+
+    def _next_bucket_part(self, key) -> int:
+        """Move appends to a bucket on to its next part, after the current one was found full."""
+        part = self.log_bucket_parts.get(key)
+        part = 1 if part is MISSING else part + 1
+        self.log_bucket_parts.set(key, part)
+        return part
+
+    def _bucket_batch(self, key, compact):
+        """Return a batch appending compact entries to one bucket only.
+
+        Used when a batched commit failed because a bucket reached the document
+        size limit: each bucket is then written on its own, so a full one moves
+        on to its next part without holding back the others' entries.
+        """
+        batch = self.db.batch()
+        self._append_to_bucket(batch, key, compact)
+        return batch
+
+    def _bucket_full(self, key, compact) -> bool:
+        """Move a full bucket on to its next part; return False once it has run out of parts."""
+        if self._next_bucket_part(key) < MAX_BUCKET_PARTS:
+            return True
+        logger.error(f"Dropped {len(compact)} log entries of {key}: no bucket part has room")
+        return False
+
+    def _logs_query(self, guild_id, event_name, since=None, until=None):
+        query = self._event_ref(guild_id, event_name).collection('logs')
+        if since is not None:
+            query = query.where('timestamp', '>=', since)
+        if until is not None:
+            query = query.where('timestamp', '<', until)
+        return query.order_by('timestamp')
+
+    def _log_buckets_query(self, guild_id, event_name, since=None, until=None):
+        query = self._log_buckets_ref(guild_id, event_name)
+        if since is not None:
+            query = query.where('hour', '>=', bucket_id(since))
+        if until is not None:
+            query = query.where('hour', '<=', bucket_id(until))
+        return query.order_by('hour')
+
+    @staticmethod
+    def _merge_logs(guild_id, event_name, log_docs, bucket_docs, since, until):
+        """Combine log documents and expanded bucket entries in the range, oldest first."""
+        logs = [doc.to_dict() for doc in log_docs]
+        for bucket_doc in bucket_docs:
+            bucket_data = bucket_doc.to_dict()
+            delivered = bucket_data.get('delivered', 0)
+            for position, compact in enumerate(bucket_data.get('entries') or []):
+                entry = expand_entry(compact, guild_id, event_name, processed=position < delivered)
+                if in_range(entry['timestamp'], since, until):
+                    logs.append(entry)
+        logs.sort(key=lambda entry: entry.get('timestamp') or '')
+        return logs
+
+    def _events_query(self, guild_id, limit=None, start_after=None, fields=None):
+        query = self._server_ref(guild_id).collection('events').order_by('__name__')
+        if fields:
+            # Projected on the server, so unused fields are never sent
+            query = query.select(fields)
+        if start_after is not None:
+            query = query.start_after({'__name__': start_after})
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def _signups_query(self, guild_id, event_name, limit=None, start_after=None):
+        query = self._signups_ref(guild_id, event_name).order_by('index')
+        if start_after is not None:
+            query = query.start_after({'index': start_after})
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def _pending_signups_query(self, limit=None):
+        # Across every event; needs the collection-group index on signups.pending_enrichment (firestore.indexes.json)
+        query = self.db.collection_group('signups').where('pending_enrichment', '==', True)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    @staticmethod
+    def _pending_signup(doc) -> dict:
+        # Path: servers/{guild_id}/events/{event_name}/signups/{id}
+        path = doc.reference.path.split('/')
+        return dict(doc.to_dict(), id=doc.id, guild_id=path[1], event_name=path[3])
+
+    def _signups_up_to_query(self, guild_id, event_name, index):
+        # A count aggregation bills one read per 1000 signups counted
+        return self._signups_ref(guild_id, event_name).where('index', '<=', index).count()
+
+
+class FirestoreStorage(FirestoreDocuments, Storage):
+    """Storage backed by a Firestore client."""
+
+    # Decorator that turns a function into a retried transaction
+    _transactional = staticmethod(firestore.transactional)
+
+    def _run_transaction(self, function, *args):
+        """Run ``function(transaction, *args)`` in a transaction and return its result."""
+        transaction = self.db.transaction(max_attempts=TRANSACTION_ATTEMPTS)
+        return self._transactional(function)(transaction, *args)
+
+    def get_event(self, guild_id, event_name):
+        event_doc = self._event_ref(guild_id, event_name).get()
+        event_data = event_doc.to_dict() if event_doc.exists else None
+        self._cache_event(guild_id, event_name, event_data)
+        return event_data
+
+    def get_event_metadata(self, guild_id, event_name):
+        event_data = self._cached_event(guild_id, event_name)
+        return event_data if event_data is not MISSING else self.get_event(guild_id, event_name)
+
+    def list_events(self, guild_id, limit=None, start_after=None, fields=None):
+        events = []
+        for doc in self._events_query(guild_id, limit, start_after, fields).stream():
+            event_data = doc.to_dict()
+            event_data['id'] = doc.id
+            events.append(event_data)
+        return events
+
+    def create_event(self, guild_id, event_name, event_data):
+        event_data = self._new_event(event_data)
+        try:
+            self._event_ref(guild_id, event_name).create(event_data)
+        except exceptions.AlreadyExists:
+            return False
+        self._cache_event(guild_id, event_name, event_data)
+        return True
+
+    def update_event(self, guild_id, event_name, fields):
+        fields = self._touch(fields)
+        self._event_ref(guild_id, event_name).update(fields)
+        self._cache_event_update(guild_id, event_name, fields)
+
+    def _read_aggregate(self, transaction, event_ref, event_data):
+        """Return ``(signup_count, th_composition)`` of an event read in ``transaction``."""
+        if 'th_composition' in event_data:
+            return event_data.get('signup_count', 0), dict(event_data['th_composition'])
+        # Events created before the aggregate existed are counted once, then kept up to date
+        signups = [doc.to_dict() for doc in event_ref.collection('signups').stream(transaction=transaction)]
+        return len(signups), count_th_levels(signups)
+
+    def refresh_aggregate(self, guild_id, event_name):
+        event_ref = self._event_ref(guild_id, event_name)
+
+        def refresh_in_transaction(transaction):
+            event_doc = event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                return None
+            signups = [doc.to_dict() for doc in event_ref.collection('signups').stream(transaction=transaction)]
+            fields = self._aggregate_fields(len(signups), count_th_levels(signups))
+            written[:] = [event_doc.to_dict(), self._touch(fields)]
+            transaction.update(event_ref, written[1])
+            return fields
+
+        written = []
+        fields = self._run_transaction(refresh_in_transaction)
+        if written:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return fields
+
+    def list_signups(self, guild_id, event_name, limit=None, start_after=None):
+        first_position = 1
+        if start_after is not None:
+            first_position += self._count_signups_up_to(guild_id, event_name, start_after)
+        signups = []
+        query = self._signups_query(guild_id, event_name, limit, start_after)
+        for position, doc in enumerate(query.stream(), first_position):
+            signup = doc.to_dict()
+            signup['id'] = doc.id
+            signup['position'] = position
+            signups.append(signup)
+        return signups
+
+    def _count_signups_up_to(self, guild_id, event_name, index):
+        return int(self._signups_up_to_query(guild_id, event_name, index).get()[0][0].value)
+
+    def signup_position(self, guild_id, event_name, signup):
+        return self._count_signups_up_to(guild_id, event_name, signup.get('index', 0))
+
+    def find_signup(self, guild_id, event_name, player_tag):
+        signup_doc = self._signup_ref(guild_id, event_name, player_tag).get()
+        if not signup_doc.exists:
+            return None
+        signup = signup_doc.to_dict()
+        signup['id'] = signup_doc.id
+        return signup
+
+    def add_signup(self, guild_id, event_name, signup_data):
+        event_ref = self._event_ref(guild_id, event_name)
+        signup_ref = self._signup_ref(guild_id, event_name, signup_data['player_tag'])
+
+        def signup_in_transaction(transaction):
+            # All reads must happen before the first write of the transaction
+            event_doc = event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                return SignupResult.EVENT_NOT_FOUND, None
+            event_data = event_doc.to_dict()
+            if not event_data.get('is_open', True):
+                return SignupResult.EVENT_CLOSED, None
+            if signup_ref.get(transaction=transaction).exists:
+                return SignupResult.ALREADY_SIGNED_UP, None
+
+            signup_count, composition = self._read_aggregate(transaction, event_ref, event_data)
+            signup, event_fields = self._signup_writes(event_data, signup_data, signup_count, composition)
+            transaction.create(signup_ref, signup)
+            transaction.update(event_ref, event_fields)
+            written[:] = [event_data, event_fields]
+            return SignupResult.CREATED, signup
+
+        # The event as of the committed attempt, to keep the cache current
+        written = []
+        result = self._run_transaction(signup_in_transaction)
+        if result[0] == SignupResult.CREATED:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return result
+
+    def remove_signup(self, guild_id, event_name, player_tag):
+        event_ref = self._event_ref(guild_id, event_name)
+        signup_ref = self._signup_ref(guild_id, event_name, player_tag)
+
+        def remove_in_transaction(transaction):
+            # Reading the signup in the transaction stops two concurrent
+            # removals of the same player from decrementing the count twice
+            signup_doc = signup_ref.get(transaction=transaction)
+            if not signup_doc.exists:
+                return False
+            event_doc = event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                # The event was deleted; there is no aggregate left to update
+                return False
+            event_data = event_doc.to_dict()
+            signup_count, composition = self._read_aggregate(transaction, event_ref, event_data)
+
+            # Later signups keep their index, so removal costs O(1) writes
+            event_fields = self._removal_writes(signup_doc.to_dict(), signup_count, composition)
+            transaction.delete(signup_ref)
+            transaction.update(event_ref, event_fields)
+            written[:] = [event_data, event_fields]
+            return True
+
+        written = []
+        removed = self._run_transaction(remove_in_transaction)
+        if removed:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return removed
+
+    def list_pending_signups(self, limit=None):
+        return [self._pending_signup(doc) for doc in self._pending_signups_query(limit).stream()]
+
+    def enrich_signup(self, guild_id, event_name, player_tag, profile):
+        event_ref = self._event_ref(guild_id, event_name)
+        signup_ref = self._signup_ref(guild_id, event_name, player_tag)
+
+        def enrich_in_transaction(transaction):
+            signup_doc = signup_ref.get(transaction=transaction)
+            if not signup_doc.exists or not signup_doc.to_dict().get('pending_enrichment'):
+                return False
+            event_doc = event_ref.get(transaction=transaction)
+            if not event_doc.exists:
+                # Left behind by a deleted event: nothing to enrich, but stop sweeping it
+                transaction.update(signup_ref, {'pending_enrichment': False})
+                return True
+            event_data = event_doc.to_dict()
+            signup_count, composition = self._read_aggregate(transaction, event_ref, event_data)
+
+            signup_fields, event_fields = self._enrichment_writes(
+                signup_doc.to_dict(), profile, signup_count, composition)
+            transaction.update(signup_ref, signup_fields)
+            transaction.update(event_ref, event_fields)
+            written[:] = [event_data, event_fields]
+            return True
+
+        written = []
+        enriched = self._run_transaction(enrich_in_transaction)
+        if written:
+            self._cache_event_update(guild_id, event_name, written[1], written[0])
+        return enriched
+
+    def get_leader_roles(self, guild_id):
+        role_ids = self._cached_leader_roles(guild_id)
+        if role_ids is not MISSING:
+            return role_ids
+        leader_doc = self._leader_roles_ref(guild_id).get()
+        role_ids = leader_doc.to_dict().get('leader_role_ids', []) if leader_doc.exists else None
+        self._cache_leader_roles(guild_id, role_ids)
+        return role_ids
+
+    def set_leader_roles(self, guild_id, role_ids):
+        self._leader_roles_ref(guild_id).set({'leader_role_ids': list(role_ids)}, merge=True)
+        self._cache_leader_roles(guild_id, role_ids)
+
+    def add_log(self, guild_id, event_name, log_entry):
+        if self.log_format == 'hourly':
+            self.add_logs([(guild_id, event_name, log_entry)])
+        else:
+            self._event_ref(guild_id, event_name).collection('logs').add(log_entry)
+
+    def add_logs(self, entries):
+        try:
+            self._log_batch(entries).commit()
+        except exceptions.InvalidArgument:
+            if self.log_format != 'hourly':
+                raise
+            for key, compact in group_by_bucket(entries).items():
+                while True:
+                    try:
+                        self._bucket_batch(key, compact).commit()
+                        break
+                    except exceptions.InvalidArgument:
+                        if not self._bucket_full(key, compact):
+                            break
+
+    def read_logs(self, guild_id, event_name, since=None, until=None):
+        return self._merge_logs(
+            guild_id, event_name,
+            self._logs_query(guild_id, event_name, since, until).stream(),
+            self._log_buckets_query(guild_id, event_name, since, until).stream(),
+            since, until,
+        )
+
+
+class MemoryStorage(FirestoreStorage):
+    """Storage kept in process memory, for tests, benchmarks and offline runs."""
+
+    _transactional = staticmethod(memory_client.transactional)
+
+    def __init__(self, client: Optional[MemoryClient] = None):
+        super().__init__(client or MemoryClient())
+
+
+_storage: Optional[Storage] = None
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    """Create the storage backend named by ``backend`` or ``Config.STORAGE_BACKEND``."""
+    backend = (backend or Config.STORAGE_BACKEND).lower()
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'firestore':
+        return FirestoreStorage(firestore.client())
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def get_storage() -> Storage:
+    """Return the storage used by the API, creating it on first use."""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Optional[Storage]) -> None:
+    """Replace the storage used by the API."""
+    global _storage
+    _storage = storage
@@ -14,6 +14,9 @@ from . import __version__, Config
 from .api import Config as APIConfig
 import aiohttp
 from .cogs.events import EventView
+from .utils.api_pages import iter_pages
+from .utils.firestore_io import install_blocking_guard
+from .utils.log_feed import LogDelivery, LogListener, unprocessed_queries
 from .utils.logger import EventLogger
 
 # Configure logging
@@ -45,17 +48,17 @@ async def get_all_events(bot):
     events_to_register = []
     async with aiohttp.ClientSession() as session:
         for guild in bot.guilds:
-            async with session.get(f"{APIConfig.API_BASE_URL}/api/events", params={"guild_id": guild.id}) as resp:
-                if resp.status != 200:
-                    logger.warning(f"Failed to fetch events for guild {guild.id}: {resp.status}")
-                    continue
-                data = await resp.json()
-                events = data.get("events", [])
-                for event in events:
+            try:
+                async for event in iter_pages(
+                    session, f"{APIConfig.API_BASE_URL}/api/events", "events",
+                    params={"guild_id": guild.id, "fields": "event_name,is_open"}
+                ):
                     event_name = event.get("event_name")
                     is_open = event.get("is_open", True)
                     if event_name:
                         events_to_register.append((event_name, is_open))
+            except aiohttp.ClientResponseError as e:
+                logger.warning(f"Failed to fetch events for guild {guild.id}: {e.status}")
     return events_to_register
 
 class SignupBot(commands.Bot):
@@ -81,9 +84,18 @@ class SignupBot(commands.Bot):
             'signup_bot.cogs.events',
             'signup_bot.cogs.utilities'
         ]
+        # Posts log entries once each, whether the listener or the sweep finds them
+        self.log_delivery = LogDelivery(self.post_log_entry, lambda: {str(guild.id) for guild in self.guilds})
+        self.log_listener = None
     
     async def setup_hook(self) -> None:
         """Set up the bot when it starts."""
+        if Config.BOT_DEBUG:
+            # Report Firestore calls and slow callbacks that hold up the event loop
+            install_blocking_guard()
+            asyncio.get_running_loop().set_debug(True)
+            logger.info("Debug mode: blocking Firestore calls on the event loop are logged")
+        
         logger.info("Loading extensions...")
         for extension in self.initial_extensions:
             try:
@@ -111,8 +123,12 @@ class SignupBot(commands.Bot):
         except Exception as e:
             logger.error(f"Failed to register persistent views: {e}")
         
-        # Start background task to process log entries
-        self.loop.create_task(self.process_log_entries())
+        # Post log entries as they are written, with a slow sweep for anything the listener misses;
+        # on_ready runs again after reconnects, the listener keeps running across them
+        if self.log_listener is None:
+            self.log_listener = LogListener(unprocessed_queries(firestore.client()), self.log_delivery.handle)
+            self.log_listener.start(asyncio.get_running_loop())
+            self.loop.create_task(self.process_log_entries())
         
         await self.update_activity()
     
@@ -130,62 +146,41 @@ class SignupBot(commands.Bot):
             logger.error(f"Failed to update activity: {e}")
             await self.change_presence(activity=discord.Game(name=f"Signup Bot v{__version__}"))
     
+    async def post_log_entry(self, log_data: dict):
+        """Send one log entry to its event's log channel."""
+        try:
+            await EventLogger.log_action(
+                bot=self,
+                guild_id=int(log_data['guild_id']),
+                event_name=log_data['event_name'],
+                action=log_data['action'],
+                user_name=log_data['user_name'],
+                user_avatar_url=log_data['user_avatar_url'],
+                success=log_data['success'],
+                details=log_data.get('details', ''),
+                error_reason=log_data.get('error_reason', ''),
+                additional_data=log_data.get('additional_data', {})
+            )
+        except Exception as e:
+            logger.error(f"Error processing log entry: {e}")
+    
     async def process_log_entries(self):
-        """Background task to process log entries and send them to Discord."""
+        """Background sweep posting log entries the snapshot listener missed, e.g. while it reconnected."""
         db = firestore.client()
         
         while True:
+            await asyncio.sleep(Config.LOG_POLL_INTERVAL)
             try:
-                # Get all guilds the bot is in
-                for guild in self.guilds:
-                    # Get all events for this guild
-                    events_ref = db.collection('servers').document(str(guild.id)).collection('events')
-                    events = events_ref.stream()
-                    
-                    for event_doc in events:
-                        event_name = event_doc.id
-                        event_data = event_doc.to_dict()
-                        log_channel_id = event_data.get('log_channel_id')
-                        
-                        if not log_channel_id:
-                            continue
-                        
-                        # Get unprocessed log entries
-                        logs_ref = event_doc.reference.collection('logs')
-                        unprocessed_logs = logs_ref.where('processed', '==', False).stream()
-                        
-                        for log_doc in unprocessed_logs:
-                            log_data = log_doc.to_dict()
-                            
-                            try:
-                                # Send the log entry to Discord
-                                await EventLogger.log_action(
-                                    bot=self,
-                                    guild_id=int(log_data['guild_id']),
-                                    event_name=log_data['event_name'],
-                                    action=log_data['action'],
-                                    user_name=log_data['user_name'],
-                                    user_avatar_url=log_data['user_avatar_url'],
-                                    success=log_data['success'],
-                                    details=log_data.get('details', ''),
-                                    error_reason=log_data.get('error_reason', ''),
-                                    additional_data=log_data.get('additional_data', {})
-                                )
-                                
-                                # Mark as processed
-                                log_doc.reference.update({'processed': True})
-                                
-                            except Exception as e:
-                                logger.error(f"Error processing log entry: {e}")
-                                # Mark as processed to avoid infinite retries
-                                log_doc.reference.update({'processed': True})
-                
-                # Wait before next check
-                await asyncio.sleep(5)  # Check every 5 seconds
-                
+                # One collection-group query for all guilds and events, instead of one per event
+                await self.log_delivery.sweep(db, Config.LOG_POLL_LIMIT)
             except Exception as e:
                 logger.error(f"Error in process_log_entries: {e}")
-                await asyncio.sleep(10)  # Wait longer on error
+    
+    async def close(self) -> None:
+        """Stop listening for log entries before disconnecting."""
+        if self.log_listener is not None:
+            self.log_listener.stop()
+        await super().close()
     
     async def on_command_error(self, context: commands.Context, exception: Exception) -> None:
         """Handle command errors."""
@@ -10,7 +10,10 @@ from discord.ext import commands
 from discord.ui import Button, Modal, TextInput, View
 
 from .. import Config
+from ..utils.api_pages import iter_pages
 from ..utils.embed_builder import EmbedBuilder
+from ..utils.http_cache import api_cache
+from ..utils.player_tags import INVALID_PLAYER_TAG, is_valid_player_tag, normalize_player_tag
 from ..utils.emoji_config import get_loading_emoji, get_success_emoji, get_error_emoji
 
 # Centralized emoji configuration
@@ -131,18 +134,21 @@ class SignupModal(Modal):
     
     async def on_submit(self, interaction: discord.Interaction):
         """Handle form submission."""
-        await interaction.response.send_message(f"{LOADING_EMOJI} Processing your signup...", ephemeral=True)
+        # Normalize the player tag and reject typos here, without a round trip to the API
+        player_tag = normalize_player_tag(self.player_tag.value)
+        if not is_valid_player_tag(player_tag):
+            await interaction.response.send_message(
+                embed=EmbedBuilder.error(description=INVALID_PLAYER_TAG), ephemeral=True
+            )
+            return
 
-        # Normalize the player tag - add # if not present
-        player_tag = self.player_tag.value.strip()
-        if not player_tag.startswith('#'):
-            player_tag = f"#{player_tag}"
+        await interaction.response.send_message(f"{LOADING_EMOJI} Processing your signup...", ephemeral=True)
         
         async with aiohttp.ClientSession() as session:
             async with session.post(
                 f"{Config.API_BASE_URL}/api/events/{self.event_name}/signup",
                 json={
-                    "player_tag": self.player_tag.value,
+                    "player_tag": player_tag,
                     "discord_name": str(interaction.user),
                     "discord_user_id": str(interaction.user.id),
                     "guild_id": interaction.guild_id,
@@ -215,13 +221,16 @@ class RemoveModal(Modal):
     
     async def on_submit(self, interaction: discord.Interaction):
         """Handle form submission."""
+        # Normalize the player tag and reject typos here, without a round trip to the API
+        player_tag = normalize_player_tag(self.player_tag.value)
+        if not is_valid_player_tag(player_tag):
+            await interaction.response.send_message(
+                embed=EmbedBuilder.error(description=INVALID_PLAYER_TAG), ephemeral=True
+            )
+            return
+
         await interaction.response.send_message(f"{LOADING_EMOJI} Processing your removal...", ephemeral=True)
         
-        # Normalize the player tag - add # if not present
-        player_tag = self.player_tag.value.strip()
-        if not player_tag.startswith('#'):
-            player_tag = f"#{player_tag}"
-        
         async with aiohttp.ClientSession() as session:
             # Get the member object to access their roles
             member = interaction.guild.get_member(interaction.user.id)
@@ -325,13 +334,16 @@ class CheckModal(Modal):
     
     async def on_submit(self, interaction: discord.Interaction):
         """Handle form submission."""
+        # Normalize the player tag and reject typos here, without a round trip to the API
+        player_tag = normalize_player_tag(self.player_tag.value)
+        if not is_valid_player_tag(player_tag):
+            await interaction.response.send_message(
+                embed=EmbedBuilder.error(description=INVALID_PLAYER_TAG), ephemeral=True
+            )
+            return
+
         await interaction.response.send_message(f"{LOADING_EMOJI} Checking signup status...", ephemeral=True)
         
-        # Normalize the player tag - add # if not present
-        player_tag = self.player_tag.value.strip()
-        if not player_tag.startswith('#'):
-            player_tag = f"#{player_tag}"
-        
         async with aiohttp.ClientSession() as session:
             async with session.post(
                 f"{Config.API_BASE_URL}/api/events/{self.event_name}/check",
@@ -495,17 +507,18 @@ async def update_event_embed(guild_id: int, event_name: str, bot):
     import logging
     logger = logging.getLogger(__name__)
     async with aiohttp.ClientSession() as session:
-        # Get event details with signups
-        async with session.get(
-            f"{Config.API_BASE_URL}/api/events/{event_name}",
+        # Get the event summary (metadata and aggregates, without the signups),
+        # revalidating the last copy so an unchanged event costs a 304
+        status, event_data = await api_cache.get_json(
+            session,
+            f"{Config.API_BASE_URL}/api/events/{event_name}/summary",
             params={"guild_id": guild_id}
-        ) as response:
-            if response.status != 200:
-                logger.error(f"Failed to fetch event data for {event_name} (guild {guild_id}): status {response.status}")
-                return False
-            event_data = await response.json()
+        )
+        if status != 200:
+            logger.error(f"Failed to fetch event data for {event_name} (guild {guild_id}): status {status}")
+            return False
 
-    signups = event_data.get('signups', [])
+    signup_count = event_data.get('signup_count', 0)
     th_composition = event_data.get('th_composition', {})
     is_closed = not event_data.get('is_open', True)
     message_id = event_data.get('message_id')
@@ -544,13 +557,13 @@ async def update_event_embed(guild_id: int, event_name: str, bot):
     embed.timestamp = datetime.utcnow()  # Always update timestamp
 
     # Format TH composition
-    th_text = "\n".join([f"TH{th}: {count}" for th, count in sorted(th_composition.items(), reverse=True)]) or "No signups yet"
+    th_text = "\n".join([f"TH{th}: {count}" for th, count in sorted(th_composition.items(), key=lambda item: int(item[0]), reverse=True)]) or "No signups yet"
 
     # Update or add fields
     if embed.fields:
         for i, field in enumerate(embed.fields):
             if field.name == "Total Signups":
-                embed.set_field_at(i, name="Total Signups", value=str(len(signups)), inline=False)
+                embed.set_field_at(i, name="Total Signups", value=str(signup_count), inline=False)
             elif field.name == "TH Composition":
                 embed.set_field_at(i, name="TH Composition", value=th_text, inline=False)
             elif field.name == "Event Role":
@@ -563,7 +576,7 @@ async def update_event_embed(guild_id: int, event_name: str, bot):
                     # Remove role field if no role
                     embed.remove_field(i)
     else:
-        embed.add_field(name="Total Signups", value=str(len(signups)), inline=False)
+        embed.add_field(name="Total Signups", value=str(signup_count), inline=False)
         embed.add_field(name="TH Composition", value=th_text, inline=False)
         
         # Add role field if event has a role
@@ -712,120 +725,105 @@ class Events(commands.Cog):
         """List all events in the server."""
         await ctx.defer()
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{Config.API_BASE_URL}/api/events",
-                params={"guild_id": ctx.guild.id}
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    events = data.get('events', [])
-                    
-                    if not events:
-                        # Use followup if available (slash commands), otherwise use send
-                        if hasattr(ctx, 'followup'):
-                            await ctx.followup.send("No events found.", ephemeral=True)
-                        else:
-                            await ctx.send("No events found.")
-                        return
-                    
-                    # Discord embeds have a limit of 25 fields
-                    # We'll show up to 20 events per embed to be safe
-                    MAX_EVENTS_PER_EMBED = 20
-                    
-                    if len(events) <= MAX_EVENTS_PER_EMBED:
-                        # Single embed for all events
-                        embed = discord.Embed(
-                            title="Events",
-                            description=f"List of all events ({len(events)} total)",
-                            color=discord.Color.blue()
-                        )
-                        
-                        for event in events:
-                            event_name = event.get('event_name', 'Unknown')
-                            signup_count = event.get('signup_count', 0)
-                            is_open = event.get('is_open', True)
-                            role_id = event.get('role_id')
-                            
-                            # Build event description
-                            status = "🟢 Open" if is_open else "🔴 Closed"
-                            event_desc = f"Signups: {signup_count} | Status: {status}"
-                            
-                            # Add role information if available
-                            if role_id:
-                                role = ctx.guild.get_role(int(role_id))
-                                if role:
-                                    event_desc += f" | Role: {role.mention}"
-                            
-                            embed.add_field(
-                                name=event_name,
-                                value=event_desc,
-                                inline=False
-                            )
-                        
-                        # Use followup if available (slash commands), otherwise use send
-                        if hasattr(ctx, 'followup'):
-                            await ctx.followup.send(embed=embed, ephemeral=True)
-                        else:
-                            await ctx.send(embed=embed)
-                    else:
-                        # Multiple embeds for many events
-                        total_events = len(events)
-                        num_embeds = (total_events + MAX_EVENTS_PER_EMBED - 1) // MAX_EVENTS_PER_EMBED
-                        
-                        for i in range(num_embeds):
-                            start_idx = i * MAX_EVENTS_PER_EMBED
-                            end_idx = min(start_idx + MAX_EVENTS_PER_EMBED, total_events)
-                            current_events = events[start_idx:end_idx]
-                            
-                            embed = discord.Embed(
-                                title=f"Events (Page {i + 1}/{num_embeds})",
-                                description=f"Showing events {start_idx + 1}-{end_idx} of {total_events}",
-                                color=discord.Color.blue()
-                            )
-                            
-                            for event in current_events:
-                                event_name = event.get('event_name', 'Unknown')
-                                signup_count = event.get('signup_count', 0)
-                                is_open = event.get('is_open', True)
-                                role_id = event.get('role_id')
-                                
-                                # Build event description
-                                status = "🟢 Open" if is_open else "🔴 Closed"
-                                event_desc = f"Signups: {signup_count} | Status: {status}"
-                                
-                                # Add role information if available
-                                if role_id:
-                                    role = ctx.guild.get_role(int(role_id))
-                                    if role:
-                                        event_desc += f" | Role: {role.mention}"
-                                
-                                embed.add_field(
-                                    name=event_name,
-                                    value=event_desc,
-                                    inline=False
-                                )
-                            
-                            # Send each embed
-                            if hasattr(ctx, 'followup'):
-                                await ctx.followup.send(embed=embed, ephemeral=True)
-                            else:
-                                await ctx.send(embed=embed)
-                else:
-                    # Use followup if available (slash commands), otherwise use send
-                    if hasattr(ctx, 'followup'):
-                        await ctx.followup.send(
-                            embed=EmbedBuilder.error(
-                                description=f"{ERROR_EMOJI} Failed to fetch events."
-                            ),
-                            ephemeral=True
-                        )
-                    else:
-                        await ctx.send(
-                            embed=EmbedBuilder.error(
-                                description=f"{ERROR_EMOJI} Failed to fetch events."
-                            )
-                        )
+        # Discord embeds have a limit of 25 fields
+        # We'll show up to 20 events per embed to be safe
+        MAX_EVENTS_PER_EMBED = 20
+        
+        async def send_embed(embed):
+            # Use followup if available (slash commands), otherwise use send
+            if hasattr(ctx, 'followup'):
+                await ctx.followup.send(embed=embed, ephemeral=True)
+            else:
+                await ctx.send(embed=embed)
+        
+        pending = []
+        pages_sent = 0
+        shown = 0
+        try:
+            async with aiohttp.ClientSession() as session:
+                # Events are fetched a page at a time and each embed is sent once it is full
+                async for event in iter_pages(
+                    session, f"{Config.API_BASE_URL}/api/events", 'events',
+                    params={"guild_id": ctx.guild.id, "fields": "event_name,is_open,signup_count,role_id"}
+                ):
+                    if len(pending) == MAX_EVENTS_PER_EMBED:
+                        pages_sent += 1
+                        await send_embed(build_events_embed(
+                            ctx.guild, pending,
+                            title=f"Events (Page {pages_sent})",
+                            description=f"Showing events {shown + 1}-{shown + len(pending)}"
+                        ))
+                        shown += len(pending)
+                        pending = []
+                    pending.append(event)
+        except aiohttp.ClientError:
+            # Use followup if available (slash commands), otherwise use send
+            if hasattr(ctx, 'followup'):
+                await ctx.followup.send(
+                    embed=EmbedBuilder.error(
+                        description=f"{ERROR_EMOJI} Failed to fetch events."
+                    ),
+                    ephemeral=True
+                )
+            else:
+                await ctx.send(
+                    embed=EmbedBuilder.error(
+                        description=f"{ERROR_EMOJI} Failed to fetch events."
+                    )
+                )
+            return
+        
+        if not pending:
+            # Use followup if available (slash commands), otherwise use send
+            if hasattr(ctx, 'followup'):
+                await ctx.followup.send("No events found.", ephemeral=True)
+            else:
+                await ctx.send("No events found.")
+            return
+        
+        total_events = shown + len(pending)
+        if pages_sent == 0:
+            # Single embed for all events
+            embed = build_events_embed(
+                ctx.guild, pending,
+                title="Events",
+                description=f"List of all events ({total_events} total)"
+            )
+        else:
+            embed = build_events_embed(
+                ctx.guild, pending,
+                title=f"Events (Page {pages_sent + 1}/{pages_sent + 1})",
+                description=f"Showing events {shown + 1}-{total_events} of {total_events}"
+            )
+        await send_embed(embed)
+
+def build_events_embed(guild, events, title: str, description: str) -> discord.Embed:
+    """Build an embed listing events with their signup count, status and role."""
+    embed = discord.Embed(title=title, description=description, color=discord.Color.blue())
+    
+    for event in events:
+        event_name = event.get('event_name', 'Unknown')
+        signup_count = event.get('signup_count', 0)
+        is_open = event.get('is_open', True)
+        role_id = event.get('role_id')
+        
+        # Build event description
+        status = "🟢 Open" if is_open else "🔴 Closed"
+        event_desc = f"Signups: {signup_count} | Status: {status}"
+        
+        # Add role information if available
+        if role_id:
+            role = guild.get_role(int(role_id))
+            if role:
+                event_desc += f" | Role: {role.mention}"
+        
+        embed.add_field(
+            name=event_name,
+            value=event_desc,
+            inline=False
+        )
+    
+    return embed
 
 async def setup(bot):
     """Set up the events cog."""
@@ -0,0 +1,30 @@
+"""
+Helpers for reading paginated API listings.
+Pages are fetched one at a time as the caller consumes the items.
+"""
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from .http_cache import api_cache
+
+# Items requested per page
+PAGE_SIZE = 100
+
+
+async def iter_pages(session: aiohttp.ClientSession, url: str, key: str,
+                     params: Optional[dict] = None, page_size: int = PAGE_SIZE) -> AsyncIterator[dict]:
+    """Yield the items under ``key`` of every page of a listing.
+
+    Pages are revalidated with the API's ETags, so unchanged pages are not resent.
+    Raises aiohttp.ClientResponseError if a page cannot be fetched.
+    """
+    params = dict(params or {}, limit=page_size)
+    while True:
+        _, data = await api_cache.get_json(session, url, params=params, raise_for_status=True)
+        for item in data.get(key, []):
+            yield item
+        cursor = data.get('next_cursor')
+        if not cursor:
+            return
+        params['cursor'] = cursor
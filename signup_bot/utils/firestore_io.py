@@ -0,0 +1,110 @@
+"""
+Firestore access for the bot without blocking its event loop.
+
+The bot uses the synchronous Firestore client, whose calls wait on the network.
+Made from a coroutine they stall the gateway heartbeat and every interaction
+handler, so coroutines run them on a small thread pool with ``run_blocking``.
+
+With ``BOT_DEBUG`` set, ``install_blocking_guard`` wraps the client's network
+calls to log any that is still made on the event loop thread, with the stack
+of the caller.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Threads running Firestore calls for the bot
+_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_state = threading.local()
+
+# Blocking calls made on an event loop thread since the guard was installed
+blocking_calls = 0
+
+# Marks methods already wrapped by the guard
+_GUARD_ATTR = '_loop_guarded'
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix='firestore')
+        return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking Firestore call on the bot's Firestore threads and return its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _on_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _guarded(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        global blocking_calls
+        # Calls made by a guarded call, e.g. get() calling stream(), are reported once
+        if getattr(_state, 'depth', 0) == 0 and _on_loop_thread():
+            blocking_calls += 1
+            logger.warning(
+                f"Blocking Firestore call {method.__qualname__} on the event loop thread; "
+                f"await it with run_blocking", stack_info=True,
+            )
+        _state.depth = getattr(_state, 'depth', 0) + 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _state.depth -= 1
+    setattr(wrapper, _GUARD_ATTR, True)
+    return wrapper
+
+
+def _firestore_methods() -> Iterable[Tuple[type, Tuple[str, ...]]]:
+    """Return the synchronous client's classes and their methods that wait on the network."""
+    from google.cloud.firestore_v1.aggregation import AggregationQuery
+    from google.cloud.firestore_v1.batch import WriteBatch
+    from google.cloud.firestore_v1.client import Client
+    from google.cloud.firestore_v1.collection import CollectionReference
+    from google.cloud.firestore_v1.document import DocumentReference
+    from google.cloud.firestore_v1.query import CollectionGroup, Query
+
+    return [
+        (Client, ('get_all', 'collections')),
+        (DocumentReference, ('create', 'set', 'update', 'delete', 'get', 'collections')),
+        (CollectionReference, ('add', 'list_documents', 'get', 'stream')),
+        (Query, ('get', 'stream')),
+        (CollectionGroup, ('get_partitions',)),
+        (WriteBatch, ('commit',)),
+        (AggregationQuery, ('get', 'stream')),
+    ]
+
+
+def install_blocking_guard(methods: Optional[Iterable[Tuple[type, Tuple[str, ...]]]] = None) -> int:
+    """Log blocking calls of ``methods`` (the Firestore client's by default) made on an event loop thread.
+
+    Meant for debugging; returns how many methods were wrapped by this call.
+    """
+    wrapped = 0
+    for cls, names in (methods if methods is not None else _firestore_methods()):
+        for name in names:
+            method = cls.__dict__.get(name)
+            if method is None or getattr(method, _GUARD_ATTR, False):
+                continue
+            setattr(cls, name, _guarded(method))
+            wrapped += 1
+    return wrapped
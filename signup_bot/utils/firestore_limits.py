@@ -0,0 +1,34 @@
+"""
+Firestore limits the bot and the API plan their writes around.
+"""
+from datetime import datetime
+
+# Firestore rejects commits with more than this many writes
+MAX_WRITES_PER_COMMIT = 500
+
+# Firestore rejects documents larger than this, as counted by ``document_size``
+MAX_DOCUMENT_BYTES = 1_048_576
+
+
+def value_size(value) -> int:
+    """Return the storage size of a field value, following Firestore's documented rules."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(value_size(key) + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    # References, geo points and other rare types
+    return 16
+
+
+def document_size(path: str, data: dict) -> int:
+    """Return the storage size of the document at ``path`` holding ``data``."""
+    name_size = sum(len(part.encode('utf-8')) + 1 for part in path.split('/')) + 16
+    return name_size + value_size(data) + 32
@@ -0,0 +1,75 @@
+"""
+Conditional GETs for the bot's API calls.
+Responses are remembered with their ETag and Last-Modified, which are sent
+back on the next request for the same URL, so an unchanged resource costs
+the API a single document read and a 304 instead of a full response.
+"""
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import aiohttp
+
+# Responses remembered at most
+MAX_ENTRIES = 512
+
+
+class ConditionalCache:
+    """LRU of JSON responses keyed by URL and query parameters."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.not_modified = 0  # Requests answered with 304
+        self.fetched = 0       # Requests answered with a full body
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(url: str, params: Optional[dict]):
+        return url, tuple(sorted((str(name), str(value)) for name, value in (params or {}).items()))
+
+    async def get_json(self, session: aiohttp.ClientSession, url: str, params: Optional[dict] = None,
+                       raise_for_status: bool = False) -> Tuple[int, Any]:
+        """GET ``url`` and return ``(status, json)``, revalidating a remembered response.
+
+        A 304 is reported as 200 with the remembered body, which callers must not modify.
+        """
+        key = self._key(url, params)
+        entry = self._entries.get(key)
+        headers = {}
+        if entry is not None:
+            etag, modified, _ = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if modified:
+                headers['If-Modified-Since'] = modified
+
+        async with session.get(url, params=params, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                self.not_modified += 1
+                self._entries.move_to_end(key)
+                return 200, entry[2]
+            if raise_for_status:
+                response.raise_for_status()
+            try:
+                data = await response.json()
+            except (aiohttp.ContentTypeError, ValueError):
+                data = None
+            self.fetched += 1
+
+            etag = response.headers.get('ETag')
+            modified = response.headers.get('Last-Modified')
+            if response.status == 200 and (etag or modified):
+                self._entries[key] = (etag, modified, data)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.pop(key, None)
+            return response.status, data
+
+    def clear(self) -> None:
+        """Forget every remembered response."""
+        self._entries.clear()
+
+
+# Shared by the bot's API calls
+api_cache = ConditionalCache()
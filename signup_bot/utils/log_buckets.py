@@ -0,0 +1,129 @@
+"""
+Compact, hour-bucketed storage of audit log entries.
+
+Instead of one document per entry under ``events/{event}/logs``, entries are
+appended to one document per event and hour under
+``events/{event}/log_buckets/{YYYYMMDDHH}``, as maps with one-letter keys and
+without the fields the document path already implies. Firestore does not allow
+arrays inside arrays, so a compact entry is a map rather than a tuple.
+
+A bucket holds ``entries`` in the order they were appended, ``delivered`` (how
+many of them the bot has posted) and ``pending`` (set on every append, cleared
+once the bot has caught up). Entries are appended with ``ArrayUnion``, which
+skips values already in the array, so each compact entry carries a random
+nonce: the same action repeated within the hour is stored twice.
+
+At roughly 250 bytes per entry a bucket fits some 4000 entries in Firestore's
+1 MiB document limit. An hour that outgrows it continues in further parts,
+``{YYYYMMDDHH}-1``, ``-2`` and so on, with the same ``hour`` field.
+"""
+import secrets
+from typing import List, Optional, Tuple
+
+from google.cloud.firestore_v1 import transforms
+
+from .firestore_limits import MAX_DOCUMENT_BYTES, value_size
+
+BUCKETS_COLLECTION = 'log_buckets'
+
+# Parts a writer tries for one hour before giving up on its entries
+MAX_BUCKET_PARTS = 100
+
+# Key of the nonce keeping equal entries apart
+NONCE_KEY = 'n'
+
+# Entry fields and their keys in a compact entry
+COMPACT_KEYS = {
+    'timestamp': 't',
+    'action': 'a',
+    'user_name': 'u',
+    'user_avatar_url': 'p',
+    'success': 's',
+    'details': 'd',
+    'error_reason': 'e',
+    'additional_data': 'x',
+}
+
+# Values left out of compact entries and restored when expanding them
+_DEFAULTS = {'user_avatar_url': '', 'details': '', 'error_reason': '', 'additional_data': {}}
+
+
+def bucket_id(timestamp: str) -> str:
+    """Return the bucket of an ISO timestamp, e.g. '2024-05-01T13:45:00' -> '2024050113'."""
+    return timestamp[:13].replace('-', '').replace('T', '')
+
+
+def bucket_doc_id(bucket: str, part: int = 0) -> str:
+    """Return the document ID of a part of an hour's bucket; part 0 is the hour itself."""
+    return bucket if not part else f"{bucket}-{part}"
+
+
+def compact_entry(entry: dict) -> dict:
+    """Return the compact form of a log entry built by ``build_log_entry``."""
+    compact = {
+        key: entry[field] for field, key in COMPACT_KEYS.items()
+        if field in entry and entry[field] != _DEFAULTS.get(field, None)
+    }
+    compact[NONCE_KEY] = secrets.token_urlsafe(6)
+    return compact
+
+
+def expand_entry(compact: dict, guild_id: str, event_name: str, processed: bool = True) -> dict:
+    """Return the full log entry of a compact one, as stored in the ``logs`` collection."""
+    entry = {'guild_id': str(guild_id), 'event_name': event_name}
+    for field, key in COMPACT_KEYS.items():
+        entry[field] = compact.get(key, _DEFAULTS.get(field))
+    entry['processed'] = processed
+    return entry
+
+
+def bucket_append(bucket: str, entries: List[dict]) -> dict:
+    """Return the ``set(..., merge=True)`` fields appending compact ``entries`` to a bucket."""
+    return {'hour': bucket, 'entries': transforms.ArrayUnion(entries), 'pending': True}
+
+
+def group_by_bucket(entries) -> dict:
+    """Group ``(guild_id, event_name, entry)`` tuples by ``(guild_id, event_name, bucket)``, keeping their order."""
+    groups = {}
+    for guild_id, event_name, entry in entries:
+        key = (str(guild_id), event_name, bucket_id(entry['timestamp']))
+        groups.setdefault(key, []).append(compact_entry(entry))
+    return groups
+
+
+def split_parts(entries: List[dict], max_bytes: int = MAX_DOCUMENT_BYTES // 2) -> List[List[dict]]:
+    """Split compact entries, in order, into lists of at most ``max_bytes`` each."""
+    parts, size = [[]], 0
+    for entry in entries:
+        entry_size = value_size(entry)
+        if parts[-1] and size + entry_size > max_bytes:
+            parts.append([])
+            size = 0
+        parts[-1].append(entry)
+        size += entry_size
+    return parts
+
+
+def undelivered(bucket_data: dict) -> Tuple[List[dict], int]:
+    """Return the compact entries of a bucket the bot has not posted, and the new ``delivered`` count."""
+    entries = bucket_data.get('entries') or []
+    return entries[bucket_data.get('delivered', 0):], len(entries)
+
+
+def mark_delivered(bucket_ref, delivered: int) -> bool:
+    """Record that the first ``delivered`` entries of a bucket were posted; True if it is caught up.
+
+    Entries appended between reading the bucket and this update set
+    ``pending`` again themselves, or are caught by the second read.
+    """
+    bucket_ref.update({'delivered': delivered, 'pending': False})
+    bucket_data = bucket_ref.get().to_dict() or {}
+    if len(bucket_data.get('entries') or []) > delivered:
+        bucket_ref.update({'pending': True})
+        return False
+    return True
+
+
+def in_range(timestamp: str, since: Optional[str], until: Optional[str]) -> bool:
+    """Return whether ``since <= timestamp < until``; either bound may be None."""
+    return (since is None or timestamp >= since) and (until is None or timestamp < until)
@@ -0,0 +1,269 @@
+"""
+Delivery of new audit log entries to the bot.
+
+A ``LogListener`` keeps collection-group snapshot listeners on the log
+documents that were not posted yet (``processed == False``) and on the hourly
+buckets with new entries (``pending == True``). Firestore calls the listeners
+on its own thread; each change is handed to the bot's event loop, where a
+``LogDelivery`` posts it. Nothing is read while no entries are written.
+
+``LogDelivery.sweep`` reads the same entries with one query per collection
+group, oldest first, for anything the listener missed; those queries need the
+composite indexes in ``firestore.indexes.json``.
+
+Snapshots of the same document may arrive more than once, e.g. when the
+listener reconnects or when a slower sweep finds the same entries, so
+``LogDelivery`` remembers what it posted and skips repeats. Its Firestore
+calls run off the event loop, through ``run_blocking``.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional, Set
+
+from .firestore_io import run_blocking
+from .firestore_limits import MAX_WRITES_PER_COMMIT
+from .log_buckets import BUCKETS_COLLECTION, expand_entry, mark_delivered, undelivered
+
+logger = logging.getLogger(__name__)
+
+LOGS_COLLECTION = 'logs'
+
+# Posted log documents remembered to skip repeated snapshots
+_RECENT_LIMIT = 10000
+
+# Buckets whose delivery cursor is remembered to skip stale snapshots
+_CURSOR_LIMIT = 10000
+
+
+# Collection groups holding unposted entries: the filter matching them and the field the sweep orders by
+UNPROCESSED = (
+    (LOGS_COLLECTION, 'processed', False, 'timestamp'),
+    (BUCKETS_COLLECTION, 'pending', True, 'hour'),
+)
+
+
+def unprocessed_queries(db, limit: Optional[int] = None) -> list:
+    """Return the collection-group queries matching entries the bot has not posted.
+
+    With a ``limit`` they return the oldest entries first, ties broken by
+    document path so a page's last snapshot is an exact cursor.
+    """
+    queries = []
+    for collection_id, field, value, order in UNPROCESSED:
+        query = db.collection_group(collection_id).where(field, '==', value)
+        if limit is not None:
+            query = query.order_by(order).order_by('__name__').limit(limit)
+        queries.append(query)
+    return queries
+
+
+def _event_of(reference):
+    """Return the guild ID and event name of a document under ``servers/{guild}/events/{event}``."""
+    parts = reference.path.split('/')
+    return parts[1], parts[3]
+
+
+class LogDelivery:
+    """Posts the entries of log documents and hourly buckets, each once per process."""
+
+    def __init__(self, post: Callable[[dict], Awaitable[None]],
+                 guild_ids: Optional[Callable[[], Set[str]]] = None):
+        """``post`` sends one full log entry; entries of guilds not in ``guild_ids()`` are left for later."""
+        self.post = post
+        self.guild_ids = guild_ids
+        self.posted = 0
+        self.repeats = 0
+        self._busy = set()
+        self._recent = OrderedDict()
+        self._cursors = OrderedDict()
+
+    async def handle(self, snapshot) -> None:
+        """Post what a log document or bucket snapshot holds that was not posted yet."""
+        reference = snapshot.reference
+        guild_id, event_name = _event_of(reference)
+        if self.guild_ids is not None and guild_id not in self.guild_ids():
+            return
+        if reference.path in self._busy:
+            # Whatever this snapshot adds is caught when the running delivery marks its progress
+            self.repeats += 1
+            return
+        self._busy.add(reference.path)
+        try:
+            if reference.parent.id == BUCKETS_COLLECTION:
+                await self._handle_bucket(snapshot, guild_id, event_name)
+            else:
+                await self._handle_log(snapshot)
+        finally:
+            self._busy.discard(reference.path)
+
+    async def handle_many(self, db, snapshots) -> None:
+        """Post a page of log document or bucket snapshots, marking the log documents in one batch."""
+        posted = []
+        for snapshot in snapshots:
+            reference = snapshot.reference
+            if reference.parent.id == BUCKETS_COLLECTION:
+                await self.handle(snapshot)
+                continue
+            guild_id, _ = _event_of(reference)
+            if self.guild_ids is not None and guild_id not in self.guild_ids():
+                continue
+            if reference.path in self._busy:
+                self.repeats += 1
+                continue
+            self._busy.add(reference.path)
+            try:
+                if await self._post_log(snapshot):
+                    posted.append(reference)
+            finally:
+                self._busy.discard(reference.path)
+
+        for start in range(0, len(posted), MAX_WRITES_PER_COMMIT):
+            batch = db.batch()
+            for reference in posted[start:start + MAX_WRITES_PER_COMMIT]:
+                batch.update(reference, {'processed': True})
+            await run_blocking(batch.commit)
+        for reference in posted:
+            self._remember(reference.path)
+
+    async def sweep(self, db, limit: int = 100) -> int:
+        """Post every unposted entry, reading ``limit`` documents at a time; return the documents read."""
+        read = 0
+        for query in unprocessed_queries(db, limit):
+            page_query = query
+            while True:
+                snapshots = await run_blocking(lambda: list(page_query.stream()))
+                read += len(snapshots)
+                await self.handle_many(db, snapshots)
+                if len(snapshots) < limit:
+                    break
+                # Posted entries leave the query; this steps past the ones left for other bots
+                page_query = query.start_after(snapshots[-1])
+        return read
+
+    async def _handle_log(self, snapshot) -> None:
+        if await self._post_log(snapshot):
+            await run_blocking(snapshot.reference.update, {'processed': True})
+            self._remember(snapshot.reference.path)
+
+    async def _post_log(self, snapshot) -> bool:
+        """Post a log document unless it was posted already; the caller marks it processed."""
+        log_data = snapshot.to_dict() or {}
+        if snapshot.reference.path in self._recent or log_data.get('processed'):
+            self.repeats += 1
+            return False
+        await self.post(log_data)
+        self.posted += 1
+        # Marked as processed even if posting failed, to avoid infinite retries
+        return True
+
+    def _remember(self, path: str) -> None:
+        self._recent[path] = True
+        if len(self._recent) > _RECENT_LIMIT:
+            self._recent.popitem(last=False)
+
+    async def _handle_bucket(self, snapshot, guild_id: str, event_name: str) -> None:
+        path = snapshot.reference.path
+        bucket_data = snapshot.to_dict() or {}
+        # A snapshot taken before our last update still carries the old cursor
+        bucket_data['delivered'] = max(bucket_data.get('delivered', 0), self._cursors.get(path, 0))
+        entries, delivered = undelivered(bucket_data)
+        if not entries and (path in self._cursors or not bucket_data.get('pending')):
+            self.repeats += 1
+            return
+        for compact in entries:
+            await self.post(expand_entry(compact, guild_id, event_name))
+            self.posted += 1
+        self._cursors[path] = delivered
+        self._cursors.move_to_end(path)
+        if len(self._cursors) > _CURSOR_LIMIT:
+            self._cursors.popitem(last=False)
+        # Entries appended meanwhile set ``pending`` again, which the listener reports
+        await run_blocking(mark_delivered, snapshot.reference, delivered)
+
+    def stats(self) -> dict:
+        return {'posted': self.posted, 'repeats': self.repeats, 'in_progress': len(self._busy)}
+
+
+class LogListener:
+    """Bridges Firestore snapshot listeners into an asyncio event loop."""
+
+    def __init__(self, queries: Iterable, handler: Callable[[object], Awaitable[None]]):
+        """``handler`` is awaited on the loop for each added or changed document, one at a time."""
+        self.queries = list(queries)
+        self.handler = handler
+        self.received = 0
+        self.handled = 0
+        self.failed = 0
+        self._loop = None
+        self._queue = None
+        self._latest = {}
+        self._watches = []
+        self._task = None
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Subscribe to the queries; must be called from the loop the handler runs on."""
+        if self._task is not None:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = self._loop.create_task(self._run())
+        self._watches = [query.on_snapshot(self._on_snapshot) for query in self.queries]
+
+    def _on_snapshot(self, snapshots, changes, read_time) -> None:
+        """Called by Firestore on its listener thread."""
+        documents = [change.document for change in changes if change.type.name != 'REMOVED']
+        if not documents:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._push, documents)
+        except RuntimeError:
+            # The loop closed while the listener was still running
+            pass
+
+    def _push(self, documents) -> None:
+        for document in documents:
+            self.received += 1
+            path = document.reference.path
+            if path not in self._latest:
+                self._queue.put_nowait(path)
+            # Changes queued but not handled yet collapse into the latest snapshot
+            self._latest[path] = document
+
+    async def _run(self) -> None:
+        while True:
+            path = await self._queue.get()
+            document = self._latest.pop(path)
+            try:
+                await self.handler(document)
+                self.handled += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error delivering log entries of {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Wait until every change received so far is handled."""
+        # Let changes handed over by the listener thread reach the queue first
+        await asyncio.sleep(0)
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stop(self) -> None:
+        """Unsubscribe and stop handling changes."""
+        for watch in self._watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Failed to stop log listener: {e}")
+        self._watches = []
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'listening': bool(self._watches), 'received': self.received, 'handled': self.handled,
+            'failed': self.failed, 'queued': len(self._latest),
+        }
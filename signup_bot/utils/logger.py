@@ -3,6 +3,7 @@ import aiohttp
 from datetime import datetime
 from typing import Optional, Dict, Any
 from .embed_builder import EmbedBuilder
+from .firestore_io import run_blocking
 
 class EventLogger:
     """Utility class for logging event actions to Discord channels."""
@@ -67,7 +68,7 @@ class EventLogger:
             
             db = firestore.client()
             event_ref = db.collection('servers').document(str(guild_id)).collection('events').document(event_name)
-            event_doc = event_ref.get()
+            event_doc = await run_blocking(event_ref.get)
             
             if event_doc.exists:
                 event_data = event_doc.to_dict()
@@ -0,0 +1,27 @@
+"""
+Helpers for Clash of Clans player tags.
+Tags are normalized once so the same player always maps to the same signup.
+"""
+import re
+
+# Characters Clash of Clans uses in tags; a letter O typed for a zero is corrected
+TAG_ALPHABET = '0289PYLQGRJCUV'
+_VALID_TAG = re.compile(rf'^#[{TAG_ALPHABET}]{{3,15}}$')
+
+INVALID_PLAYER_TAG = f"Invalid player tag. Tags only contain the characters {TAG_ALPHABET}."
+
+
+def normalize_player_tag(player_tag: str) -> str:
+    """Return the canonical form of a player tag, e.g. ' abc123' -> '#ABC123', 'o2' -> '#02'."""
+    tag = (player_tag or '').strip().upper().lstrip('#').replace('O', '0')
+    return f"#{tag}" if tag else ''
+
+
+def is_valid_player_tag(player_tag: str) -> bool:
+    """Return whether a normalized tag could exist, so malformed ones never reach the API."""
+    return bool(_VALID_TAG.match(player_tag or ''))
+
+
+def signup_doc_id(player_tag: str) -> str:
+    """Return the signup document ID for a player tag (the normalized tag without '#')."""
+    return normalize_player_tag(player_tag).lstrip('#')
@@ -95,7 +95,7 @@ def test_signup_player(mock_firestore, client):
         
         # Test data
         signup_data = {
-            "player_tag": "#TEST123",
+            "player_tag": "#2PQ9LRY",
             "discord_name": "TestUser#1234",
             "guild_id": "12345"
         }
@@ -129,7 +129,7 @@ def test_export_event(mock_firestore, client):
     mock_signup.to_dict.return_value = {
         "index": 1,
         "player_name": "TestPlayer",
-        "player_tag": "#TEST123",
+        "player_tag": "#2PQ9LRY",
         "player_th": 12,
         "discord_name": "TestUser#1234",
         "signed_up_at": "2023-01-01T00:00:00"
@@ -0,0 +1,190 @@
+# Tests for the ASGI build of the API.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import asyncio
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.asgi import create_asgi_app
+from signup_bot.api.event_handlers import inline_async, run_inline
+from signup_bot.api.services import AsyncMemoryStorage, MemoryStorage
+from signup_bot.api.services.async_memory_client import AsyncMemoryClient
+
+GUILD_ID = '12345'
+LEADER_ROLE = '999'
+
+def _tag(number):
+    """Return a distinct valid player tag; tags have no 1, so binary is written with 0 and 9."""
+    return '#P' + format(number, '04b').replace('1', '9')
+
+async def _player(tag):
+    return {'name': f"Player {tag}", 'townHallLevel': 15}
+
+@pytest.fixture
+def storage():
+    """Async in-memory storage with a small awaited RPC latency so requests interleave."""
+    return AsyncMemoryStorage(AsyncMemoryClient(latency=0.001))
+
+@pytest.fixture
+def player_lookup():
+    with patch('signup_bot.api.asgi.events.player_get', side_effect=_player):
+        yield
+
+def test_same_routes_as_flask_app():
+    """The ASGI app serves exactly the URLs and methods of the Flask app."""
+    def routes(url_map):
+        return {
+            (rule.rule, tuple(sorted(rule.methods - {'HEAD', 'OPTIONS'})))
+            for rule in url_map.iter_rules() if rule.endpoint != 'static'
+        }
+
+    flask_app = create_app(storage=MemoryStorage())
+    asgi_app = create_asgi_app(storage=AsyncMemoryStorage())
+    assert routes(asgi_app.url_map) == routes(flask_app.url_map)
+
+def test_handlers_shared_with_flask_app():
+    """The ASGI routes run the shared handlers without importing the Flask routes."""
+    code = ("import sys, signup_bot.api.asgi.events; "
+            "assert 'signup_bot.api.routes.events' not in sys.modules")
+    assert subprocess.run([sys.executable, '-c', code], env=os.environ.copy()).returncode == 0
+
+def test_run_inline_rejects_suspending_handlers():
+    """Only handlers whose awaits complete at once can run on a Flask request's thread."""
+    assert run_inline(inline_async(lambda: 'done')()) == 'done'
+    with pytest.raises(RuntimeError):
+        run_inline(asyncio.sleep(0))
+
+def test_every_flask_route_runs_inline():
+    """Each Flask event and admin route completes through run_inline, so none awaits anything that suspends."""
+    app = create_app(storage=MemoryStorage())
+    client = app.test_client()
+    url = '/api/events/War'
+    leader = {'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE]}
+    player = {'player_tag': '#PPP', 'discord_name': 'ppp', 'guild_id': GUILD_ID}
+    admin = f'/api/servers/{GUILD_ID}'
+    requests = [
+        ('admin.add_leader_role', 'post', f'{admin}/add_leader_role', {'role_id': LEADER_ROLE}, 200),
+        ('admin.get_leader_roles', 'get', f'{admin}/leader_roles', None, 200),
+        ('events.create_event', 'post', '/api/events', dict(leader, event_name='War', log_channel_id='1'), 201),
+        ('events.list_events', 'get', f'/api/events?guild_id={GUILD_ID}', None, 200),
+        ('events.signup_player', 'post', f'{url}/signup', player, 201),
+        ('events.get_event', 'get', f'{url}?guild_id={GUILD_ID}', None, 200),
+        ('events.get_event_summary', 'get', f'{url}/summary?guild_id={GUILD_ID}', None, 200),
+        ('events.get_signups', 'get', f'{url}/signups?guild_id={GUILD_ID}', None, 200),
+        ('events.check_player', 'post', f'{url}/check?position=1', player, 200),
+        ('events.export_event', 'get', f'{url}/export?guild_id={GUILD_ID}', None, 200),
+        ('events.get_logs', 'get', f'{url}/logs?guild_id={GUILD_ID}', None, 200),
+        ('events.update_message_id', 'post', f'{url}/update_message_id', dict(leader, message_id='7'), 200),
+        ('events.remove_player', 'post', f'{url}/remove', player, 200),
+        ('events.close_event', 'post', f'{url}/close', leader, 200),
+        ('admin.remove_leader_role', 'post', f'{admin}/remove_leader_role', {'role_id': LEADER_ROLE}, 200),
+    ]
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.startswith(('events.', 'admin.'))}
+    assert {endpoint for endpoint, *_ in requests} == endpoints
+
+    with patch('signup_bot.api.routes.events.player_get', return_value={'name': 'P', 'townHallLevel': 14}), \
+            patch('signup_bot.api.routes.events.run_inline', wraps=run_inline) as inline:
+        for endpoint, method, path, body, status in requests:
+            response = getattr(client, method)(path, json=body)
+            assert response.status_code == status, (endpoint, response.get_data(as_text=True))
+    assert inline.call_count == len(requests)
+
+@pytest.mark.asyncio
+async def test_event_lifecycle(storage, player_lookup):
+    """Create, sign up, read, check, remove and close through the ASGI app."""
+    app = create_asgi_app(storage=storage)
+    url = '/api/events/War'
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        response = await client.post(f'/api/servers/{GUILD_ID}/add_leader_role', json={'role_id': LEADER_ROLE})
+        assert response.status_code == 200
+
+        response = await client.post('/api/events', json={
+            'event_name': 'War', 'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE], 'log_channel_id': '1'
+        })
+        assert response.status_code == 201
+
+        for name in ('ppp', 'qqq'):
+            response = await client.post(f'{url}/signup', json={
+                'player_tag': f'#{name}', 'discord_name': name, 'guild_id': GUILD_ID
+            })
+            assert response.status_code == 201
+            assert (await response.get_json())['player_th'] == 15
+
+        response = await client.post(f'{url}/signup', json={
+            'player_tag': '#PPP', 'discord_name': 'ppp', 'guild_id': GUILD_ID
+        })
+        assert response.status_code == 400
+
+        event = await (await client.get(url, query_string={'guild_id': GUILD_ID})).get_json()
+        assert event['signup_count'] == 2
+        assert [signup['player_tag'] for signup in event['signups']] == ['#PPP', '#QQQ']
+
+        response = await client.post(f'{url}/remove', json={
+            'player_tag': '#PPP', 'discord_name': 'ppp', 'guild_id': GUILD_ID
+        })
+        assert response.status_code == 200
+
+        check = await (await client.post(f'{url}/check?position=1', json={'player_tag': '#QQQ', 'guild_id': GUILD_ID})).get_json()
+        assert check['player_data']['position'] == 1
+
+        response = await client.post(f'{url}/close', json={'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE]})
+        assert response.status_code == 200
+
+        summary = await (await client.get(f'{url}/summary', query_string={'guild_id': GUILD_ID})).get_json()
+        assert (summary['is_open'], summary['signup_count'], summary['th_composition']) == (False, 1, {'15': 1})
+
+        export = await client.get(f'{url}/export', query_string={'guild_id': GUILD_ID})
+        assert export.status_code == 200
+        assert 'War_export.xlsx' in export.headers['Content-Disposition']
+
+    logs = [doc async for doc in storage._event_ref(GUILD_ID, 'War').collection('logs').stream()]
+    assert {doc.to_dict()['action'] for doc in logs} == {'create', 'signup', 'remove', 'close', 'export'}
+
+@pytest.mark.asyncio
+async def test_parallel_signups_get_unique_indexes(storage, player_lookup):
+    """Concurrent signups on one event loop are numbered 1..n exactly once."""
+    await storage.create_event(GUILD_ID, 'Rush', {'event_name': 'Rush', 'signup_count': 0, 'th_composition': {}})
+    app = create_asgi_app(storage=storage)
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        responses = await asyncio.gather(*(
+            client.post('/api/events/Rush/signup', json={
+                'player_tag': _tag(number), 'discord_name': f'user{number}', 'guild_id': GUILD_ID
+            })
+            for number in range(50)
+        ))
+
+    assert {response.status_code for response in responses} == {201}
+    signups = await storage.list_signups(GUILD_ID, 'Rush')
+    assert sorted(signup['index'] for signup in signups) == list(range(1, 51))
+    assert (await storage.get_event(GUILD_ID, 'Rush'))['signup_count'] == 50
+
+@pytest.mark.asyncio
+async def test_conditional_get_and_compression(storage):
+    """ETags, 304s and compression behave as in the Flask app."""
+    await storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    for number in range(50):
+        await storage.add_signup(GUILD_ID, 'War', {'player_tag': f'#P{number:02d}', 'player_th': 15})
+    app = create_asgi_app(storage=storage)
+    url = '/api/events/War'
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        first = await client.get(url, query_string={'guild_id': GUILD_ID}, headers={'Accept-Encoding': 'gzip'})
+        assert first.headers['Content-Encoding'] == 'gzip'
+        etag = first.headers['ETag']
+
+        cached = await client.get(url, query_string={'guild_id': GUILD_ID}, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+
+        await storage.update_event(GUILD_ID, 'War', {'message_id': '1'})
+        fresh = await client.get(url, query_string={'guild_id': GUILD_ID}, headers={'If-None-Match': etag})
+        assert fresh.status_code == 200
@@ -0,0 +1,156 @@
+# Tests for the storage layer's in-process caches.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from unittest.mock import patch
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.services import MemoryStorage
+from signup_bot.api.services.cache import MISSING, TTLCache
+
+GUILD_ID = '12345'
+LEADER_ROLE = '999'
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def storage():
+    """Create an in-memory storage with one leader role and one event."""
+    storage = MemoryStorage()
+    storage.set_leader_roles(GUILD_ID, [LEADER_ROLE])
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    storage.leader_roles_cache.clear()
+    return storage
+
+@pytest.fixture
+def client(storage):
+    """Create a test client for the API backed by in-memory storage."""
+    return create_app(storage=storage).test_client()
+
+def test_ttl_cache_expires_and_evicts():
+    """Entries expire after the TTL and the least recently used is evicted first."""
+    clock = FakeClock()
+    cache = TTLCache(max_entries=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', None)
+    assert cache.get('b') is None  # None is a cacheable value
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)  # 'b' is the least recently used
+    assert cache.get('b') is MISSING
+    clock.now = 10
+    assert cache.get('a') is MISSING
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'hit_ratio': 0.5, 'evictions': 1, 'size': 1}
+
+def test_ttl_cache_disabled():
+    """A TTL of zero stores nothing."""
+    cache = TTLCache(max_entries=10, ttl=0)
+    cache.set('a', 1)
+    assert cache.get('a') is MISSING
+
+def test_leader_checks_read_once(client, storage):
+    """Repeated permission checks are served from the cache."""
+    storage.db.reset_stats()
+    for _ in range(5):
+        response = client.post('/api/events/War/close', json={'guild_id': GUILD_ID, 'user_roles': ['other']})
+        assert response.status_code == 403
+
+    stats = storage.leader_roles_cache.stats()
+    assert (stats['hits'], stats['misses']) == (4, 1)
+
+def test_admin_routes_update_cache(client, storage):
+    """Adding or removing a leader role applies to the next check at once."""
+    assert storage.get_leader_roles(GUILD_ID) == [LEADER_ROLE]
+
+    client.post(f'/api/servers/{GUILD_ID}/add_leader_role', json={'role_id': '42'})
+    reads = storage.db.stats['reads']
+    assert storage.get_leader_roles(GUILD_ID) == [LEADER_ROLE, '42']
+    assert storage.db.stats['reads'] == reads
+
+    client.post(f'/api/servers/{GUILD_ID}/remove_leader_role', json={'role_id': LEADER_ROLE})
+    response = client.post('/api/events/War/close', json={'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE]})
+    assert response.status_code == 403
+
+def test_admin_routes_bypass_stale_cache(client, storage):
+    """A change made by another process is not overwritten from a stale cache."""
+    storage.get_leader_roles(GUILD_ID)
+    # Written directly, as another API process would
+    storage._leader_roles_ref(GUILD_ID).set({'leader_role_ids': [LEADER_ROLE, '7']})
+
+    client.post(f'/api/servers/{GUILD_ID}/add_leader_role', json={'role_id': '42'})
+    assert storage.get_leader_roles(GUILD_ID) == [LEADER_ROLE, '7', '42']
+
+def test_cached_roles_are_copies(storage):
+    """Callers can't change the cached roles by mutating the returned list."""
+    storage.get_leader_roles(GUILD_ID).append('mutated')
+    assert storage.get_leader_roles(GUILD_ID) == [LEADER_ROLE]
+
+def test_metrics_endpoint(client):
+    """Cache counters are exposed by the API."""
+    client.get(f'/api/servers/{GUILD_ID}/leader_roles')
+    client.get(f'/api/servers/{GUILD_ID}/leader_roles')
+    stats = client.get('/metrics').get_json()['caches']['leader_roles']
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+def _signup(client, tag):
+    return client.post('/api/events/War/signup', json={
+        'player_tag': tag, 'discord_name': f"user-{tag}", 'guild_id': GUILD_ID
+    })
+
+def test_event_cache_follows_writes(client, storage):
+    """Signups, removals and updates keep the cached event current."""
+    storage.event_cache.clear()
+    with patch('signup_bot.api.routes.events.player_get', return_value={'name': 'P', 'townHallLevel': 14}):
+        assert _signup(client, '#PPP').status_code == 201
+        assert _signup(client, '#QQQ').status_code == 201
+    client.post('/api/events/War/remove', json={'player_tag': '#PPP', 'discord_name': 'user-#PPP', 'guild_id': GUILD_ID})
+    client.post('/api/events/War/update_message_id', json={'guild_id': GUILD_ID, 'message_id': '77'})
+
+    cached = storage.get_event_metadata(GUILD_ID, 'War')
+    assert cached == storage.get_event(GUILD_ID, 'War')
+    assert (cached['signup_count'], cached['th_composition'], cached['message_id']) == (1, {'14': 1}, '77')
+
+def test_closed_event_rejects_from_cache(client, storage):
+    """Closing an event updates the cache, so the next signup is rejected without a read."""
+    storage.set_leader_roles(GUILD_ID, [LEADER_ROLE])
+    client.post('/api/events/War/close', json={'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE]})
+
+    storage.db.reset_stats()
+    assert _signup(client, '#PPP').status_code == 400
+    assert storage.db.stats['reads'] == 0
+
+def test_signup_reads_with_and_without_cache(client, storage):
+    """A signup to a hot event reads only the documents its transaction needs."""
+    storage.get_event(GUILD_ID, 'War')
+    with patch('signup_bot.api.routes.events.player_get', return_value={'name': 'P', 'townHallLevel': 14}):
+        storage.db.reset_stats()
+        _signup(client, '#PPP')
+        cached_reads = storage.db.stats['reads']
+
+        storage.event_cache.ttl = 0
+        storage.event_cache.clear()
+        storage.db.reset_stats()
+        _signup(client, '#QQQ')
+        uncached_reads = storage.db.stats['reads']
+
+    # Tag check, then the transaction's event and tag reads; without the cache
+    # the existence check reads the event once more (the log reuses that read)
+    assert cached_reads == 3
+    assert uncached_reads == 4
+
+def test_created_event_is_cached(client, storage):
+    """A new event is served from the cache without a read."""
+    client.post('/api/events', json={'event_name': 'Raid', 'guild_id': GUILD_ID, 'user_roles': [LEADER_ROLE]})
+    storage.db.reset_stats()
+    assert storage.get_event_metadata(GUILD_ID, 'Raid')['version'] == 1
+    assert storage.db.stats['reads'] == 0
@@ -0,0 +1,255 @@
+# Tests for the Clash of Clans proxy clients against a local fake proxy.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import unquote
+
+import pytest
+import requests
+
+from signup_bot.api import create_app
+from signup_bot.api.services import (
+    AsyncCocClient, CircuitBreaker, CircuitOpen, CocClient, MemoryStorage, ProxyUnavailable, RateLimited, TokenPool,
+    set_coc_client,
+)
+
+class FakeProxy(ThreadingHTTPServer):
+    """Answers player lookups; some tags fail first to exercise retries."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeProxyHandler)
+        self.connections = 0
+        self.requests = Counter()
+        self.tokens = Counter()
+        # API tokens whose budget is spent; their requests are answered 429
+        self.exhausted = set()
+        self.lock = threading.Lock()
+        # Tag -> statuses to answer before succeeding
+        self.failures = {'#FLAKY': [503, 502], '#LIMITED': [429], '#DOWN': [503] * 10}
+        # Tags answered after a second, past the tests' read timeouts
+        self.slow = {'#SLOW'}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+class FakeProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled connections can be reused
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        tag = unquote(self.path.rsplit('/', 1)[-1])
+        token = self.headers.get('Authorization')
+        with self.server.lock:
+            self.server.requests[tag] += 1
+            self.server.tokens[token] += 1
+            pending = self.server.failures.get(tag)
+            status = pending.pop(0) if pending else 200
+            exhausted = token in self.server.exhausted
+            if exhausted:
+                status = 429
+        if tag in self.server.slow:
+            time.sleep(1)
+        body = json.dumps({'tag': tag, 'name': 'Fake', 'townHallLevel': 14}).encode() if status == 200 else b'{}'
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '60' if exhausted else '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # The client timed out
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def proxy():
+    server = FakeProxy()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_retries_server_errors_and_rate_limits(proxy):
+    """5xx and 429 answers are retried until the proxy recovers."""
+    client = CocClient(proxy.url, 'token', retries=3, backoff=0.01)
+    assert client.get_player('#FLAKY')['name'] == 'Fake'
+    assert client.get_player('#LIMITED')['name'] == 'Fake'
+    assert (proxy.requests['#FLAKY'], proxy.requests['#LIMITED']) == (3, 2)
+
+def test_retries_are_bounded(proxy):
+    """A proxy that stays down is given up on after the configured retries."""
+    client = CocClient(proxy.url, 'token', retries=2, backoff=0.01)
+    with pytest.raises(ProxyUnavailable):
+        client.get_player('#DOWN')
+    assert proxy.requests['#DOWN'] == 3
+
+def test_read_timeout(proxy):
+    """A hung proxy costs at most the read timeout, not a worker forever."""
+    client = CocClient(proxy.url, 'token', read_timeout=0.2, retries=0)
+    start = time.perf_counter()
+    with pytest.raises(ProxyUnavailable):
+        client.get_player('#SLOW')
+    assert time.perf_counter() - start < 0.9
+
+def test_circuit_breaker_fails_fast(proxy):
+    """A proxy that keeps failing is not called again until the reset timeout."""
+    client = CocClient(proxy.url, 'token', retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    proxy.failures['#DOWN'] = [503] * 10
+    for _ in range(2):
+        with pytest.raises(ProxyUnavailable):
+            client.get_player('#DOWN')
+    start = time.perf_counter()
+    with pytest.raises(CircuitOpen):
+        client.get_player('#P1')
+    assert time.perf_counter() - start < 0.05
+    assert (proxy.requests['#DOWN'], proxy.requests['#P1']) == (2, 0)
+
+def _throughput(lookup, count=200):
+    """Return lookups per second of ``count`` lookups from four threads, and the results."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lookup, range(count)))
+    return count / (time.perf_counter() - start), results
+
+def test_pooled_throughput(proxy):
+    """Concurrent lookups reuse at most pool-size connections."""
+    client = CocClient(proxy.url, 'token', pool_maxsize=4)
+    pooled, results = _throughput(lambda number: client.get_player(f'#P{number}'))
+    pooled_connections, proxy.connections = proxy.connections, 0
+    # Module-level requests.get, as player_get used to, opens a connection per lookup
+    unpooled, _ = _throughput(lambda number: requests.get(f"{proxy.url}/players/%23U{number}", timeout=5))
+    print(f"pooled: {pooled:.0f}/s over {pooled_connections} connections, "
+          f"unpooled: {unpooled:.0f}/s over {proxy.connections} connections")
+
+    assert all(result['townHallLevel'] == 14 for result in results)
+    assert pooled_connections <= 4
+    assert proxy.connections == 200
+
+@pytest.mark.asyncio
+async def test_async_client(proxy):
+    """The ASGI client retries, gives up and pools like the sync one."""
+    client = AsyncCocClient(proxy.url, 'token', pool_maxsize=4, retries=2, backoff=0.01)
+    try:
+        assert (await client.get_player('#FLAKY'))['name'] == 'Fake'
+        with pytest.raises(ProxyUnavailable):
+            await client.get_player('#DOWN')
+        proxy.connections = 0
+        results = await asyncio.gather(*(client.get_player(f'#P{number}') for number in range(100)))
+    finally:
+        await client.close()
+
+    assert all(result['townHallLevel'] == 14 for result in results)
+    assert proxy.connections <= 4
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_pool_spreads_and_queues():
+    """Requests go to the token with most budget, then queue, then are refused."""
+    clock = FakeClock()
+    pool = TokenPool(['a', 'b'], rate=1, burst=2, max_wait=1.5, clock=clock)
+    assert sorted(pool.reserve()[0] for _ in range(4)) == ['a', 'a', 'b', 'b']
+    # Both buckets are empty: the next two wait one second each, in turn
+    assert [pool.reserve()[1] for _ in range(2)] == [1.0, 1.0]
+    with pytest.raises(RateLimited):
+        pool.reserve()
+
+    clock.now = 10
+    pool.penalize('a', retry_after=30)
+    assert [pool.reserve()[0] for _ in range(2)] == ['b', 'b']
+    stats = pool.stats()
+    assert (stats['acquired'], stats['queued'], stats['rejected'], stats['rate_limited']) == (8, 2, 1, 1)
+    assert stats['remaining'] == [0.0, 0.0]
+
+def test_rate_limited_token_is_rotated_out(proxy):
+    """A 429 on one token moves the lookup, and the ones after it, to the others."""
+    proxy.exhausted.add('spent')
+    client = CocClient(proxy.url, 'spent, fresh', tokens=TokenPool(['spent', 'fresh'], rate=100, burst=10))
+    assert all(client.get_player(f'#P{number}')['name'] == 'Fake' for number in range(5))
+    assert (proxy.tokens['spent'], proxy.tokens['fresh']) == (1, 5)
+
+def test_burst_is_held_to_the_rate(proxy):
+    """Lookups over the budget queue briefly instead of failing."""
+    tokens = TokenPool(['a', 'b'], rate=50, burst=5, max_wait=1)
+    client = CocClient(proxy.url, None, tokens=tokens)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda number: client.get_player(f'#P{number}'), range(30)))
+    # 10 go out at once, the other 20 at 100/s over both tokens
+    assert time.perf_counter() - start >= 0.18
+    assert all(result['name'] == 'Fake' for result in results)
+    assert (proxy.tokens['a'], proxy.tokens['b']) == (15, 15)
+    assert tokens.stats()['queued'] >= 15  # Some budget refills while the first ones are sent
+
+def test_signup_answers_503_when_rate_limited():
+    """A spent API budget is reported as such, not as a bad player tag."""
+    storage = MemoryStorage()
+    storage.create_event('1', 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    client = create_app(storage=storage).test_client()
+    with patch('signup_bot.api.routes.events.fetch_player', side_effect=RateLimited(2.5)):
+        response = client.post('/api/events/War/signup', json={
+            'player_tag': '#PQR', 'discord_name': 'someone', 'guild_id': '1'
+        })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
+    assert 'busy' in response.get_json()['error']
+
+def test_signup_degrades_when_proxy_times_out(proxy):
+    """A proxy timing out before the circuit opens takes the signup for enrichment, not as a bad tag."""
+    proxy.slow.add('#QQQ')
+    storage = MemoryStorage()
+    storage.create_event('1', 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    client = create_app(storage=storage).test_client()
+    coc_client = CocClient(proxy.url, 'token', read_timeout=0.2, retries=0)
+    set_coc_client(coc_client)
+    try:
+        response = client.post('/api/events/War/signup', json={
+            'player_tag': '#QQQ', 'discord_name': 'someone', 'guild_id': '1'
+        })
+    finally:
+        set_coc_client(None)
+
+    assert coc_client.breaker.state == CircuitBreaker.CLOSED
+    assert response.status_code == 201
+    assert response.get_json()['pending_enrichment'] is True
+    assert storage.find_signup('1', 'War', '#QQQ')['pending_enrichment'] is True
+
+@pytest.mark.asyncio
+async def test_async_client_rotates_tokens(proxy):
+    """The ASGI client shares the token pool behaviour."""
+    proxy.exhausted.add('spent')
+    client = AsyncCocClient(proxy.url, None, tokens=TokenPool(['spent', 'fresh'], rate=100, burst=10))
+    try:
+        assert (await client.get_player('#P1'))['name'] == 'Fake'
+        proxy.exhausted.add('fresh')
+        with pytest.raises(RateLimited):
+            await client.get_player('#P2')
+    finally:
+        await client.close()
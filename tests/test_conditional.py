@@ -0,0 +1,107 @@
+# Tests for ETag / conditional GET support.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from signup_bot.api import create_app
+from signup_bot.api.services import MemoryStorage
+from signup_bot.utils.http_cache import ConditionalCache
+
+GUILD_ID = '12345'
+
+@pytest.fixture
+def storage():
+    """Create an in-memory storage with an event of two signups."""
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    for tag in ['#AAA', '#BBB']:
+        storage.add_signup(GUILD_ID, 'War', {'player_tag': tag, 'player_th': 15})
+    return storage
+
+@pytest.fixture
+def client(storage):
+    """Create a test client for the API backed by in-memory storage."""
+    return create_app(storage=storage).test_client()
+
+def test_writes_bump_version(storage):
+    """Every write to an event or its signups bumps the version."""
+    assert storage.get_event(GUILD_ID, 'War')['version'] == 3
+    storage.remove_signup(GUILD_ID, 'War', '#AAA')
+    storage.update_event(GUILD_ID, 'War', {'is_open': False})
+    assert storage.get_event(GUILD_ID, 'War')['version'] == 5
+
+def test_get_event_not_modified(client, storage):
+    """A matching If-None-Match gets a 304 without reading the signups."""
+    url = f'/api/events/War?guild_id={GUILD_ID}'
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert first.headers['Last-Modified']
+
+    storage.db.reset_stats()
+    second = client.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    assert storage.db.stats['reads'] == 1
+
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#CCC', 'player_th': 14})
+    third = client.get(url, headers={'If-None-Match': etag})
+    assert third.status_code == 200
+    assert len(third.get_json()['signups']) == 3
+
+def test_pages_have_distinct_etags(client):
+    """Different pages of the same event never share a validator."""
+    first = client.get(f'/api/events/War/signups?guild_id={GUILD_ID}&limit=1')
+    everything = client.get(f'/api/events/War/signups?guild_id={GUILD_ID}')
+    assert first.headers['ETag'] != everything.headers['ETag']
+
+def test_if_modified_since(client):
+    """If-Modified-Since is honoured when no ETag is sent."""
+    url = f'/api/events/War/summary?guild_id={GUILD_ID}'
+    modified = client.get(url).headers['Last-Modified']
+    assert client.get(url, headers={'If-Modified-Since': modified}).status_code == 304
+
+def test_list_events_not_modified(client, storage):
+    """Event listings revalidate until any listed event changes."""
+    url = f'/api/events?guild_id={GUILD_ID}&fields=event_name'
+    first = client.get(url)
+    assert first.get_json()['events'] == [{'id': 'War', 'event_name': 'War'}]
+    etag = first.headers['ETag']
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    storage.update_event(GUILD_ID, 'War', {'message_id': '1'})
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+@pytest.mark.asyncio
+async def test_cache_sends_validators(client, storage):
+    """The bot's cache revalidates and serves the remembered body on 304."""
+    async def proxy(request):
+        response = client.get(request.path_qs, headers=dict(request.headers))
+        return web.Response(
+            body=response.data, status=response.status_code,
+            headers={name: value for name, value in response.headers.items() if name != 'Content-Length'},
+        )
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', proxy)
+    cache = ConditionalCache()
+    async with TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            url = str(server.make_url('/api/events/War/summary'))
+            first = await cache.get_json(session, url, params={'guild_id': GUILD_ID})
+            second = await cache.get_json(session, url, params={'guild_id': GUILD_ID})
+            storage.add_signup(GUILD_ID, 'War', {'player_tag': '#CCC', 'player_th': 14})
+            third = await cache.get_json(session, url, params={'guild_id': GUILD_ID})
+
+    assert first == second
+    assert second[1]['signup_count'] == 2
+    assert third[1]['signup_count'] == 3
+    assert (cache.fetched, cache.not_modified) == (2, 1)
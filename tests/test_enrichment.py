@@ -0,0 +1,141 @@
+# Tests for degraded signups while the CoC proxy is down and their later enrichment.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from unittest.mock import patch
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.services import (
+    AsyncEnrichmentWorker, AsyncMemoryStorage, CircuitBreaker, CircuitOpen, EnrichmentWorker, MemoryStorage,
+)
+from signup_bot.api.services.enrichment import MAX_ATTEMPTS
+
+GUILD_ID = '12345'
+
+def _profile(tag):
+    return {'tag': tag, 'name': f"Player {tag}", 'townHallLevel': 15}
+
+def _signup(client, tag):
+    return client.post('/api/events/War/signup', json={
+        'player_tag': tag, 'discord_name': 'someone', 'guild_id': GUILD_ID
+    })
+
+@pytest.fixture
+def storage():
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    return storage
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_circuit_opens_and_half_opens():
+    """Failures open the circuit; after the timeout one trial call decides."""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    clock.now = 30
+    breaker.before_call()  # The trial call
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # Everyone else waits for it
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 60
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats() == {'state': 'closed', 'consecutive_failures': 0, 'opened': 2, 'rejected': 2}
+
+def test_signup_degrades_while_circuit_open(storage):
+    """An open circuit stores the signup with the tag only, marked for enrichment."""
+    client = create_app(storage=storage).test_client()
+    with patch('signup_bot.api.routes.events.fetch_player', side_effect=CircuitOpen(30)):
+        response = _signup(client, '#pqr')
+
+    assert response.status_code == 201
+    assert response.get_json()['pending_enrichment'] is True
+    signup = storage.find_signup(GUILD_ID, 'War', '#PQR')
+    assert (signup['player_name'], signup['player_th'], signup['pending_enrichment']) == ('#PQR', 0, True)
+    assert storage.get_event(GUILD_ID, 'War')['th_composition'] == {'0': 1}
+
+def test_worker_fills_in_pending_signups(storage):
+    """Once lookups succeed, the worker sets name and TH and fixes the composition."""
+    client = create_app(storage=storage).test_client()
+    with patch('signup_bot.api.routes.events.fetch_player', side_effect=CircuitOpen(30)):
+        _signup(client, '#PQR')
+        _signup(client, '#LUV')
+    [pending] = [s for s in storage.list_pending_signups() if s['player_tag'] == '#PQR']
+    assert (pending['guild_id'], pending['event_name']) == (GUILD_ID, 'War')
+
+    # Still down: the sweep stops at the first lookup and changes nothing
+    lookups = []
+    def down(tag):
+        lookups.append(tag)
+        raise CircuitOpen(10)
+    worker = EnrichmentWorker(storage, down)
+    assert worker.run_once() == 0
+    assert len(lookups) == 1
+
+    worker.lookup = _profile
+    assert worker.run_once() == 2
+    assert storage.list_pending_signups() == []
+    signup = storage.find_signup(GUILD_ID, 'War', '#PQR')
+    assert (signup['player_name'], signup['player_th'], signup['pending_enrichment']) == ('Player #PQR', 15, False)
+    event = storage.get_event(GUILD_ID, 'War')
+    assert (event['signup_count'], event['th_composition']) == (2, {'15': 2})
+    assert worker.stats() == {'sweeps': 2, 'pending': 2, 'enriched': 2, 'failed': 0}
+
+def test_unknown_tag_given_up(storage):
+    """A tag the API never knows is marked failed after a few sweeps, not retried forever."""
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#BAD', 'player_name': '#BAD', 'player_th': 0,
+                                         'pending_enrichment': True})
+    worker = EnrichmentWorker(storage, lambda tag: {})
+    for _ in range(MAX_ATTEMPTS):
+        worker.run_once()
+
+    signup = storage.find_signup(GUILD_ID, 'War', '#BAD')
+    assert (signup['pending_enrichment'], signup['enrichment_failed']) == (False, True)
+    assert worker.stats()['failed'] == 1
+
+def test_signup_of_deleted_event_dropped(storage):
+    """A pending signup whose event was deleted is unmarked once, instead of failing every sweep."""
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#PQR', 'player_name': '#PQR', 'player_th': 0,
+                                         'pending_enrichment': True})
+    storage._event_ref(GUILD_ID, 'War').delete()
+    worker = EnrichmentWorker(storage, _profile)
+    worker.run_once()
+
+    assert storage.list_pending_signups() == []
+    assert worker._attempts == {}
+    assert not storage._event_ref(GUILD_ID, 'War').get().exists
+
+@pytest.mark.asyncio
+async def test_async_worker():
+    """The ASGI worker enriches through the async storage."""
+    storage = AsyncMemoryStorage()
+    await storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    await storage.add_signup(GUILD_ID, 'War', {'player_tag': '#PQR', 'player_name': '#PQR', 'player_th': 0,
+                                               'pending_enrichment': True})
+
+    async def lookup(tag):
+        return _profile(tag)
+
+    assert await AsyncEnrichmentWorker(storage, lookup).run_once() == 1
+    assert (await storage.find_signup(GUILD_ID, 'War', '#PQR'))['player_th'] == 15
+    assert (await storage.get_event(GUILD_ID, 'War'))['th_composition'] == {'15': 1}
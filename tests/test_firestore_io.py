@@ -0,0 +1,82 @@
+# Tests for keeping the bot's Firestore calls off its event loop.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import threading
+
+import pytest
+
+from signup_bot.api.event_handlers import build_log_entry
+from signup_bot.api.services import MemoryStorage
+from signup_bot.api.services.memory_client import MemoryDocumentReference, MemoryQuery, MemoryWriteBatch
+from signup_bot.utils import firestore_io
+from signup_bot.utils.firestore_io import install_blocking_guard, run_blocking
+from signup_bot.utils.log_feed import LogDelivery
+
+GUILD_ID = '12345'
+
+# The stand-in's network calls, guarded like the Firestore client's
+MEMORY_METHODS = [
+    (MemoryDocumentReference, ('get', 'set', 'update')),
+    (MemoryQuery, ('get', 'stream')),
+    (MemoryWriteBatch, ('commit',)),
+]
+
+@pytest.fixture
+def guard(monkeypatch):
+    """Guard the in-memory client for one test, restoring its methods afterwards."""
+    for cls, names in MEMORY_METHODS:
+        for name in names:
+            monkeypatch.setattr(cls, name, cls.__dict__[name])
+    assert install_blocking_guard(MEMORY_METHODS) == 6
+    assert install_blocking_guard(MEMORY_METHODS) == 0
+    return firestore_io
+
+@pytest.fixture
+def storage():
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'log_channel_id': '555'})
+    return storage
+
+@pytest.mark.asyncio
+async def test_guard_flags_calls_on_the_loop(guard, storage):
+    """Calls on the loop thread are counted once each; calls through run_blocking are not."""
+    event_ref = storage._event_ref(GUILD_ID, 'War')
+    before = guard.blocking_calls
+    event_ref.get()
+    event_ref.collection('logs').get()
+    assert guard.blocking_calls == before + 2
+
+    assert (await run_blocking(event_ref.get)).exists
+    thread = threading.Thread(target=event_ref.get)
+    thread.start()
+    thread.join()
+    assert guard.blocking_calls == before + 2
+
+@pytest.mark.asyncio
+async def test_log_delivery_does_not_block_the_loop(guard, storage):
+    """Posting log documents and buckets reads and writes Firestore only off the loop."""
+    for log_format in ('documents', 'hourly'):
+        storage.log_format = log_format
+        entry = build_log_entry(GUILD_ID, 'War', 'signup', 'someone', '', True)
+        storage.add_log(GUILD_ID, 'War', dict(entry, timestamp='2024-05-01T13:00:00'))
+
+    posted = []
+    async def post(log_data):
+        posted.append(log_data['action'])
+    before = guard.blocking_calls
+    await LogDelivery(post).sweep(storage.db)
+    assert posted == ['signup', 'signup']
+    assert guard.blocking_calls == before
+
+def test_guards_firestore_client(monkeypatch):
+    """By default the synchronous Firestore client's calls are guarded."""
+    from google.cloud.firestore_v1.document import DocumentReference
+    for cls, names in firestore_io._firestore_methods():
+        for name in names:
+            monkeypatch.setattr(cls, name, cls.__dict__[name])
+    assert install_blocking_guard() > 0
+    assert getattr(DocumentReference.get, '_loop_guarded', False)
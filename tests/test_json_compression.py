@@ -0,0 +1,89 @@
+# Tests for the JSON provider and response compression.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from signup_bot.api import create_app
+from signup_bot.api.compression import init_compression
+from signup_bot.api.json_provider import OrjsonProvider, json_provider_class
+from signup_bot.api.services import MemoryStorage
+
+GUILD_ID = '12345'
+
+@pytest.fixture
+def storage():
+    """Create an in-memory storage with an event of 50 signups."""
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    for number in range(50):
+        storage.add_signup(GUILD_ID, 'War', {'player_tag': f"#P{number:02d}", 'player_th': 15})
+    return storage
+
+@pytest.fixture
+def client(storage):
+    """Create a test client for the API backed by in-memory storage."""
+    return create_app(storage=storage).test_client()
+
+def test_orjson_matches_default_provider():
+    """The orjson provider produces the same documents as Flask's default."""
+    pytest.importorskip('orjson')
+    app = Flask(__name__)
+    document = {'b': [1, 2.5, None, True], 'a': {'15': 2, '14': 1}, 'when': datetime(2024, 1, 2, 3, 4, 5), 'name': 'Łukasz'}
+
+    fast = OrjsonProvider(app)
+    default = DefaultJSONProvider(app)
+    assert json.loads(fast.dumps(document)) == json.loads(default.dumps(document))
+    assert fast.loads(fast.dumps(document))['when'] == 'Tue, 02 Jan 2024 03:04:05 GMT'
+    with app.app_context():
+        assert json.loads(fast.response(document).get_data()) == json.loads(default.dumps(document))
+
+def test_provider_selected():
+    """The fastest installed provider is used by the app."""
+    app = create_app(storage=MemoryStorage())
+    assert isinstance(app.json, json_provider_class())
+
+def test_large_responses_compressed(client):
+    """Responses above the threshold are gzipped for clients that accept it."""
+    url = f'/api/events/War/signups?guild_id={GUILD_ID}'
+    plain = client.get(url)
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+
+def test_small_responses_not_compressed(client):
+    """Responses below the threshold and 304s are left alone."""
+    assert 'Content-Encoding' not in client.get('/health', headers={'Accept-Encoding': 'gzip'}).headers
+
+    url = f'/api/events/War?guild_id={GUILD_ID}'
+    etag = client.get(url).headers['ETag']
+    response = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert 'Content-Encoding' not in response.headers
+
+def test_brotli_preferred_when_available():
+    """Brotli is used when installed and accepted."""
+    brotli = pytest.importorskip('brotli')
+    app = Flask(__name__)
+    init_compression(app, min_size=10)
+
+    @app.route('/data')
+    def data():
+        return {'signups': ['x' * 40] * 10}
+
+    response = app.test_client().get('/data', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data)) == {'signups': ['x' * 40] * 10}
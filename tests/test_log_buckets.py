@@ -0,0 +1,146 @@
+# Tests for the compact, hour-bucketed audit log format.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.migrate import migrate_log_buckets
+from signup_bot.api.event_handlers import build_log_entry
+from signup_bot.api.services import AsyncMemoryStorage, MemoryStorage
+from signup_bot.api.services.memory_client import MemoryClient
+from signup_bot.utils.log_buckets import compact_entry, expand_entry, mark_delivered, split_parts, undelivered
+
+GUILD_ID = '12345'
+
+def _entry(timestamp, action='signup', **fields):
+    entry = build_log_entry(GUILD_ID, 'War', action, 'someone', 'https://cdn.example/a.png', True, **fields)
+    entry['timestamp'] = timestamp
+    return entry
+
+def _buckets_ref(storage):
+    return storage._log_buckets_ref(GUILD_ID, 'War')
+
+@pytest.fixture
+def storage():
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'log_channel_id': '555'})
+    storage.log_format = 'hourly'
+    return storage
+
+def test_compact_entry_round_trip():
+    """Compact entries drop implied and empty fields and expand back to the original."""
+    entry = _entry('2024-05-01T13:05:00', details='Player P (TH15) signed up', additional_data={'player_th': 15})
+    compact = compact_entry(entry)
+    assert set(compact) == {'t', 'a', 'u', 'p', 's', 'd', 'x', 'n'}
+    assert expand_entry(compact, GUILD_ID, 'War', processed=False) == entry
+
+    failure = _entry('2024-05-01T13:06:00', error_reason='Event not found')
+    failure['success'] = False
+    assert compact_entry(failure)['s'] is False
+
+def test_hourly_writes_one_document_per_hour(storage):
+    """A batch of entries is one write per event and hour; the reader expands them in order."""
+    storage.db.reset_stats()
+    storage.add_logs([(GUILD_ID, 'War', _entry(f'2024-05-01T13:{minute:02d}:00', f'a{minute}')) for minute in range(10)]
+                     + [(GUILD_ID, 'War', _entry('2024-05-01T14:01:00', 'late'))])
+    assert (storage.db.stats['commits'], storage.db.stats['writes']) == (1, 2)
+    assert sorted(doc.id for doc in _buckets_ref(storage).stream()) == ['2024050113', '2024050114']
+
+    storage.add_log(GUILD_ID, 'War', _entry('2024-05-01T13:30:00', 'single'))
+    logs = storage.read_logs(GUILD_ID, 'War')
+    assert [entry['action'] for entry in logs][-3:] == ['a9', 'single', 'late']
+    assert logs[0] == _entry('2024-05-01T13:00:00', 'a0')
+
+    window = storage.read_logs(GUILD_ID, 'War', since='2024-05-01T13:05:00', until='2024-05-01T14:00:00')
+    assert [entry['action'] for entry in window] == ['a5', 'a6', 'a7', 'a8', 'a9', 'single']
+
+def test_reader_merges_both_formats(storage):
+    """Entries written before switching formats are read along with the buckets."""
+    storage.log_format = 'documents'
+    storage.add_log(GUILD_ID, 'War', _entry('2024-05-01T13:10:00', 'old'))
+    storage.log_format = 'hourly'
+    storage.add_log(GUILD_ID, 'War', _entry('2024-05-01T13:20:00', 'new'))
+    assert [entry['action'] for entry in storage.read_logs(GUILD_ID, 'War')] == ['old', 'new']
+
+    response = create_app(storage=storage).test_client().get(
+        '/api/events/War/logs', query_string={'guild_id': GUILD_ID, 'since': '2024-05-01T13:15:00'}
+    )
+    assert response.status_code == 200
+    assert [entry['action'] for entry in response.get_json()['logs']] == ['new']
+
+def test_equal_entries_are_all_kept(storage):
+    """The same action logged twice in a second is appended twice."""
+    entry = _entry('2024-05-01T13:00:00', 'signup')
+    storage.add_logs([(GUILD_ID, 'War', entry), (GUILD_ID, 'War', entry)])
+    storage.add_log(GUILD_ID, 'War', entry)
+    assert [log['action'] for log in storage.read_logs(GUILD_ID, 'War')] == ['signup'] * 3
+
+def test_full_bucket_rolls_over():
+    """A bucket at the size limit continues in a new part, without losing other buckets' entries."""
+    storage = MemoryStorage(MemoryClient(max_document_bytes=1000))
+    storage.log_format = 'hourly'
+    for batch in range(6):
+        storage.add_logs([(GUILD_ID, 'War', _entry(f'2024-05-01T13:{batch:02d}:{second:02d}', f'a{batch}'))
+                          for second in range(3)] + [(GUILD_ID, 'Raid', _entry(f'2024-05-01T13:{batch:02d}:00', 'raid'))])
+
+    parts = sorted(doc.id for doc in _buckets_ref(storage).stream())
+    assert parts[:2] == ['2024050113', '2024050113-1']
+    actions = [entry['action'] for entry in storage.read_logs(GUILD_ID, 'War')]
+    assert actions == [f'a{batch}' for batch in range(6) for _ in range(3)]
+    assert len(storage.read_logs(GUILD_ID, 'Raid')) == 6
+
+def test_split_parts():
+    """Entries are split in order into parts below the size limit."""
+    entries = [compact_entry(_entry(f'2024-05-01T13:00:{second:02d}', f'a{second}')) for second in range(10)]
+    parts = split_parts(entries, max_bytes=500)
+    assert len(parts) > 1
+    assert [entry for part in parts for entry in part] == entries
+
+def test_delivery_cursor(storage):
+    """The bot posts each appended entry once, including ones appended while it posts."""
+    storage.add_logs([(GUILD_ID, 'War', _entry('2024-05-01T13:00:00', 'a')),
+                      (GUILD_ID, 'War', _entry('2024-05-01T13:01:00', 'b'))])
+    [bucket_doc] = _buckets_ref(storage).where('pending', '==', True).stream()
+    entries, delivered = undelivered(bucket_doc.to_dict())
+    assert [entry['a'] for entry in entries] == ['a', 'b']
+
+    # Appended after the bot read the bucket
+    storage.add_log(GUILD_ID, 'War', _entry('2024-05-01T13:02:00', 'c'))
+    assert not mark_delivered(bucket_doc.reference, delivered)
+
+    [bucket_doc] = _buckets_ref(storage).where('pending', '==', True).stream()
+    entries, delivered = undelivered(bucket_doc.to_dict())
+    assert [entry['a'] for entry in entries] == ['c']
+    assert mark_delivered(bucket_doc.reference, delivered)
+    assert list(_buckets_ref(storage).where('pending', '==', True).stream()) == []
+
+def test_migrate_log_buckets(storage):
+    """Finished, fully posted hours move into buckets; the rest wait for a later run."""
+    storage.log_format = 'documents'
+    logs_ref = storage._event_ref(GUILD_ID, 'War').collection('logs')
+    for minute in range(3):
+        logs_ref.add(dict(_entry(f'2024-05-01T13:{minute:02d}:00', f'a{minute}'), processed=True))
+    logs_ref.add(_entry('2024-05-01T15:00:00', 'unposted'))
+
+    stats = migrate_log_buckets(storage.db)
+    assert (stats['moved'], stats['buckets'], stats['hours_pending']) == (3, 1, 1)
+    assert [doc.to_dict()['action'] for doc in logs_ref.stream()] == ['unposted']
+    bucket = _buckets_ref(storage).document('2024050113').get().to_dict()
+    assert (len(bucket['entries']), bucket['delivered'], bucket['pending']) == (3, 3, False)
+    assert [entry['action'] for entry in storage.read_logs(GUILD_ID, 'War')] == ['a0', 'a1', 'a2', 'unposted']
+
+    # Nothing more to move until the bot has posted the last entry
+    assert migrate_log_buckets(storage.db)['writes'] == 0
+
+@pytest.mark.asyncio
+async def test_async_hourly_logs():
+    """The async storage writes and reads the same buckets."""
+    storage = AsyncMemoryStorage()
+    storage.log_format = 'hourly'
+    await storage.add_logs([(GUILD_ID, 'War', _entry('2024-05-01T13:00:00', 'a')),
+                            (GUILD_ID, 'War', _entry('2024-05-01T13:01:00', 'b'))])
+    assert [entry['action'] for entry in await storage.read_logs(GUILD_ID, 'War')] == ['a', 'b']
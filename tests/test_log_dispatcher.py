@@ -0,0 +1,215 @@
+# Tests for the background dispatch and batched writes of audit log entries.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.services import (
+    AsyncBatchedLogSink, AsyncLogDispatcher, AsyncMemoryStorage, BatchedLogSink, LogDispatcher, MemoryStorage,
+    get_enrichment_worker, get_log_dispatcher, set_enrichment_worker, set_log_dispatcher,
+)
+
+GUILD_ID = '12345'
+EVENT = {'event_name': 'War', 'signup_count': 0, 'th_composition': {}, 'log_channel_id': '555'}
+
+def _entry(action='signup'):
+    return {'guild_id': GUILD_ID, 'event_name': 'War', 'action': action, 'processed': False}
+
+def _logs(storage):
+    return [doc.to_dict() for doc in storage._event_ref(GUILD_ID, 'War').collection('logs').stream()]
+
+@pytest.fixture
+def storage():
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', dict(EVENT))
+    return storage
+
+def test_signup_does_not_wait_for_log_write(storage):
+    """The response is sent while the log write is still blocked; flushing writes it."""
+    client = create_app(storage=storage).test_client()
+    release = threading.Event()
+    written = []
+    def slow_sink(guild_id, event_name, entry):
+        release.wait(5)
+        written.append(entry)
+    get_log_dispatcher().sink = slow_sink
+
+    with patch('signup_bot.api.routes.events.player_get', return_value={'name': 'P', 'townHallLevel': 14}):
+        response = client.post('/api/events/War/signup', json={
+            'player_tag': '#PPP', 'discord_name': 'someone', 'guild_id': GUILD_ID
+        })
+    assert response.status_code == 201
+    assert written == []
+
+    release.set()
+    assert get_log_dispatcher().flush(5)
+    assert [entry['action'] for entry in written] == ['signup']
+    logs = client.get('/metrics').get_json()['logs']
+    assert (logs['submitted'], logs['written'], logs['depth']) == (1, 1, 0)
+
+def test_loaded_event_is_not_read_again(storage):
+    """Entries carrying the event skip the metadata read; events without a log channel are not queued."""
+    dispatcher = LogDispatcher(storage, max_size=10, workers=1)
+    dispatcher.start()
+    storage.event_cache.clear()
+    storage.db.reset_stats()
+
+    assert dispatcher.submit(GUILD_ID, 'War', _entry(), event_data=EVENT)
+    assert not dispatcher.submit(GUILD_ID, 'War', _entry(), event_data={'event_name': 'War'})
+    assert not dispatcher.submit(GUILD_ID, 'War', _entry(), event_data=None)
+    dispatcher.close()
+
+    assert storage.db.stats['reads'] == 0
+    assert len(_logs(storage)) == 1
+    assert dispatcher.stats()['skipped'] == 2
+
+def test_unknown_event_read_by_worker(storage):
+    """Without the event, a worker reads its metadata and drops entries of events without a channel."""
+    storage.create_event(GUILD_ID, 'Quiet', {'event_name': 'Quiet', 'signup_count': 0})
+    dispatcher = LogDispatcher(storage, workers=1)
+    dispatcher.start()
+    dispatcher.submit(GUILD_ID, 'War', _entry())
+    dispatcher.submit(GUILD_ID, 'Quiet', _entry())
+    dispatcher.submit(GUILD_ID, 'Missing', _entry())
+    dispatcher.close()
+
+    assert len(_logs(storage)) == 1
+    assert (dispatcher.written, dispatcher.skipped) == (1, 2)
+
+def test_full_queue_drops_entries(storage):
+    """A full queue rejects new entries at once and counts them; queued ones are written."""
+    dispatcher = LogDispatcher(storage, max_size=2, workers=1)
+    assert dispatcher.submit(GUILD_ID, 'War', _entry('a'), event_data=EVENT)
+    assert dispatcher.submit(GUILD_ID, 'War', _entry('b'), event_data=EVENT)
+    assert not dispatcher.submit(GUILD_ID, 'War', _entry('c'), event_data=EVENT)
+    assert (dispatcher.depth(), dispatcher.max_depth, dispatcher.dropped) == (2, 2, 1)
+
+    dispatcher.start()
+    dispatcher.close()
+    assert sorted(entry['action'] for entry in _logs(storage)) == ['a', 'b']
+    assert dispatcher.stats()['depth'] == 0
+
+@pytest.mark.asyncio
+async def test_async_dispatcher_drains_on_close():
+    """The ASGI dispatcher writes every queued entry before it stops."""
+    storage = AsyncMemoryStorage()
+    await storage.create_event(GUILD_ID, 'War', dict(EVENT))
+    dispatcher = AsyncLogDispatcher(storage, workers=2)
+    dispatcher.start()
+    for number in range(20):
+        dispatcher.submit(GUILD_ID, 'War', _entry(f'action{number}'), event_data=EVENT)
+    await dispatcher.close()
+
+    logs = [doc async for doc in storage._event_ref(GUILD_ID, 'War').collection('logs').stream()]
+    assert len(logs) == 20
+    assert dispatcher.stats()['written'] == 20
+
+@pytest.mark.asyncio
+async def test_async_dispatcher_keeps_entries_submitted_before_start():
+    """Entries of requests served before startup are written once the workers run."""
+    storage = AsyncMemoryStorage()
+    await storage.create_event(GUILD_ID, 'War', dict(EVENT))
+    dispatcher = AsyncLogDispatcher(storage)
+    assert dispatcher.submit(GUILD_ID, 'War', _entry(), event_data=EVENT)
+    assert dispatcher.depth() == 1
+
+    dispatcher.start()
+    await dispatcher.close()
+    assert dispatcher.stats()['written'] == 1
+
+class FlakyStorage:
+    """Storage whose first ``failures`` batched commits fail."""
+
+    def __init__(self, storage, failures):
+        self.storage = storage
+        self.failures = failures
+
+    def add_logs(self, entries):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('deadline exceeded')
+        self.storage.add_logs(entries)
+
+def test_sink_commits_in_batches(storage):
+    """Entries are committed a batch at a time, not one RPC each."""
+    sink = BatchedLogSink(storage, batch_size=10, flush_interval=60)
+    dispatcher = LogDispatcher(storage, workers=2, sink=sink)
+    dispatcher.start()
+    storage.db.reset_stats()
+    for number in range(25):
+        dispatcher.submit(GUILD_ID, 'War', _entry(f'action{number}'), event_data=EVENT)
+    dispatcher.close()
+
+    assert len(_logs(storage)) == 25
+    assert (storage.db.stats['commits'], storage.db.stats['writes']) == (3, 25)
+    stats = dispatcher.stats()['sink']
+    assert (stats['written'], stats['commits'], stats['buffered']) == (25, 3, 0)
+
+def test_sink_retries_failed_commits(storage):
+    """A failed commit is written by a later flush, in order; hopeless entries are dropped."""
+    sink = BatchedLogSink(FlakyStorage(storage, failures=1), batch_size=10, flush_interval=60)
+    for number in range(15):
+        sink(GUILD_ID, 'War', dict(_entry(f'action{number}'), order=number))
+    assert sink.last_flush == {'written': 0, 'commits': 0, 'failed': 10}
+    assert sink.flush() == {'written': 15, 'commits': 2, 'failed': 0}
+    assert sorted(entry['order'] for entry in _logs(storage)) == list(range(15))
+
+    sink = BatchedLogSink(FlakyStorage(storage, failures=10), batch_size=10, max_retries=2)
+    sink(GUILD_ID, 'War', _entry())
+    sink.close()
+    assert sink.stats()['retried'] == 2
+    assert (sink.stats()['dropped'], sink.buffered()) == (1, 0)
+
+def test_sink_memory_cap(storage):
+    """Entries beyond ``max_buffer`` are dropped while a batch is waiting."""
+    sink = BatchedLogSink(storage, batch_size=100, flush_interval=60, max_buffer=5)
+    for _ in range(7):
+        sink(GUILD_ID, 'War', _entry())
+    assert (sink.buffered(), sink.dropped) == (5, 2)
+    sink.close()
+    assert len(_logs(storage)) == 5
+
+@pytest.mark.asyncio
+async def test_async_sink_batches():
+    """The ASGI dispatcher commits its entries through the batched sink."""
+    storage = AsyncMemoryStorage()
+    await storage.create_event(GUILD_ID, 'War', dict(EVENT))
+    sink = AsyncBatchedLogSink(storage, batch_size=50, flush_interval=60)
+    dispatcher = AsyncLogDispatcher(storage, sink=sink)
+    dispatcher.start()
+    storage.db.sync_client.reset_stats()
+    for number in range(120):
+        dispatcher.submit(GUILD_ID, 'War', _entry(f'action{number}'), event_data=EVENT)
+    await dispatcher.close()
+
+    logs = [doc async for doc in storage._event_ref(GUILD_ID, 'War').collection('logs').stream()]
+    assert len(logs) == 120
+    assert storage.db.sync_client.stats['commits'] == 3
+
+def test_threads_start_with_first_request(storage):
+    """Building apps starts no background threads; serving the first request starts them once."""
+    def background():
+        return [thread for thread in threading.enumerate()
+                if thread.name.startswith(('log-dispatch', 'log-flush', 'signup-enrichment'))]
+    set_log_dispatcher(None)
+    set_enrichment_worker(None)
+    before = len(background())
+    for _ in range(3):
+        app = create_app(storage=storage)
+    assert len(background()) == before
+
+    client = app.test_client()
+    client.get('/health')
+    client.get('/health')
+    started = len(background()) - before
+    assert started == get_log_dispatcher().workers + 2
+    set_log_dispatcher(None)
+    set_enrichment_worker(None)
+    assert len(background()) == before
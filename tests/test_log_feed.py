@@ -0,0 +1,159 @@
+# Tests for pushing new audit log entries from Firestore listeners to the bot.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from signup_bot.api.event_handlers import build_log_entry
+from signup_bot.api.services import MemoryStorage
+from signup_bot.utils.log_buckets import BUCKETS_COLLECTION
+from signup_bot.utils import log_feed
+from signup_bot.utils.log_feed import LogDelivery, LogListener
+
+GUILD_ID = '12345'
+
+def _entry(action):
+    entry = build_log_entry(GUILD_ID, 'War', action, 'someone', '', True)
+    entry['timestamp'] = '2024-05-01T13:00:00'
+    return entry
+
+class FakeQuery:
+    """Query whose listener is fed by the test, from a thread of its own like Firestore's."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.callback = None
+        self.unsubscribed = False
+
+    def on_snapshot(self, callback):
+        self.callback = callback
+        return SimpleNamespace(unsubscribe=lambda: setattr(self, 'unsubscribed', True))
+
+    def fire(self, change_type='ADDED'):
+        """Report the query's matching documents as changed."""
+        changes = [SimpleNamespace(type=SimpleNamespace(name=change_type), document=doc)
+                   for doc in self.collection.stream()]
+        thread = threading.Thread(target=self.callback, args=(None, changes, None))
+        thread.start()
+        thread.join()
+
+@pytest.fixture
+def storage():
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'log_channel_id': '555'})
+    return storage
+
+async def _delivered(storage, log_format, actions):
+    storage.log_format = log_format
+    posted = []
+    async def post(log_data):
+        posted.append(log_data['action'])
+    delivery = LogDelivery(post, lambda: {GUILD_ID})
+    event_ref = storage._event_ref(GUILD_ID, 'War')
+    query = FakeQuery(event_ref.collection(BUCKETS_COLLECTION if log_format == 'hourly' else 'logs'))
+    listener = LogListener([query], delivery.handle)
+    listener.start()
+
+    storage.add_logs([(GUILD_ID, 'War', _entry(action)) for action in actions[:2]])
+    query.fire()
+    await listener.drain()
+    storage.add_logs([(GUILD_ID, 'War', _entry(action)) for action in actions[2:]])
+    # A reconnecting listener reports every matching document again
+    query.fire()
+    query.fire('MODIFIED')
+    await listener.drain()
+
+    listener.stop()
+    assert query.unsubscribed
+    return posted, delivery, listener
+
+@pytest.mark.asyncio
+async def test_listener_posts_each_log_document_once(storage):
+    """Log documents are posted from the listener thread's changes once each, then marked processed."""
+    posted, delivery, listener = await _delivered(storage, 'documents', ['a', 'b', 'c'])
+    assert sorted(posted) == ['a', 'b', 'c']
+    logs = storage._event_ref(GUILD_ID, 'War').collection('logs')
+    assert all(doc.to_dict()['processed'] for doc in logs.stream())
+    assert listener.stats()['failed'] == 0
+
+@pytest.mark.asyncio
+async def test_listener_posts_bucket_entries_once(storage):
+    """Entries appended to an hourly bucket are posted once, even from stale snapshots."""
+    posted, delivery, listener = await _delivered(storage, 'hourly', ['a', 'b', 'c'])
+    assert posted == ['a', 'b', 'c']
+    bucket = storage._log_buckets_ref(GUILD_ID, 'War').document('2024050113').get().to_dict()
+    assert (bucket['delivered'], bucket['pending']) == (3, False)
+
+@pytest.mark.asyncio
+async def test_sweep_pages_past_equal_timestamps(storage):
+    """Entries sharing the timestamp of a page's last document are still read."""
+    storage.create_event('999', 'Raid', {'event_name': 'Raid', 'log_channel_id': '556'})
+    # Left for another bot, and ordered before this bot's entry by path
+    storage.add_logs([(GUILD_ID, 'War', _entry('other')), (GUILD_ID, 'War', _entry('other')),
+                      ('999', 'Raid', _entry('mine'))])
+    posted = []
+    async def post(log_data):
+        posted.append(log_data['action'])
+    assert await LogDelivery(post, lambda: {'999'}).sweep(storage.db, limit=2) == 3
+    assert posted == ['mine']
+
+@pytest.mark.asyncio
+async def test_bucket_cursors_are_bounded(storage, monkeypatch):
+    """Only the most recently delivered buckets' cursors are kept."""
+    monkeypatch.setattr(log_feed, '_CURSOR_LIMIT', 2)
+    storage.log_format = 'hourly'
+    storage.add_logs([(GUILD_ID, 'War', dict(_entry('a'), timestamp=f'2024-05-01T{hour:02d}:00:00'))
+                      for hour in range(4)])
+    async def post(log_data):
+        pass
+    delivery = LogDelivery(post)
+    buckets_ref = storage._log_buckets_ref(GUILD_ID, 'War')
+    for bucket_doc in buckets_ref.stream():
+        await delivery.handle(bucket_doc)
+    assert list(delivery._cursors) == [buckets_ref.document(f'20240501{hour:02d}').path for hour in (2, 3)]
+
+@pytest.mark.asyncio
+async def test_other_guilds_are_left_unprocessed(storage):
+    """Entries of guilds the bot is not in stay unprocessed for the bot that is."""
+    posted = []
+    async def post(log_data):
+        posted.append(log_data)
+    storage.add_log(GUILD_ID, 'War', _entry('a'))
+    [log_doc] = storage._event_ref(GUILD_ID, 'War').collection('logs').stream()
+    await LogDelivery(post, lambda: {'999'}).handle(log_doc)
+    assert posted == []
+    assert log_doc.reference.get().to_dict()['processed'] is False
+
+@pytest.mark.asyncio
+async def test_sweep_reads_all_guilds_in_pages(storage):
+    """The sweep pages through one query per collection group and marks a page in one commit."""
+    storage.create_event('999', 'Raid', {'event_name': 'Raid', 'log_channel_id': '556'})
+    entries = [(GUILD_ID, 'War', dict(_entry(f'a{number}'), timestamp=f'2024-05-01T13:00:{number:02d}'))
+               for number in range(5)]
+    # Left by a bot this one does not replace, and read before the rest
+    entries.append(('999', 'Raid', dict(_entry('other'), timestamp='2024-05-01T12:00:00')))
+    storage.add_logs(entries)
+    storage.log_format = 'hourly'
+    storage.add_log(GUILD_ID, 'War', _entry('bucketed'))
+
+    posted = []
+    async def post(log_data):
+        posted.append(log_data['action'])
+    delivery = LogDelivery(post, lambda: {GUILD_ID})
+    storage.db.reset_stats()
+    assert await delivery.sweep(storage.db, limit=2) == 7
+    assert posted == ['a0', 'a1', 'a2', 'a3', 'a4', 'bucketed']
+    assert storage.db.stats['queries'] == 5
+    # Five log documents marked in one commit per page, and the bucket's cursor
+    assert (storage.db.stats['writes'], storage.db.stats['commits']) == (6, 4)
+
+    posted.clear()
+    assert await delivery.sweep(storage.db, limit=2) == 1
+    assert posted == []
@@ -0,0 +1,68 @@
+# Tests for the data migrations.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+from signup_bot.api.migrate import backfill_event_aggregates, migrate_signup_ids
+from signup_bot.api.services import MemoryStorage
+
+def _seed_legacy_event(storage, signups):
+    """Create an event whose signups use auto-generated document IDs."""
+    storage.create_event('1', 'War', {'event_name': 'War', 'signup_count': len(signups), 'is_open': True})
+    signups_ref = storage.db.collection('servers').document('1').collection('events').document('War').collection('signups')
+    for index, tag in enumerate(signups, 1):
+        signups_ref.add({'player_tag': tag, 'index': index, 'player_th': 15})
+    return signups_ref
+
+def test_migrate_signup_ids():
+    """Auto-ID signups are rewritten under their normalized tag."""
+    storage = MemoryStorage()
+    signups_ref = _seed_legacy_event(storage, ['#AAA', 'bbb', '#CCC'])
+
+    stats = migrate_signup_ids(storage.db)
+
+    assert stats['moved'] == 3
+    assert stats['duplicates'] == 0
+    assert sorted(doc.id for doc in signups_ref.stream()) == ['AAA', 'BBB', 'CCC']
+    assert storage.find_signup('1', 'War', '#BBB')['index'] == 2
+
+    # Running it again is a no-op
+    assert migrate_signup_ids(storage.db)['writes'] == 0
+
+def test_migrate_collapses_duplicates():
+    """Duplicate tags keep the earliest signup and renumber the rest."""
+    storage = MemoryStorage()
+    _seed_legacy_event(storage, ['#AAA', '#BBB', '#aaa', '#CCC'])
+
+    stats = migrate_signup_ids(storage.db)
+
+    assert stats['duplicates'] == 1
+    signups = storage.list_signups('1', 'War')
+    assert [(signup['player_tag'], signup['index']) for signup in signups] == [('#AAA', 1), ('#BBB', 2), ('#CCC', 3)]
+    assert storage.get_event('1', 'War')['signup_count'] == 3
+
+def test_dry_run_writes_nothing():
+    """A dry run reports the changes without applying them."""
+    storage = MemoryStorage()
+    signups_ref = _seed_legacy_event(storage, ['#AAA'])
+    before = [doc.id for doc in signups_ref.stream()]
+
+    stats = migrate_signup_ids(storage.db, dry_run=True)
+
+    assert stats['moved'] == 1
+    assert [doc.id for doc in signups_ref.stream()] == before
+
+def test_backfill_event_aggregates():
+    """Events without an aggregate get their count and TH composition stored once."""
+    storage = MemoryStorage()
+    _seed_legacy_event(storage, ['#AAA', '#BBB'])
+
+    stats = backfill_event_aggregates(storage.db)
+
+    assert stats['updated'] == 1
+    event = storage.get_event('1', 'War')
+    assert event['signup_count'] == 2
+    assert event['th_composition'] == {'15': 2}
+    assert backfill_event_aggregates(storage.db)['writes'] == 0
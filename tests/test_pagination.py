@@ -0,0 +1,118 @@
+# Tests for pagination and field projection of the API listings.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from signup_bot.api import create_app
+from signup_bot.api.pagination import decode_cursor, encode_cursor
+from signup_bot.api.services import MemoryStorage
+from signup_bot.utils.api_pages import iter_pages
+
+GUILD_ID = '12345'
+
+@pytest.fixture
+def storage():
+    """Create an in-memory storage with an event of five signups."""
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    for tag in ['#AAA', '#BBB', '#CCC', '#DDD', '#EEE']:
+        storage.add_signup(GUILD_ID, 'War', {'player_tag': tag, 'player_th': 15})
+    return storage
+
+@pytest.fixture
+def client(storage):
+    """Create a test client for the API backed by in-memory storage."""
+    return create_app(storage=storage).test_client()
+
+def test_cursor_round_trip():
+    """Cursors decode to the key they were made from."""
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(encode_cursor('Clan War')) == 'Clan War'
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+def test_signups_paginated(client, storage):
+    """Pages resume after the cursor and keep counting positions."""
+    storage.remove_signup(GUILD_ID, 'War', '#BBB')
+
+    first = client.get(f'/api/events/War/signups?guild_id={GUILD_ID}&limit=2').get_json()
+    assert [signup['player_tag'] for signup in first['signups']] == ['#AAA', '#CCC']
+    assert first['count'] == 4
+
+    second = client.get(
+        f"/api/events/War/signups?guild_id={GUILD_ID}&limit=2&cursor={first['next_cursor']}"
+    ).get_json()
+    assert [(signup['player_tag'], signup['position']) for signup in second['signups']] == [('#DDD', 3), ('#EEE', 4)]
+    assert second['next_cursor'] is None
+
+def test_unpaginated_requests_return_everything(client):
+    """Without a limit every signup is returned, as before."""
+    response = client.get(f'/api/events/War/signups?guild_id={GUILD_ID}').get_json()
+    assert response['count'] == 5
+    assert response['next_cursor'] is None
+
+def test_get_event_paginated(client):
+    """get_event pages its signups the same way."""
+    event = client.get(f'/api/events/War?guild_id={GUILD_ID}&limit=3').get_json()
+    assert len(event['signups']) == 3
+    assert event['signup_count'] == 5
+    assert event['next_cursor']
+
+def test_events_paginated(client, storage):
+    """Event listings page through events by name."""
+    for name in ['Alpha', 'Beta']:
+        storage.create_event(GUILD_ID, name, {'event_name': name})
+
+    first = client.get(f'/api/events?guild_id={GUILD_ID}&limit=2').get_json()
+    second = client.get(f"/api/events?guild_id={GUILD_ID}&limit=2&cursor={first['next_cursor']}").get_json()
+    assert [event['id'] for event in first['events'] + second['events']] == ['Alpha', 'Beta', 'War']
+    assert second['next_cursor'] is None
+
+def test_invalid_page_arguments(client):
+    """Bad limits and cursors are rejected."""
+    assert client.get(f'/api/events?guild_id={GUILD_ID}&limit=0').status_code == 400
+    assert client.get(f'/api/events?guild_id={GUILD_ID}&limit=x').status_code == 400
+    assert client.get(f'/api/events/War/signups?guild_id={GUILD_ID}&cursor=abc').status_code == 400
+    # An event cursor is not a signup cursor
+    cursor = encode_cursor('War')
+    assert client.get(f'/api/events/War/signups?guild_id={GUILD_ID}&cursor={cursor}').status_code == 400
+
+@pytest.mark.asyncio
+async def test_iter_pages_walks_every_page(client):
+    """The bot helper follows next_cursor until the listing ends."""
+    requests_seen = []
+
+    async def list_signups(request):
+        requests_seen.append(dict(request.query))
+        response = client.get('/api/events/War/signups', query_string=dict(request.query))
+        return web.json_response(response.get_json(), status=response.status_code)
+
+    app = web.Application()
+    app.router.add_get('/signups', list_signups)
+    async with TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            tags = [
+                signup['player_tag']
+                async for signup in iter_pages(
+                    session, str(server.make_url('/signups')), 'signups', params={'guild_id': GUILD_ID}, page_size=2
+                )
+            ]
+
+    assert tags == ['#AAA', '#BBB', '#CCC', '#DDD', '#EEE']
+    assert len(requests_seen) == 3
+
+def test_events_field_projection(client, storage):
+    """fields= returns only the requested fields plus the event ID."""
+    storage.update_event(GUILD_ID, 'War', {'is_open': True, 'embed': {'title': 'War'}})
+
+    events = client.get(f'/api/events?guild_id={GUILD_ID}&fields=event_name,is_open').get_json()['events']
+    assert events == [{'id': 'War', 'event_name': 'War', 'is_open': True}]
+
+    assert client.get(f'/api/events?guild_id={GUILD_ID}&fields=embed.title').status_code == 400
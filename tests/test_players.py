@@ -0,0 +1,225 @@
+# Tests for the Clash of Clans player lookup service.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.services import MemoryStorage, PlayerLookup, PlayerNotFound, get_player_lookup
+from signup_bot.api.services.memory_client import MemoryClient
+from signup_bot.api.services.players import FilePlayerStore, FirestorePlayerStore
+from signup_bot.utils.player_tags import is_valid_player_tag, normalize_player_tag
+
+GUILD_ID = '12345'
+
+def _profile(tag):
+    return {'tag': tag, 'name': f"Player {tag}", 'townHallLevel': 15, 'troops': [{'name': 'Barbarian'}]}
+
+class Upstream:
+    """Counts the calls a lookup makes to the proxy."""
+
+    def __init__(self, known=True, latency=0.0):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.known = known
+        self.latency = latency
+
+    def __call__(self, tag):
+        with self.lock:
+            self.calls.append(tag)
+        time.sleep(self.latency)
+        return _profile(tag) if self.known else {}
+
+    async def fetch_async(self, tag):
+        self.calls.append(tag)
+        await asyncio.sleep(self.latency)
+        return _profile(tag) if self.known else {}
+
+def test_cached_by_normalized_tag():
+    """Spellings of one tag share a cache entry and only the used fields are kept."""
+    lookup, upstream = PlayerLookup(ttl=60, max_entries=10), Upstream(latency=0.01)
+    assert lookup.get('#abc', upstream)['name'] == 'Player #ABC'
+    assert lookup.get(' ABC', upstream) == {'tag': '#ABC', 'name': 'Player #ABC', 'townHallLevel': 15}
+    assert upstream.calls == ['#ABC']
+
+    stats = lookup.stats()
+    assert (stats['hits'], stats['misses'], stats['upstream_calls']) == (1, 1, 1)
+    assert stats['upstream_ms_avg'] >= 10
+    assert stats['saved_ms'] == pytest.approx(stats['upstream_ms_avg'], abs=0.1)
+
+def test_unknown_players_not_cached():
+    """Empty answers are retried on the next lookup."""
+    lookup, upstream = PlayerLookup(ttl=60, max_entries=10), Upstream(known=False)
+    lookup.get('#ABC', upstream)
+    lookup.get('#ABC', upstream)
+    assert len(upstream.calls) == 2
+
+def test_file_store_survives_restart(tmp_path):
+    """A new process loads the persisted profiles and skips the proxy."""
+    path = str(tmp_path / 'players.jsonl')
+    first = PlayerLookup(ttl=60, max_entries=10, store=FilePlayerStore(path))
+    first.get('#ABC', Upstream())
+    first.get('#DEF', Upstream())
+
+    second, upstream = PlayerLookup(ttl=60, max_entries=10, store=FilePlayerStore(path)), Upstream()
+    assert second.warm() == 2
+    assert second.get('#ABC', upstream)['townHallLevel'] == 15
+    assert upstream.calls == []
+
+def test_file_store_drops_expired_and_corrupt_lines(tmp_path):
+    """Old entries and a half-written last line are skipped and compacted away."""
+    path = tmp_path / 'players.jsonl'
+    store = FilePlayerStore(str(path))
+    store.save('#OLD', {'name': 'Old'}, time.time() - 120)
+    store.save('#NEW', {'name': 'New'}, time.time())
+    with open(path, 'a') as file:
+        file.write('{"tag": "#CUT", "prof')
+
+    assert [tag for tag, _, _ in store.load(max_age=60)] == ['#NEW']
+    assert len(path.read_text().splitlines()) == 1
+
+def test_file_store_compacts_as_it_grows(tmp_path):
+    """Saving past the line threshold rewrites the file with one line per live tag."""
+    path = tmp_path / 'players.jsonl'
+    store = FilePlayerStore(str(path), compact_lines=10)
+    list(store.load(max_age=60))
+    store.save('#OLD', {'name': 'Old'}, time.time() - 120)
+    for number in range(9):
+        store.save(f'#P{number % 3}', {'name': f'Player {number}'}, time.time())
+
+    assert store.compactions == 2
+    assert sorted(line.split('"')[3] for line in path.read_text().splitlines()) == ['#P0', '#P1', '#P2']
+    assert dict((tag, profile['name']) for tag, profile, _ in store.load(max_age=60))['#P2'] == 'Player 8'
+
+def test_firestore_store_survives_restart():
+    """Profiles persisted to a collection are loaded by the next lookup."""
+    db = MemoryClient()
+    PlayerLookup(ttl=60, max_entries=10, store=FirestorePlayerStore(db)).get('#ABC', Upstream())
+
+    lookup = PlayerLookup(ttl=60, max_entries=10, store=FirestorePlayerStore(db))
+    assert lookup.warm() == 1
+    assert lookup.cache.get('#ABC')['name'] == 'Player #ABC'
+
+def test_signups_to_several_events_fetch_once():
+    """The same player signing up to three events is looked up once."""
+    storage = MemoryStorage()
+    for name in ('A', 'B', 'C'):
+        storage.create_event(GUILD_ID, name, {'event_name': name, 'signup_count': 0, 'th_composition': {}})
+    client = create_app(storage=storage).test_client()
+    upstream = Upstream()
+
+    with patch('signup_bot.api.routes.events.fetch_player', side_effect=upstream):
+        for name in ('A', 'B', 'C'):
+            response = client.post(f'/api/events/{name}/signup', json={
+                'player_tag': '#pqr', 'discord_name': 'someone', 'guild_id': GUILD_ID
+            })
+            assert response.status_code == 201
+
+    assert upstream.calls == ['#PQR']
+    assert client.get('/metrics').get_json()['caches']['players']['hits'] == 2
+    assert get_player_lookup().stats()['upstream_calls'] == 1
+
+def test_concurrent_lookups_coalesced():
+    """Threads missing the cache for one tag at once share a single proxy call."""
+    lookup, upstream = PlayerLookup(ttl=60, max_entries=10), Upstream(latency=0.2)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: lookup.get('#abc', upstream), range(10)))
+
+    assert upstream.calls == ['#ABC']
+    assert all(result['name'] == 'Player #ABC' for result in results)
+    assert len({id(result) for result in results}) == 10  # Each caller gets its own copy
+    stats = lookup.stats()
+    assert (stats['upstream_calls'], stats['coalesced'], stats['in_flight']) == (1, 9, 0)
+
+def test_coalesced_failure_reaches_every_caller():
+    """A failed proxy call is raised to all of its waiters and the next lookup retries."""
+    lookup, calls = PlayerLookup(ttl=60, max_entries=10), []
+
+    def failing(tag):
+        calls.append(tag)
+        time.sleep(0.2)
+        raise ConnectionError('proxy down')
+
+    def attempt(_):
+        try:
+            lookup.get('#ABC', failing)
+        except ConnectionError:
+            return 'failed'
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        assert list(pool.map(attempt, range(5))) == ['failed'] * 5
+    assert len(calls) == 1
+    assert lookup.get('#ABC', Upstream())['name'] == 'Player #ABC'
+
+@pytest.mark.asyncio
+async def test_concurrent_async_lookups_coalesced():
+    """The ASGI path coalesces concurrent lookups on the event loop the same way."""
+    lookup, upstream = PlayerLookup(ttl=60, max_entries=10), Upstream(latency=0.1)
+    results = await asyncio.gather(*(lookup.get_async(tag, upstream.fetch_async) for tag in ['#abc'] * 5 + ['#def']))
+
+    assert sorted(upstream.calls) == ['#ABC', '#DEF']
+    assert [result['tag'] for result in results] == ['#ABC'] * 5 + ['#DEF']
+    assert lookup.stats()['coalesced'] == 4
+
+@pytest.mark.parametrize('raw, tag, valid', [
+    (' #p2yl0 ', '#P2YL0', True),
+    ('pqo', '#PQ0', True),          # A letter O is read as zero
+    ('#ABC123', '#ABC123', False),  # A, B, 1 and 3 are not in the alphabet
+    ('#PQ', '#PQ', False),          # Too short
+    ('#P Q R', '#P Q R', False),
+    ('', '', False),
+])
+def test_tag_validation(raw, tag, valid):
+    """Tags are normalized and checked against the CoC alphabet locally."""
+    assert normalize_player_tag(raw) == tag
+    assert is_valid_player_tag(tag) is valid
+
+def test_not_found_tags_cached():
+    """A tag the API did not know is answered locally until the negative TTL passes."""
+    lookup, calls = PlayerLookup(ttl=60, max_entries=10, not_found_ttl=60), []
+
+    def unknown(tag):
+        calls.append(tag)
+        raise PlayerNotFound(tag)
+
+    assert lookup.get('#PQR', unknown) == {}
+    assert lookup.get('#pqr', unknown) == {}
+    assert calls == ['#PQR']
+    assert lookup.stats()['not_found_hits'] == 1
+
+def test_bad_tags_rejected_without_io():
+    """Malformed tags never read the database, and unknown ones are looked up once."""
+    storage = MemoryStorage()
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    client = create_app(storage=storage).test_client()
+    get_player_lookup().not_found.ttl = 60
+    calls = []
+
+    def unknown(tag):
+        calls.append(tag)
+        raise PlayerNotFound(tag)
+
+    def sign_up(tag):
+        return client.post('/api/events/War/signup', json={
+            'player_tag': tag, 'discord_name': 'someone', 'guild_id': GUILD_ID
+        })
+
+    storage.db.reset_stats()
+    with patch('signup_bot.api.routes.events.fetch_player', side_effect=unknown):
+        response = sign_up('#ABC123')
+        assert response.status_code == 400
+        assert 'Invalid player tag' in response.get_json()['error']
+        assert sum(storage.db.stats.values()) == 0
+
+        assert sign_up('#PQRLQ').status_code == 400
+        assert sign_up('#PQRLQ').status_code == 400
+    assert calls == ['#PQRLQ']
@@ -59,7 +59,7 @@ def test_signup_with_role(event_name):
     print(f"Testing signup for {event_name}...")
     
     data = {
-        "player_tag": "#TEST123",
+        "player_tag": "#2PQ9LRY",
         "discord_name": "TestUser#1234",
         "discord_user_id": "111222333",
         "guild_id": TEST_GUILD_ID
@@ -81,7 +81,7 @@ def test_remove_with_role(event_name):
     print(f"Testing removal from {event_name}...")
     
     data = {
-        "player_tag": "#TEST123",
+        "player_tag": "#2PQ9LRY",
         "discord_name": "TestUser#1234",
         "guild_id": TEST_GUILD_ID,
         "user_roles": ["111222333"]  # Test user roles
@@ -0,0 +1,138 @@
+# Concurrency stress tests for the signup path.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from signup_bot.api import create_app
+from signup_bot.api.services import MemoryStorage, SignupResult
+from signup_bot.api.services.memory_client import MemoryClient, transactional
+
+GUILD_ID = '12345'
+PARALLEL_SIGNUPS = 100
+
+@pytest.fixture
+def storage():
+    """In-memory storage with a small RPC latency so requests interleave."""
+    storage = MemoryStorage(MemoryClient(latency=0.001))
+    storage.create_event(GUILD_ID, 'Rush', {'event_name': 'Rush', 'signup_count': 0, 'is_open': True})
+    return storage
+
+def _tag(number):
+    """Return a distinct valid player tag; tags have no 1, so binary is written with 0 and 9."""
+    return '#P' + format(number, '04b').replace('1', '9')
+
+def _player(tag):
+    return {'name': f"Player {tag}", 'townHallLevel': 15}
+
+def test_parallel_signups_get_unique_gap_free_indexes(storage):
+    """100 simultaneous signups through the API are numbered 1..100 exactly once."""
+    app = create_app(storage=storage)
+
+    def sign_up(number):
+        with app.test_client() as client:
+            return client.post('/api/events/Rush/signup', json={
+                'player_tag': _tag(number), 'discord_name': f"user{number}", 'guild_id': GUILD_ID
+            }).status_code
+
+    with patch('signup_bot.api.routes.events.player_get', side_effect=_player), \
+         ThreadPoolExecutor(max_workers=PARALLEL_SIGNUPS) as pool:
+        statuses = list(pool.map(sign_up, range(PARALLEL_SIGNUPS)))
+
+    assert statuses == [201] * PARALLEL_SIGNUPS
+    indexes = sorted(signup['index'] for signup in storage.list_signups(GUILD_ID, 'Rush'))
+    assert indexes == list(range(1, PARALLEL_SIGNUPS + 1))
+    assert storage.get_event(GUILD_ID, 'Rush')['signup_count'] == PARALLEL_SIGNUPS
+
+def test_parallel_duplicate_signups_create_one(storage):
+    """Concurrent signups of the same tag insert it exactly once."""
+    def sign_up(_):
+        result, _ = storage.add_signup(GUILD_ID, 'Rush', {'player_tag': '#SAME'})
+        return result
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(sign_up, range(20)))
+
+    assert results.count(SignupResult.CREATED) == 1
+    assert results.count(SignupResult.ALREADY_SIGNED_UP) == 19
+    assert storage.get_event(GUILD_ID, 'Rush')['signup_count'] == 1
+
+def test_signup_rejected_once_closed(storage):
+    """The open check is part of the signup transaction."""
+    storage.update_event(GUILD_ID, 'Rush', {'is_open': False})
+    assert storage.add_signup(GUILD_ID, 'Rush', {'player_tag': '#LATE'}) == (SignupResult.EVENT_CLOSED, None)
+    assert storage.add_signup(GUILD_ID, 'Missing', {'player_tag': '#LATE'}) == (SignupResult.EVENT_NOT_FOUND, None)
+
+def test_signup_waits_for_concurrent_transaction(storage):
+    """A signup reading the event while another signup's transaction holds it waits for that commit.
+
+    This fails if the signup transaction reads the event without ``transaction=``:
+    the second signup would then see the old count and reuse its index.
+    """
+    inside, release = threading.Event(), threading.Event()
+    signup_writes = storage._signup_writes
+
+    def paused_writes(*args):
+        # Only the first signup pauses, after its reads and before its writes
+        if not inside.is_set():
+            inside.set()
+            release.wait(5)
+        return signup_writes(*args)
+
+    results = {}
+    def sign_up(tag):
+        results[tag] = storage.add_signup(GUILD_ID, 'Rush', {'player_tag': tag})
+
+    with patch.object(storage, '_signup_writes', side_effect=paused_writes):
+        first = threading.Thread(target=sign_up, args=('#AAA',))
+        first.start()
+        assert inside.wait(5)
+        second = threading.Thread(target=sign_up, args=('#BBB',))
+        second.start()
+        second.join(0.2)
+        assert second.is_alive()
+
+        release.set()
+        first.join(5)
+        second.join(5)
+
+    assert (results['#AAA'][1]['index'], results['#BBB'][1]['index']) == (1, 2)
+    assert storage.db.stats['aborted'] == 0
+
+def test_deadlocked_transactions_retry():
+    """Transactions locking two documents in opposite orders abort, retry and both apply."""
+    db = MemoryClient(lock_timeout=0.05)
+    first_ref, second_ref = db.document('counters/a'), db.document('counters/b')
+    first_ref.set({'count': 0})
+    second_ref.set({'count': 0})
+    both_read = threading.Barrier(2)
+
+    def increment(references):
+        @transactional
+        def in_transaction(transaction):
+            counts = [reference.get(transaction=transaction).get('count') for reference in references[:1]]
+            try:
+                both_read.wait(0.2)
+            except threading.BrokenBarrierError:
+                pass  # A retry runs alone
+            counts += [reference.get(transaction=transaction).get('count') for reference in references[1:]]
+            for reference, count in zip(references, counts):
+                transaction.update(reference, {'count': count + 1})
+        in_transaction(db.transaction())
+
+    threads = [threading.Thread(target=increment, args=(order,))
+               for order in ([first_ref, second_ref], [second_ref, first_ref])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert (first_ref.get().get('count'), second_ref.get().get('count')) == (2, 2)
+    assert db.stats['aborted'] >= 1
@@ -0,0 +1,244 @@
+# Tests for the storage layer and the in-memory Firestore stand-in.
+import os
+
+os.environ.setdefault('DISCORD_TOKEN', 'test-token')
+os.environ.setdefault('AUTH', 'test-auth')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+
+import pytest
+from unittest.mock import patch
+from google.api_core import exceptions
+from firebase_admin import firestore
+
+from signup_bot.api import create_app
+from signup_bot.api.services import MemoryStorage, SignupResult
+from signup_bot.api.services.memory_client import MemoryClient
+from signup_bot.utils.firestore_limits import MAX_WRITES_PER_COMMIT
+
+GUILD_ID = '12345'
+
+@pytest.fixture
+def db():
+    """Create an empty in-memory client."""
+    return MemoryClient()
+
+@pytest.fixture
+def storage():
+    """Create an empty in-memory storage."""
+    return MemoryStorage()
+
+@pytest.fixture
+def client(storage):
+    """Create a test client for the API backed by in-memory storage."""
+    app = create_app(storage=storage)
+    return app.test_client()
+
+def test_where_order_by_limit(db):
+    """Queries filter, order and limit like Firestore."""
+    players = db.collection('players')
+    for name, th in [('a', 12), ('b', 15), ('c', 9), ('d', 15)]:
+        players.document(name).set({'name': name, 'th': th})
+    players.document('e').set({'name': 'e'})  # No 'th' field
+
+    docs = players.where('th', '>=', 12).order_by('th', direction='DESCENDING').limit(2).get()
+    # Ties are broken by document ID in the same direction
+    assert [doc.id for doc in docs] == ['d', 'b']
+
+    # Documents without the order_by field are left out
+    assert [doc.id for doc in players.order_by('th').stream()] == ['c', 'a', 'b', 'd']
+
+    assert [doc.id for doc in players.where('th', 'in', [9, 12]).stream()] == ['a', 'c']
+
+def test_cursors_and_projection(db):
+    """start_after and select behave like Firestore."""
+    signups = db.collection('signups')
+    for index in range(1, 6):
+        signups.document(f"s{index}").set({'index': index, 'player_tag': f"#{index}"})
+
+    page = signups.order_by('index').start_after({'index': 2}).limit(2).get()
+    assert [doc.to_dict()['index'] for doc in page] == [3, 4]
+
+    projected = signups.select(['index']).order_by('index').limit(1).get()[0]
+    assert projected.to_dict() == {'index': 1}
+
+def test_transforms_and_updates(db):
+    """Field transforms and dotted update paths are applied."""
+    ref = db.collection('events').document('war')
+    ref.set({'count': 1, 'roles': ['a']})
+    ref.update({
+        'count': firestore.Increment(2),
+        'roles': firestore.ArrayUnion(['a', 'b']),
+        'composition.`15`': 3,
+    })
+    assert ref.get().to_dict() == {'count': 3, 'roles': ['a', 'b'], 'composition': {'15': 3}}
+
+    with pytest.raises(exceptions.NotFound):
+        db.collection('events').document('missing').update({'count': 1})
+    with pytest.raises(exceptions.AlreadyExists):
+        ref.create({'count': 0})
+
+def test_batch_is_atomic_and_limited(db):
+    """Batches apply all writes or none, and reject oversized commits."""
+    events = db.collection('events')
+    events.document('a').set({'n': 1})
+
+    batch = db.batch()
+    batch.update(events.document('a'), {'n': 2})
+    batch.update(events.document('missing'), {'n': 2})
+    with pytest.raises(exceptions.NotFound):
+        batch.commit()
+    assert events.document('a').get().to_dict() == {'n': 1}
+
+    batch = db.batch()
+    for index in range(MAX_WRITES_PER_COMMIT + 1):
+        batch.set(events.document(str(index)), {'n': index})
+    with pytest.raises(exceptions.InvalidArgument):
+        batch.commit()
+
+def test_stats_count_operations(db):
+    """Reads and writes are counted per billed operation."""
+    events = db.collection('events')
+    events.document('a').set({'n': 1})
+    events.document('b').set({'n': 2})
+    db.reset_stats()
+
+    list(events.stream())
+    events.document('a').get()
+    events.document('a').delete()
+    assert db.stats['reads'] == 3
+    assert db.stats['deletes'] == 1
+
+def test_signup_flow(client, storage):
+    """Create, sign up, check and remove against in-memory storage."""
+    storage.set_leader_roles(GUILD_ID, ['leader'])
+
+    response = client.post('/api/events', json={
+        'event_name': 'War', 'guild_id': GUILD_ID, 'channel_id': '1', 'user_roles': ['leader']
+    })
+    assert response.status_code == 201
+    assert client.post('/api/events', json={
+        'event_name': 'War', 'guild_id': GUILD_ID, 'user_roles': ['leader']
+    }).status_code == 400
+
+    with patch('signup_bot.api.routes.events.player_get') as mock_player_get:
+        for tag, th in [('#PPP', 15), ('#QQQ', 14), ('#RRR', 15)]:
+            mock_player_get.return_value = {'name': tag, 'townHallLevel': th}
+            response = client.post('/api/events/War/signup', json={
+                'player_tag': tag, 'discord_name': 'user', 'guild_id': GUILD_ID
+            })
+            assert response.status_code == 201
+
+        # Tags are normalized, so this is the same player as '#PPP'
+        response = client.post('/api/events/War/signup', json={
+            'player_tag': ' ppp', 'discord_name': 'user', 'guild_id': GUILD_ID
+        })
+        assert response.status_code == 400
+
+    event = client.get(f'/api/events/War?guild_id={GUILD_ID}').get_json()
+    assert event['signup_count'] == 3
+    assert event['th_composition'] == {'15': 2, '14': 1}
+
+    response = client.post('/api/events/War/remove', json={
+        'player_tag': '#PPP', 'discord_name': 'user', 'guild_id': GUILD_ID
+    })
+    assert response.status_code == 200
+
+    signups = client.get(f'/api/events/War/signups?guild_id={GUILD_ID}').get_json()['signups']
+    # Indexes are stable; the display position closes the gap
+    assert [(signup['player_tag'], signup['index'], signup['position']) for signup in signups] == [
+        ('#QQQ', 2, 1), ('#RRR', 3, 2)
+    ]
+    assert client.get(f'/api/events/War?guild_id={GUILD_ID}').get_json()['signup_count'] == 2
+
+    check = client.post('/api/events/War/check', json={'player_tag': '#PPP', 'guild_id': GUILD_ID})
+    assert check.get_json()['is_signed_up'] is False
+    check = client.post('/api/events/War/check', json={'player_tag': '#RRR', 'guild_id': GUILD_ID})
+    assert 'position' not in check.get_json()['player_data']
+    check = client.post('/api/events/War/check?position=1', json={'player_tag': '#RRR', 'guild_id': GUILD_ID})
+    assert check.get_json()['player_data']['position'] == 2
+
+def test_leader_roles(client):
+    """Leader roles can be added, listed and removed."""
+    assert client.post(f'/api/servers/{GUILD_ID}/add_leader_role', json={'role_id': '7'}).status_code == 200
+    assert client.get(f'/api/servers/{GUILD_ID}/leader_roles').get_json() == {'leader_role_ids': ['7']}
+    assert client.post(f'/api/servers/{GUILD_ID}/remove_leader_role', json={'role_id': '7'}).status_code == 200
+    assert client.get(f'/api/servers/{GUILD_ID}/leader_roles').get_json() == {'leader_role_ids': []}
+
+def test_signups_keyed_by_tag(storage):
+    """Signups live under their normalized tag and can only be created once."""
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0})
+
+    assert storage.add_signup(GUILD_ID, 'War', {'player_tag': '#ABC'})[0] == SignupResult.CREATED
+    assert storage.add_signup(GUILD_ID, 'War', {'player_tag': '#ABC'})[0] == SignupResult.ALREADY_SIGNED_UP
+
+    storage.db.reset_stats()
+    assert storage.find_signup(GUILD_ID, 'War', '#ABC')['id'] == 'ABC'
+    assert storage.db.stats['queries'] == 0
+
+def test_remove_signup_is_constant_cost(storage):
+    """Removing a signup never rewrites the others, and indexes are not reused."""
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0})
+    for number in range(50):
+        storage.add_signup(GUILD_ID, 'War', {'player_tag': f"#P{number:02d}"})
+
+    storage.db.reset_stats()
+    assert storage.remove_signup(GUILD_ID, 'War', '#P00') is True
+    assert storage.db.stats['writes'] + storage.db.stats['deletes'] == 2
+    assert storage.db.stats['queries'] == 0
+
+    # A second removal of the same player changes nothing
+    assert storage.remove_signup(GUILD_ID, 'War', '#P00') is False
+    assert storage.get_event(GUILD_ID, 'War')['signup_count'] == 49
+
+    assert storage.add_signup(GUILD_ID, 'War', {'player_tag': '#NEW'})[1]['index'] == 51
+    assert storage.signup_position(GUILD_ID, 'War', storage.find_signup(GUILD_ID, 'War', '#P10')) == 10
+    assert storage.list_signups(GUILD_ID, 'War')[-1]['position'] == 50
+
+def test_remove_signup_of_deleted_event(storage):
+    """A signup left behind by a deleted event is reported as gone instead of failing."""
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0})
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#ABC'})
+    storage._event_ref(GUILD_ID, 'War').delete()
+    assert storage.remove_signup(GUILD_ID, 'War', '#ABC') is False
+
+def test_event_aggregate_maintained(client, storage):
+    """Signups and removals keep the event's count and TH composition current."""
+    storage.create_event(GUILD_ID, 'War', {'event_name': 'War', 'signup_count': 0, 'th_composition': {}})
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#PPP', 'player_th': 15})
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#QQQ', 'player_th': 14})
+    storage.remove_signup(GUILD_ID, 'War', '#QQQ')
+
+    event = storage.get_event(GUILD_ID, 'War')
+    assert event['signup_count'] == 1
+    assert event['th_composition'] == {'15': 1}
+    assert 'aggregate_updated_at' in event
+
+def test_legacy_event_aggregate_backfilled(client, storage):
+    """Events without the aggregate are counted once and then updated incrementally."""
+    storage.create_event(GUILD_ID, 'Old', {'event_name': 'Old', 'signup_count': 1, 'is_open': True})
+    storage._signups_ref(GUILD_ID, 'Old').document('PPP').set({'player_tag': '#PPP', 'player_th': 13, 'index': 1})
+
+    event = client.get(f'/api/events/Old?guild_id={GUILD_ID}').get_json()
+    assert event['th_composition'] == {'13': 1}
+
+    storage.add_signup(GUILD_ID, 'Old', {'player_tag': '#QQQ', 'player_th': 13})
+    assert storage.get_event(GUILD_ID, 'Old')['th_composition'] == {'13': 2}
+
+def test_event_summary(client, storage):
+    """The summary returns metadata and aggregates from a single document read."""
+    storage.create_event(GUILD_ID, 'War', {
+        'event_name': 'War', 'signup_count': 0, 'th_composition': {}, 'is_open': True, 'message_id': '9'
+    })
+    storage.add_signup(GUILD_ID, 'War', {'player_tag': '#PPP', 'player_th': 15})
+
+    storage.db.reset_stats()
+    response = client.get(f'/api/events/War/summary?guild_id={GUILD_ID}')
+    summary = response.get_json()
+
+    assert response.status_code == 200
+    assert storage.db.stats['reads'] == 1
+    assert 'signups' not in summary
+    assert summary['signup_count'] == 1
+    assert summary['th_composition'] == {'15': 1}
+    assert summary['message_id'] == '9'
+    assert client.get(f'/api/events/Missing/summary?guild_id={GUILD_ID}').status_code == 404